@@ -0,0 +1,95 @@
+"""Replays a trace recorded on a token module and reports the latency of its
+calls.
+
+Usage:
+    python replay.py TRACE [--timed] [--speed S] [--calls FILE]
+                     [--profile FILE]
+
+The calls are replayed on a fresh token, in the state the recorded token had
+when the recording started. They run as fast as possible, or at their
+original pace with --timed. The latency of every call can be written as CSV
+with --calls, and the replay can be profiled with --profile.
+
+Calls failing when they did not when recorded, or the other way round, are
+reported as diverging: the replay then does not reproduce the recorded
+traffic.
+"""
+import argparse
+import cProfile
+import csv
+import sys
+from typing import List
+
+from pikciotok import base
+
+import workloads  # Makes the tokens and the runtime importable.
+import event_bus
+import recorder
+from run import latency_summary
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('trace', help='The trace file to replay.')
+    parser.add_argument('--timed', action='store_true',
+                        help='Replays the calls at their original pace.')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Speeds up a timed replay.')
+    parser.add_argument('--calls',
+                        help='Writes the latency of each call to a CSV file.')
+    parser.add_argument('--profile',
+                        help='Saves profiling statistics of the replay, for '
+                             'pstats.')
+    args = parser.parse_args(argv)
+
+    trace = recorder.Trace(args.trace)
+    token = trace.new_token()
+    module = sys.modules[type(token).__module__]
+
+    bus = event_bus.EventBus()
+    bus.attach(base)
+    bus.attach(module)
+    profile = cProfile.Profile() if args.profile else None
+    try:
+        if profile:
+            profile.enable()
+        calls = recorder.replay(args.trace, token, args.timed, args.speed)
+        if profile:
+            profile.disable()
+            profile.dump_stats(args.profile)
+    finally:
+        bus.close()
+
+    if args.calls:
+        with open(args.calls, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['call', 'method', 'latency_us', 'failed',
+                             'failed_when_recorded'])
+            for i, (method, latency, failed, recorded_failure) in enumerate(
+                    calls):
+                writer.writerow([i, method, '{:.3f}'.format(latency * 1e6),
+                                 int(failed), int(recorded_failure)])
+
+    print('{}: {} calls replayed, {:.2f}s spent in calls'.format(
+        trace.type_name, len(calls), sum(call[1] for call in calls)
+    ))
+    print('  latency (us): p50 {p50:.1f}  p90 {p90:.1f}  p99 {p99:.1f}  '
+          'max {max:.1f}'.format(**latency_summary([c[1] for c in calls])))
+    by_method = {}
+    for method, latency, _, _ in calls:
+        by_method.setdefault(method, []).append(latency)
+    for method, latencies in sorted(by_method.items()):
+        summary = latency_summary(latencies)
+        print('    {:<24} {:>8} calls  p50 {:>8.1f}  p99 {:>8.1f}'.format(
+            method, len(latencies), summary['p50'], summary['p99']
+        ))
+
+    diverging = sum(1 for call in calls if call[2] != call[3])
+    if diverging:
+        print('{} call(s) diverged from the recording.'.format(diverging))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
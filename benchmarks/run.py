@@ -0,0 +1,214 @@
+"""Replays the workloads of the benchmark suite and reports throughput,
+latency percentiles and memory usage.
+
+Usage:
+    python run.py [workload ...] [--scale S] [--seed N] [--save FILE]
+                  [--compare FILE] [--tolerance T] [--no-memory]
+
+Results saved with --save can be compared with a later run with --compare. A
+workload regresses when its throughput drops, or its 99th percentile latency
+rises, by more than the tolerance. The command then exits with status 1.
+
+Token events are routed to an event bus without sinks, so that printing them
+is not measured.
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from random import Random
+from typing import Dict, List
+
+from pikciotok import base, context
+
+import workloads  # Makes the tokens and the runtime importable.
+import event_bus
+
+_PERCENTILES = (50, 90, 99)
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """Gives the value below which lies provided percentage of the values."""
+    if not sorted_values:
+        return 0.0
+    index = int(round(percentile / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def _replay(token, calls: List[workloads.Call],
+            latencies: Dict[str, List[float]] = None):
+    """Replays calls against a token, recording their latency by method if
+    asked to."""
+    methods = {}
+    clock = time.perf_counter
+    for sender, method, args in calls:
+        func = methods.get(method)
+        if func is None:
+            func = methods[method] = getattr(token, method)
+        context.sender = sender
+        if latencies is None:
+            func(*args)
+            continue
+        start = clock()
+        func(*args)
+        latencies.setdefault(method, []).append(clock() - start)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Gives the percentiles and maximum of latencies, in microseconds."""
+    latencies = sorted(latencies)
+    summary = {
+        'p{}'.format(p): _percentile(latencies, p) * 1e6
+        for p in _PERCENTILES
+    }
+    summary['max'] = latencies[-1] * 1e6 if latencies else 0.0
+    return summary
+
+
+def run_workload(workload: workloads.Workload,
+                 measure_memory: bool = True) -> Dict:
+    """Replays a workload and measures it.
+
+    :return: The measures, ready to be saved as JSON.
+    """
+    token = workload.factory()
+    _replay(token, workload.setup)
+    latencies = {}
+    gc.collect()
+    start = time.perf_counter()
+    _replay(token, workload.calls, latencies)
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [value for values in latencies.values()
+                     for value in values]
+    result = {
+        'calls': len(workload.calls),
+        'seconds': elapsed,
+        'throughput': len(workload.calls) / elapsed if elapsed else 0.0,
+        'latency_us': latency_summary(all_latencies),
+        'methods': {
+            method: dict(calls=len(values), **latency_summary(values))
+            for method, values in sorted(latencies.items())
+        },
+    }
+
+    if measure_memory:
+        # Tracing slows the calls down, so memory is measured on a second
+        # replay.
+        gc.collect()
+        tracemalloc.start()
+        token = workload.factory()
+        _replay(token, workload.setup)
+        state_size = tracemalloc.get_traced_memory()[0]
+        _replay(token, workload.calls)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['memory'] = {
+            'state_bytes': current,
+            'setup_state_bytes': state_size,
+            'peak_bytes': peak,
+        }
+    return result
+
+
+def compare(baseline: Dict[str, Dict], results: Dict[str, Dict],
+            tolerance: float) -> List[str]:
+    """Lists the regressions of results compared to a baseline."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result['throughput'] < reference['throughput'] * (1 - tolerance):
+            regressions.append(
+                '{}: throughput {:.0f} calls/s, was {:.0f}'.format(
+                    name, result['throughput'], reference['throughput']
+                )
+            )
+        p99, reference_p99 = (result['latency_us']['p99'],
+                              reference['latency_us']['p99'])
+        if p99 > reference_p99 * (1 + tolerance):
+            regressions.append('{}: p99 latency {:.1f}us, was {:.1f}us'.format(
+                name, p99, reference_p99
+            ))
+    return regressions
+
+
+def _print_result(name: str, result: Dict):
+    """Prints the measures of a workload."""
+    latency = result['latency_us']
+    print('{}: {} calls in {:.2f}s, {:.0f} calls/s'.format(
+        name, result['calls'], result['seconds'], result['throughput']
+    ))
+    print('  latency (us): p50 {p50:.1f}  p90 {p90:.1f}  p99 {p99:.1f}  '
+          'max {max:.1f}'.format(**latency))
+    for method, measures in result['methods'].items():
+        print('    {:<24} {:>8} calls  p50 {:>8.1f}  p99 {:>8.1f}'.format(
+            method, measures['calls'], measures['p50'], measures['p99']
+        ))
+    if 'memory' in result:
+        memory = result['memory']
+        print('  memory: state {:.1f} MB, peak {:.1f} MB'.format(
+            memory['state_bytes'] / 2 ** 20, memory['peak_bytes'] / 2 ** 20
+        ))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('workloads', nargs='*',
+                        help='Workloads to run, among {}. All of them by '
+                             'default.'.format(', '.join(workloads.WORKLOADS)))
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplies the size of the workloads.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help='Saves the results to a JSON file.')
+    parser.add_argument('--compare',
+                        help='Compares the results to a saved JSON file.')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Relative degradation tolerated by --compare.')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skips memory measures, which replay the '
+                             'workloads a second time.')
+    args = parser.parse_args(argv)
+    for name in args.workloads:
+        if name not in workloads.WORKLOADS:
+            parser.error("Unknown workload: '{}'".format(name))
+
+    bus = event_bus.EventBus()
+    bus.attach(base)
+    for module in (workloads.shares, workloads.vote, workloads.permission,
+                   workloads.loyalty_card, workloads.pikciorealms_card):
+        bus.attach(module)
+
+    results = {}
+    try:
+        for name in args.workloads or workloads.WORKLOADS:
+            workload = workloads.WORKLOADS[name](Random(args.seed),
+                                                 args.scale)
+            results[name] = run_workload(workload, not args.no_memory)
+            _print_result(name, results[name])
+    finally:
+        bus.close()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(dict(scale=args.scale, seed=args.seed,
+                           results=results), f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (baseline['scale'], baseline['seed']) != (args.scale, args.seed):
+            print('Baseline was run with another scale or seed.')
+            return 1
+        regressions = compare(baseline['results'], results, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
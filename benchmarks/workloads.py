@@ -0,0 +1,212 @@
+"""Synthetic workloads for each token.
+
+A workload is a list of calls, replayed against a fresh token instance. Setup
+calls bring the token to a realistic state and are not measured. Workloads
+are generated from a seeded random generator, so that two runs replay exactly
+the same calls.
+"""
+import os
+import sys
+from random import Random
+from typing import Callable, Dict, List, Tuple
+
+# Tokens live in sibling folders.
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.extend(
+    os.path.join(_ROOT, folder) for folder in (
+        'common', 'equity_tokens', 'permission_tokens', 'trading_tokens',
+        'utility_tokens', 'vote_tokens', 'runtime'
+    )
+)
+
+import loyalty_card
+import permission
+import pikciorealms_card
+import shares
+import vote
+
+Call = Tuple[str, str, tuple]
+"""Sender, method name and arguments of a call."""
+
+
+class Workload(object):
+    """Calls to replay against a fresh token.
+
+    :param name: The name of the workload.
+    :param factory: Creates the token instance the calls are replayed on.
+    :param setup: Calls preparing the token, not measured.
+    :param calls: Measured calls.
+    """
+
+    __slots__ = ('name', 'factory', 'setup', 'calls')
+
+    def __init__(self, name: str, factory: Callable, setup: List[Call],
+                 calls: List[Call]):
+        self.name = name
+        self.factory = factory
+        self.setup = setup
+        self.calls = calls
+
+
+def shares_cap_table(rand: Random, scale: float) -> Workload:
+    """Shares moving between shareholders, delegations changing and rights
+    being queried, as on a busy cap table."""
+    holders = ['Shareholder {} Holdings Ltd.'.format(i)
+               for i in range(int(2000 * scale))]
+    emitter = 'Pikcio Corporation'
+    setup = [(emitter, 'init', (len(holders) * 1000, 'Pikcio', 'PKC'))]
+    setup += [(emitter, 'transfer', (holder, 1000)) for holder in holders]
+
+    balances = dict.fromkeys(holders, 1000)
+    delegates = {}
+    calls = []
+    for _ in range(int(50000 * scale)):
+        sender = rand.choice(holders)
+        roll = rand.random()
+        if roll < 0.6:
+            to_address = rand.choice(holders)
+            amount = rand.randint(1, max(1, balances[sender] // 10))
+            if to_address != sender and amount < balances[sender]:
+                balances[sender] -= amount
+                balances[to_address] += amount
+                calls.append((sender, 'transfer', (to_address, amount)))
+        elif roll < 0.7:
+            if sender in delegates:
+                del delegates[sender]
+                calls.append((sender, 'remove_delegate', ()))
+            else:
+                delegates[sender] = rand.choice(holders)
+                calls.append((sender, 'set_delegate', (delegates[sender],)))
+        elif roll < 0.9:
+            calls.append((sender, 'get_weight', (sender,)))
+        else:
+            calls.append((sender, 'get_rights', (sender,)))
+    return Workload('shares', shares.Shares, setup, calls)
+
+
+def vote_election(rand: Random, scale: float) -> Workload:
+    """A whole election: every voter casts a ballot."""
+    voters = ['voter{}@pikcio.com'.format(i)
+              for i in range(int(20000 * scale))]
+    candidates = ['Candidate {}'.format(i) for i in range(5)]
+    place = 'Pikcio Vote Place'
+    setup = [(place, 'init', (len(voters) + len(candidates) + 1, 'Election',
+                              'PKV'))]
+    setup += [(place, 'add_candidate', (c,)) for c in candidates]
+    setup += [(place, 'register_voter', (voter,)) for voter in voters]
+    setup.append((place, 'start', ()))
+
+    # The last ballot completes the vote.
+    weights = [rand.random() for _ in candidates]
+    calls = [
+        (voter, 'vote', (rand.choices(candidates, weights)[0],))
+        for voter in voters
+    ]
+    calls.append((place, 'get_ranking', ()))
+    return Workload('vote', vote.Vote, setup, calls)
+
+
+def permission_gateway(rand: Random, scale: float) -> Workload:
+    """Users of an API gateway presenting their permission token. Some of
+    them do not have any."""
+    users = ['user{}'.format(i) for i in range(int(10000 * scale))]
+    authority = 'Pikcio Gateway'
+    setup = [(authority, 'init', (len(users) * 10, 'API access', 'PKA'))]
+    setup += [(authority, 'transfer', (user, 10))
+              for user in users if rand.random() < 0.8]
+
+    calls = []
+    for _ in range(int(100000 * scale)):
+        if rand.random() < 0.001:
+            user = rand.choice(users)
+            calls.append((authority, 'revoke', (user, 1)))
+        else:
+            calls.append((rand.choice(users), 'use_token', ()))
+    return Workload('permission', permission.Permission, setup, calls)
+
+
+def loyalty_card_pos(rand: Random, scale: float) -> Workload:
+    """Points of sale granting points on purchases, and customers spending
+    them on gifts."""
+    customers = ['customer{}@pikcio.com'.format(i)
+                 for i in range(int(10000 * scale))]
+    bank = 'Pikcio Market'
+    catalog = {'gift {}'.format(i): rand.randint(10, 500) for i in range(200)}
+    setup = [
+        (bank, 'init', (10 ** 9, 'Pikcio Points', 'PKP')),
+        (bank, 'add_update_catalog', (catalog,)),
+        (bank, 'grant_many', (dict.fromkeys(customers, 100),)),
+    ]
+
+    balances = dict.fromkeys(customers, 100)
+    calls = []
+    for _ in range(int(50000 * scale)):
+        customer = rand.choice(customers)
+        roll = rand.random()
+        if roll < 0.6:
+            amount = rand.randint(1, 50)
+            balances[customer] += amount
+            calls.append((bank, 'grant', (customer, amount)))
+        elif roll < 0.8:
+            gift = rand.choice(list(catalog))
+            if catalog[gift] <= balances[customer]:
+                balances[customer] -= catalog[gift]
+                calls.append((customer, 'purchase', (gift,)))
+        elif roll < 0.9:
+            calls.append((customer, 'affordable_gifts', (customer,)))
+        else:
+            calls.append((customer, 'get_balance', (customer,)))
+    return Workload('loyalty_card', loyalty_card.LoyaltyCard, setup,
+                    calls)
+
+
+def pikciorealms_card_trading(rand: Random, scale: float) -> Workload:
+    """Players trading a card, directly or through delegates."""
+    players = ['player{}'.format(i) for i in range(int(5000 * scale))]
+    craftsman = 'PikcioRealms'
+    setup = [
+        (craftsman, 'init', (len(players) * 10, 'The Mighty PikPik',
+                             'PKR-0001')),
+        (craftsman, 'init_card', ('Bird', 'Fire', 75, 'None.', 250, 100, 800,
+                                  750)),
+    ]
+    setup += [(craftsman, 'transfer', (player, 10)) for player in players]
+
+    balances = dict.fromkeys(players, 10)
+    allowances = {}
+    calls = []
+    for _ in range(int(50000 * scale)):
+        sender = rand.choice(players)
+        roll = rand.random()
+        if roll < 0.5:
+            to_address = rand.choice(players)
+            if balances[sender] and to_address != sender:
+                balances[sender] -= 1
+                balances[to_address] += 1
+                calls.append((sender, 'transfer', (to_address, 1)))
+        elif roll < 0.6:
+            delegate = rand.choice(players)
+            allowances[(sender, delegate)] = 2
+            calls.append((sender, 'approve', (delegate, 2)))
+        elif roll < 0.7 and allowances:
+            owner, delegate = allowances.popitem()[0]
+            if balances[owner] and owner != delegate:
+                balances[owner] -= 1
+                balances[delegate] += 1
+                calls.append((delegate, 'transfer_from',
+                              (owner, delegate, 1)))
+        else:
+            calls.append((sender, 'get_characteristics', ()))
+    return Workload('pikciorealms_card', pikciorealms_card.PikcioRealmsCard,
+                    setup, calls)
+
+
+WORKLOADS = {
+    'shares': shares_cap_table,
+    'vote': vote_election,
+    'permission': permission_gateway,
+    'loyalty_card': loyalty_card_pos,
+    'pikciorealms_card': pikciorealms_card_trading,
+}
+# type: Dict[str, Callable[[Random, float], Workload]]
+"""Workload generators by name."""
@@ -0,0 +1,181 @@
+"""Helpers shared by the token modules of this repository.
+
+Each token module keeps its state in an instance of its token class, so that
+one process can host as many tokens as needed. The module functions and
+attributes are a facade over a default instance, held by the _token attribute
+of the module: install_facade makes the state of that instance readable and
+assignable as attributes of the module.
+
+Token classes also state whether an empty account is the same as a missing
+one, in their MISSING_BALANCE_MEANS_ZERO attribute. The balance helpers below
+apply that policy to each token, where base functions follow
+base.missing_balance_means_zero, which is global to the process.
+"""
+import sys
+import types
+
+from pikciotok import base
+
+
+# Missing balance policy
+
+def balance(token, address) -> int:
+    """Gives the balance of an account of a token. A missing account reads as
+    0 if the token MISSING_BALANCE_MEANS_ZERO, and raises a KeyError
+    otherwise."""
+    if token.MISSING_BALANCE_MEANS_ZERO:
+        return token.balance_of.get(address, 0)
+    return token.balance_of[address]
+
+
+def settle(token, *addresses):
+    """Applies the missing balance policy of a token to accounts a base
+    function may have emptied: empty accounts are removed if the token
+    MISSING_BALANCE_MEANS_ZERO, and kept with a balance of 0 otherwise.
+
+    base removes empty accounts depending on base.missing_balance_means_zero,
+    which is global to the process. Tokens leave it as it is, so that tokens
+    of different types can run at the same time, and settle the accounts
+    they debit instead."""
+    balance_of = token.balance_of
+    if token.MISSING_BALANCE_MEANS_ZERO:
+        for address in addresses:
+            if balance_of.get(address) == 0:
+                del balance_of[address]
+    else:
+        for address in addresses:
+            if address not in balance_of:
+                balance_of[address] = 0
+
+
+def _open(token, address):
+    """Prepares an account for a base function debiting it, so that base
+    reads it as the token would whatever base.missing_balance_means_zero is:
+    a missing account is opened with a balance of 0 if the token
+    MISSING_BALANCE_MEANS_ZERO, and raises a KeyError otherwise."""
+    balance_of = token.balance_of
+    if address not in balance_of:
+        if not token.MISSING_BALANCE_MEANS_ZERO:
+            raise KeyError(address)
+        balance_of[address] = 0
+
+
+def move(token, sender, to_address, amount: int):
+    """Moves an amount between accounts of a token, as base.Balances does,
+    applying the missing balance policy of the token. No event is fired.
+
+    Balances which move amounts themselves, such as the sharded balances of
+    the runtime folder, are given the move with the policy of the token.
+    """
+    balance_of = token.balance_of
+    if hasattr(balance_of, 'transfer'):
+        balance_of.transfer(sender, to_address, amount,
+                            drop_zero=token.MISSING_BALANCE_MEANS_ZERO)
+        return
+    _open(token, sender)
+    try:
+        base.Balances(balance_of).transfer(sender, to_address, amount)
+    finally:
+        settle(token, sender)
+
+
+def transfer(token, sender, to_address, amount: int) -> bool:
+    """Moves an amount between accounts of a token, as base.transfer does,
+    applying the missing balance policy of the token."""
+    if hasattr(token.balance_of, 'transfer'):
+        move(token, sender, to_address, amount)
+        base.transferred(sender=sender, to_address=to_address, amount=amount)
+        return True
+    _open(token, sender)
+    try:
+        return base.transfer(token.balance_of, sender, to_address, amount)
+    finally:
+        settle(token, sender)
+
+
+def allowance(token, owner, delegate) -> int:
+    """Gives the amount a delegate can spend on behalf of an owner, 0 if
+    there is no such allowance.
+
+    Allowances which read amounts themselves, such as the allowance stores
+    of the runtime folder, are read with their allowance method.
+    """
+    allowances = token.allowances
+    if hasattr(allowances, 'spend'):
+        return allowances.allowance(owner, delegate)
+    return base.Allowances(allowances).get_one(owner, delegate)
+
+
+def transfer_from(token, delegate, from_address, to_address,
+                  amount: int) -> bool:
+    """Moves an amount on behalf of the owner of an account, as
+    base.transfer_from does, applying the missing balance policy of the
+    token.
+
+    Allowances which have a spend method, such as allowance stores, are
+    spent with it, and balances with a transfer method move the amount
+    themselves.
+    """
+    allowances = token.allowances
+    store = hasattr(allowances, 'spend')
+    if store or hasattr(token.balance_of, 'transfer'):
+        current = (allowances.allowance(from_address, delegate) if store
+                   else base.Allowances(allowances).get_one(from_address,
+                                                            delegate))
+        if current < amount:
+            raise ValueError("'{}' is not allowed to spend {} of '{}'".format(
+                delegate, amount, from_address
+            ))
+        transfer(token, from_address, to_address, amount)
+        if store:
+            allowances.spend(from_address, delegate, amount)
+        else:
+            allowances[from_address][delegate] = current - amount
+        return True
+    _open(token, from_address)
+    try:
+        return base.transfer_from(token.balance_of, allowances, delegate,
+                                  from_address, to_address, amount)
+    finally:
+        settle(token, from_address)
+
+
+def burn(token, total_supply: int, sender, amount: int) -> int:
+    """Destroys an amount of the account of the sender, as base.burn does,
+    applying the missing balance policy of the token.
+
+    :return: The new total supply.
+    """
+    _open(token, sender)
+    try:
+        return base.burn(token.balance_of, total_supply, sender, amount)
+    finally:
+        settle(token, sender)
+
+
+# Module facade
+
+class _Facade(types.ModuleType):
+    """The class of token modules once their facade is installed."""
+
+    def __getattr__(self, attribute: str):
+        token = vars(self).get('_token')
+        if token is not None and attribute in type(token).__slots__:
+            return getattr(token, attribute)
+        raise AttributeError("module '{}' has no attribute '{}'".format(
+            self.__name__, attribute
+        ))
+
+    def __setattr__(self, attribute: str, value):
+        token = vars(self).get('_token')
+        if token is not None and attribute in type(token).__slots__:
+            setattr(token, attribute, value)
+        else:
+            super().__setattr__(attribute, value)
+
+
+def install_facade(module_name: str):
+    """Exposes the state of the default instance of a token module, its
+    _token attribute, as module attributes. State attributes assigned on the
+    module are assigned on the default instance."""
+    sys.modules[module_name].__class__ = _Facade
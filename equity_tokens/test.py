@@ -3,6 +3,13 @@ rules and transferring a particular amount to a shareholder.
 
 This is not a unit test.
 """
+import os
+import sys
+
+# Tokens share helpers from the common folder.
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'
+))
 
 # We need to override the context sender to mimic a call from a particular
 # account.
@@ -11,34 +11,20 @@ This token can be configured to give 3 different types of permissions:
   Eat 2 cookies, Get 4 seats at a concert, etc...
 
 The type influences the side effect at the moment the token is used only.
-"""
 
+The token state lives in Permission instances, so that one process can host
+as many permissions as needed. The module functions and attributes are a
+facade over a default instance.
+"""
 from pikciotok import base, context, events
 
+import token_support
+
 _TOKEN_VERSION = "T1.0"
 
-name = ''
-"""The friendly name of the token"""
-symbol = ''
-"""The symbol of the token currency. Should be 3 or 4 characters long."""
 _decimals = 0  # A permission cannot be split.
 """Maximum number of decimals to express any amount of that token."""
-total_supply = 0
-"""The current amount of the token on the market, in case some has been minted 
-or burnt."""
-balance_of = {}
-# type: dict
-"""Maps customers addresses to their current balance."""
-allowances = {}
-# type: dict
-"""Gives for each customer a map to the amount delegates are allowed to spend 
-on their behalf."""
-
-
-base.missing_balance_means_zero = True
-"""Someone who has no token has no permission. Thus having no account is 
-equivalent.
-"""
+
 
 # Constants
 
@@ -65,16 +51,6 @@ anyone else once the customer has entered the concert room. (limited seats,
 unique usage).
 """
 
-# Special attributes
-authority = ''
-"""The primary account which dispatches tokens."""
-
-permission_type = _PERM_TYPE_REUSABLE
-"""Defines the behaviour of the token once used."""
-
-is_frozen = False
-"""If True, all permissions are frozen and no one can access."""
-
 # Events
 revoked = events.register("revoked", "user", "amount")
 """Fired when the authority transfers back some token from an user."""
@@ -84,193 +60,270 @@ access_denied = events.register("access_denied", "user", "why")
 """Fired when the authority states that an user can't access"""
 
 
-# Properties
-
-def get_name() -> str:
-    """Gets token name."""
-    return name
-
-
-def get_symbol() -> str:
-    """Gets token symbol."""
-    return symbol
-
-
-def get_decimals() -> int:
-    """Gets the number of decimals of the token."""
-    return _decimals
-
-
-def get_total_supply() -> int:
-    """Returns the current total supply for the token"""
-    return total_supply
-
-
-def get_balance(address: str) -> int:
-    """Gives the current balance of the specified account."""
-    return base.Balances(balance_of).get(address)
-
-
-def get_allowance(allowed_address: str, on_address: str) -> int:
-    """Gives the current allowance of allowed_address on on_address account."""
-    return base.Allowances(allowances).get_one(on_address, allowed_address)
-
-
-# Actions
-
-def transfer(to_address: str, amount: int) -> bool:
-    """Execute a transfer from the sender to the specified address."""
-    return base.transfer(balance_of, context.sender, to_address, amount)
-
-
-def mint(amount: int) -> int:
-    """Request tokens creation and add created amount to sender balance.
-    Returns new total supply.
-    """
-    global total_supply
-    _assert_is_authority(context.sender)
-    total_supply = base.mint(balance_of, total_supply, context.sender, amount)
-    return total_supply
-
-
-def burn(amount: int) -> int:
-    """Destroy tokens. Tokens are withdrawn from sender's account.
-    Returns new total supply.
-    """
-    global total_supply
-    _assert_is_authority(context.sender)
-    total_supply = base.burn(balance_of, total_supply, context.sender, amount)
-    return total_supply
-
-
-def approve(to_address: str, amount: int) -> bool:
-    """Allow specified address to spend/use some tokens from sender account.
-
-    The approval is set to specified amount.
-    """
-    return base.approve(allowances, context.sender, to_address, amount)
-
-
-def update_approve(to_address: str, delta_amount: int) -> int:
-    """Updates the amount specified address is allowed to spend/use from
-    sender account.
-
-    The approval is incremented of the specified amount. Negative amounts
-    decrease the approval.
-    """
-    return base.update_approve(allowances, context.sender, to_address,
-                               delta_amount)
-
-
-def transfer_from(from_address: str, to_address: str, amount: int) -> bool:
-    """Executes a transfer on behalf of another address to specified recipient.
-
-    Operation is only allowed if sender has sufficient allowance on the source
-    account.
-    """
-    return base.transfer_from(balance_of, allowances, context.sender,
-                              from_address, to_address, amount)
-
-
-def init(supply: int, name_: str, symbol_: str):
-    """Initialise this token with a new name, symbol and supply."""
-    global total_supply, name, symbol, authority
-
-    name, symbol = name_, symbol_
-    balance_of[context.sender] = total_supply = (supply * 10 ** _decimals)
-    authority = context.sender  # Creator becomes the authority.
-
-
-def _assert_is_authority(address: str):
-    """Raises an exception if provided address is not the authority"""
-    if address != authority or not authority:
-        raise ValueError("'{} is not the authority".format(address))
-
-
-def _assert_is_not_frozen():
-    """Raises an exception if permission tokens are currently frozen."""
-    if is_frozen:
-        raise ValueError("All tokens are currently frozen.")
-
-
-# Global accessors
-
-def allowed_users_count() -> int:
-    """Gives the current number of users with at least one token."""
-    return len(balance_of) - 1  # Minus the authority.
-
-
-def allowed_tokens_count() -> int:
-    """Gives the total number of tokens given to users at the moment."""
-    return total_supply - get_balance(authority)
-
-
-def is_permission_frozen() -> bool:
-    """Tells if all allowed tokens are currently frozen and can't be used."""
-    return is_frozen
-
-
-def get_permission_type() -> int:
-    """Returns a value indicating how a token behaves when used."""
-    return permission_type
-
-
-def freeze_permission(state: bool) -> bool:
-    """Defines the token frozen state and returns the previous value."""
-    _assert_is_authority(context.sender)
-    global is_frozen
-    state, is_frozen = is_frozen, state
-    return state
-
-
-def set_permission_type(typ: int) -> int:
-    """Defines the token type and returns the previous value."""
-    _assert_is_authority(context.sender)
-    global permission_type
-    typ, permission_type = permission_type, typ
-    return typ
-
-
-# Permission operations
-
-def revoke(address: str, amount: int) -> int:
-    """Removes specified amount (at max) of tokens from provided address.
-
-    Tokens go back to the authority.
-
-    :return: The final balance of the address.
-    """
-    _assert_is_authority(context.sender)
-    amount = min(amount, get_balance(address))
-    base.Balances(balance_of).transfer(context.sender, address, amount)
-    revoked(user=address, amount=amount)
-
-    return base.Balances(balance_of).get(address)
-
-
-def use_token() -> bool:
-    """Grants or deny access to the sender, depending on the tokens owned."""
-    global total_supply
-
-    try:
-        # First check base permission requirements
-        _assert_is_not_frozen()
-        base.Balances(balance_of).require(context.sender, 1)
-    except ValueError as e:
-        access_denied(user=context.sender, why=str(e))
-        return False
-
-    # then handle consequences regarding token type.
-    success = True
-    if permission_type == _PERM_TYPE_RETURNED:
-        success = transfer(authority, 1)
-    elif permission_type == _PERM_TYPE_CONSUMED:
-        total_supply = burn(1)
-
-    # Finally, raise appropriate event
-    if success:
-        access_granted(user=context.sender)
-    else:
-        access_denied(user=context.sender, why="Unknown error")
-
-    return success
+class Permission(object):
+    """An access to a resource."""
+
+    __slots__ = ('name', 'symbol', 'total_supply', 'balance_of', 'allowances',
+                 'authority', 'permission_type', 'is_frozen')
+
+    MUTATORS = ('init', 'transfer', 'mint', 'burn', 'approve',
+                'update_approve', 'transfer_from', 'freeze_permission',
+                'set_permission_type', 'revoke', 'use_token')
+    """Names of the methods changing the state of the token."""
+
+    ACCOUNTS = {
+        'transfer': ('sender', 'to_address'),
+        'approve': ('sender',),
+        'update_approve': ('sender',),
+        'transfer_from': ('from_address', 'to_address'),
+        'get_balance': ('address',),
+        'get_allowance': ('on_address',),
+        'revoke': ('sender', 'address'),
+        'use_token': ('sender', '_returned_to'),
+    }
+    """Accounts touched by the methods which touch nothing but accounts, named
+    after their parameters, "sender" or attributes of the token. Methods not
+    listed may touch the whole token."""
+
+    MISSING_BALANCE_MEANS_ZERO = True
+    """Someone who has no token has no permission. Thus having no account is
+    equivalent."""
+
+    def __init__(self):
+        self.name = ''
+        """The friendly name of the token"""
+        self.symbol = ''
+        """The symbol of the token currency. Should be 3 or 4 characters
+        long."""
+        self.total_supply = 0
+        """The current amount of the token on the market, in case some has been
+        minted or burnt."""
+        self.balance_of = {}
+        # type: dict
+        """Maps customers addresses to their current balance."""
+        self.allowances = {}
+        # type: dict
+        """Gives for each customer a map to the amount delegates are allowed to
+        spend on their behalf."""
+
+        # Special attributes
+        self.authority = ''
+        """The primary account which dispatches tokens."""
+        self.permission_type = _PERM_TYPE_REUSABLE
+        """Defines the behaviour of the token once used."""
+        self.is_frozen = False
+        """If True, all permissions are frozen and no one can access."""
+
+    # Properties
+
+    def get_name(self) -> str:
+        """Gets token name."""
+        return self.name
+
+    def get_symbol(self) -> str:
+        """Gets token symbol."""
+        return self.symbol
+
+    def get_decimals(self) -> int:
+        """Gets the number of decimals of the token."""
+        return _decimals
+
+    def get_total_supply(self) -> int:
+        """Returns the current total supply for the token"""
+        return self.total_supply
+
+    def get_balance(self, address: str) -> int:
+        """Gives the current balance of the specified account."""
+        return token_support.balance(self, address)
+
+    def get_allowance(self, allowed_address: str, on_address: str) -> int:
+        """Gives the current allowance of allowed_address on on_address
+        account."""
+        return token_support.allowance(self, on_address, allowed_address)
+
+    # Actions
+
+    def transfer(self, to_address: str, amount: int) -> bool:
+        """Execute a transfer from the sender to the specified address."""
+        return token_support.transfer(self, context.sender, to_address,
+                                      amount)
+
+    def mint(self, amount: int) -> int:
+        """Request tokens creation and add created amount to sender balance.
+        Returns new total supply.
+        """
+        self._assert_is_authority(context.sender)
+        self.total_supply = base.mint(self.balance_of, self.total_supply,
+                                      context.sender, amount)
+        return self.total_supply
+
+    def burn(self, amount: int) -> int:
+        """Destroy tokens. Tokens are withdrawn from sender's account.
+        Returns new total supply.
+        """
+        self._assert_is_authority(context.sender)
+        self.total_supply = token_support.burn(
+            self, self.total_supply, context.sender, amount)
+        return self.total_supply
+
+    def approve(self, to_address: str, amount: int) -> bool:
+        """Allow specified address to spend/use some tokens from sender
+        account.
+
+        The approval is set to specified amount.
+        """
+        return base.approve(self.allowances, context.sender, to_address,
+                            amount)
+
+    def update_approve(self, to_address: str, delta_amount: int) -> int:
+        """Updates the amount specified address is allowed to spend/use from
+        sender account.
+
+        The approval is incremented of the specified amount. Negative amounts
+        decrease the approval.
+        """
+        return base.update_approve(self.allowances, context.sender,
+                                   to_address, delta_amount)
+
+    def transfer_from(self, from_address: str, to_address: str,
+                      amount: int) -> bool:
+        """Executes a transfer on behalf of another address to specified
+        recipient.
+
+        Operation is only allowed if sender has sufficient allowance on the
+        source account.
+        """
+        return token_support.transfer_from(self, context.sender,
+                                           from_address, to_address, amount)
+
+    def init(self, supply: int, name_: str, symbol_: str):
+        """Initialise this token with a new name, symbol and supply."""
+        self.name, self.symbol = name_, symbol_
+        self.balance_of[context.sender] = self.total_supply = (
+            supply * 10 ** _decimals
+        )
+        self.authority = context.sender  # Creator becomes the authority.
+
+    def _assert_is_authority(self, address: str):
+        """Raises an exception if provided address is not the authority"""
+        if address != self.authority or not self.authority:
+            raise ValueError("'{} is not the authority".format(address))
+
+    def _assert_is_not_frozen(self):
+        """Raises an exception if permission tokens are currently frozen."""
+        if self.is_frozen:
+            raise ValueError("All tokens are currently frozen.")
+
+    @property
+    def _returned_to(self):
+        """The account receiving the tokens used, if they are returned. Only
+        tokens of that type make use_token touch the account of the authority.
+        """
+        if self.permission_type == _PERM_TYPE_RETURNED:
+            return self.authority
+        return None
+
+    # Global accessors
+
+    def allowed_users_count(self) -> int:
+        """Gives the current number of users with at least one token."""
+        return len(self.balance_of) - 1  # Minus the authority.
+
+    def allowed_tokens_count(self) -> int:
+        """Gives the total number of tokens given to users at the moment."""
+        return self.total_supply - self.get_balance(self.authority)
+
+    def is_permission_frozen(self) -> bool:
+        """Tells if all allowed tokens are currently frozen and can't be used.
+        """
+        return self.is_frozen
+
+    def get_permission_type(self) -> int:
+        """Returns a value indicating how a token behaves when used."""
+        return self.permission_type
+
+    def freeze_permission(self, state: bool) -> bool:
+        """Defines the token frozen state and returns the previous value."""
+        self._assert_is_authority(context.sender)
+        state, self.is_frozen = self.is_frozen, state
+        return state
+
+    def set_permission_type(self, typ: int) -> int:
+        """Defines the token type and returns the previous value."""
+        self._assert_is_authority(context.sender)
+        typ, self.permission_type = self.permission_type, typ
+        return typ
+
+    # Permission operations
+
+    def revoke(self, address: str, amount: int) -> int:
+        """Removes specified amount (at max) of tokens from provided address.
+
+        Tokens go back to the authority.
+
+        :return: The final balance of the address.
+        """
+        self._assert_is_authority(context.sender)
+        amount = min(amount, self.get_balance(address))
+        token_support.move(self, context.sender, address, amount)
+        revoked(user=address, amount=amount)
+
+        return token_support.balance(self, address)
+
+    def use_token(self) -> bool:
+        """Grants or deny access to the sender, depending on the tokens owned.
+        """
+        try:
+            # First check base permission requirements
+            self._assert_is_not_frozen()
+            base.Balances(self.balance_of).require(context.sender, 1)
+        except ValueError as e:
+            access_denied(user=context.sender, why=str(e))
+            return False
+
+        # then handle consequences regarding token type.
+        success = True
+        if self.permission_type == _PERM_TYPE_RETURNED:
+            success = self.transfer(self.authority, 1)
+        elif self.permission_type == _PERM_TYPE_CONSUMED:
+            self.total_supply = self.burn(1)
+
+        # Finally, raise appropriate event
+        if success:
+            access_granted(user=context.sender)
+        else:
+            access_denied(user=context.sender, why="Unknown error")
+
+        return success
+
+
+# Default instance
+
+_token = Permission()
+"""The permission behind the module functions."""
+
+
+token_support.install_facade(__name__)
+
+
+get_name = _token.get_name
+get_symbol = _token.get_symbol
+get_decimals = _token.get_decimals
+get_total_supply = _token.get_total_supply
+get_balance = _token.get_balance
+get_allowance = _token.get_allowance
+transfer = _token.transfer
+mint = _token.mint
+burn = _token.burn
+approve = _token.approve
+update_approve = _token.update_approve
+transfer_from = _token.transfer_from
+init = _token.init
+allowed_users_count = _token.allowed_users_count
+allowed_tokens_count = _token.allowed_tokens_count
+is_permission_frozen = _token.is_permission_frozen
+get_permission_type = _token.get_permission_type
+freeze_permission = _token.freeze_permission
+set_permission_type = _token.set_permission_type
+revoke = _token.revoke
+use_token = _token.use_token
@@ -9,6 +9,14 @@ to use the token.
 
 This is not a unit test.
 """
+import os
+import sys
+
+# Tokens share helpers from the common folder.
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'
+))
+
 from pikciotok import context
 
 import permission
@@ -0,0 +1,393 @@
+"""The allowance store keeps the allowances of a token in a single flat map,
+instead of a map per owner.
+
+Allowances are keyed by the pair of their owner and delegate. By default,
+the addresses are the ids of the pair: the key is built from the strings the
+token already holds, without looking anything up, and hashing it reuses the
+hashes the strings keep. A store can instead be given an AddressTable (see
+interning), possibly shared with the interned balances of the token: keys
+are then the ids of both addresses packed in one integer, which takes less
+memory, but each access looks the addresses up in the table. Addresses must
+then be strings. An allowance set to 0 is removed, so the store only holds
+the allowances which can still be spent.
+
+Allowances can expire. An expired allowance reads as missing and is removed
+when it is read or set again, or by a sweep removing all the expired
+allowances at once. A store can give an expiry to every new allowance, so
+that allowances set by the tokens through base functions expire as well.
+
+The store is a mapping from owners to the map of their allowances, which
+tokens use as their allowances attribute: base functions work on it
+unchanged. Maps of owners are views on the store. Reading or setting an
+allowance is a single lookup in the flat map, but iterating the allowances of
+an owner scans the store. Expired allowances are still counted and listed
+until they are removed: sweeping before a snapshot leaves them out.
+
+The token helpers of the common folder read and spend the allowances of a
+store with allowance and spend, a single lookup each, rather than through the
+view of their owner.
+"""
+import heapq
+import itertools
+import time
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple, Union
+
+from interning import AddressTable
+
+Key = Union[Tuple[Hashable, Hashable], int]
+"""Owner and delegate of an allowance, or their ids packed in an integer if
+the store has a table."""
+
+_ID_BITS = 32
+"""Bits of a packed key holding the id of the delegate."""
+_DELEGATE_MASK = (1 << _ID_BITS) - 1
+
+
+class AllowanceStore(MutableMapping):
+    """Allowances of a token, in a map keyed by (owner, delegate) pairs.
+
+    :param ttl: If provided, the number of seconds after which new
+        allowances expire, unless given another expiry.
+    :param table: If provided, the table giving the ids of the addresses,
+        which then key the allowances.
+    """
+
+    def __init__(self, ttl: float = None, table: AddressTable = None):
+        self.ttl = ttl
+        self.table = table
+        self._amounts = {}
+        # type: Dict[Key, int]
+        """Allowances by key."""
+        self._expiries = {}
+        # type: Dict[Key, float]
+        """Expiry time of the allowances which expire, by key."""
+        self._deadlines = []
+        # type: List[Tuple[float, int, Key]]
+        """Heap of (expiry time, push number, key). Push numbers keep keys
+        from being compared. Entries whose allowance has been removed or given
+        another expiry are left until they are popped."""
+        self._pushes = itertools.count()
+        self._delegates = {} if table is None else array('I')
+        # type: Union[Dict[Hashable, int], array]
+        """Number of allowances of each owner with allowances, by owner. If
+        the store has a table, number of allowances of each owner by id."""
+        self._owners = 0
+        """Number of owners with allowances, if the store has a table."""
+        self._view = _OwnerAllowances(self, None)
+        """The map of the last owner asked for. Base functions ask for the
+        same owner several times in a call."""
+
+    # Keys
+
+    def _key(self, owner, delegate) -> Optional[Key]:
+        """Gives the key of an allowance, or None if the store has a table
+        which lacks either address."""
+        table = self.table
+        if table is None:
+            return owner, delegate
+        owner_id = table.id_of(owner)
+        delegate_id = table.id_of(delegate)
+        if owner_id is None or delegate_id is None:
+            return None
+        return owner_id << _ID_BITS | delegate_id
+
+    def _new_key(self, owner, delegate) -> Key:
+        """Gives the key of an allowance, adding its addresses to the table of
+        the store if needed."""
+        table = self.table
+        if table is None:
+            return owner, delegate
+        return table.intern(owner) << _ID_BITS | table.intern(delegate)
+
+    def _owner_key(self, owner) -> Optional[Hashable]:
+        """Gives the owner as counted in _delegates, or None if the store has
+        a table which lacks the owner."""
+        return owner if self.table is None else self.table.id_of(owner)
+
+    def _count(self, owner) -> int:
+        """Gives the number of allowances of an owner, as counted in
+        _delegates."""
+        delegates = self._delegates
+        if self.table is None:
+            return delegates.get(owner, 0)
+        if owner is None or owner >= len(delegates):
+            return 0
+        return delegates[owner]
+
+    def _add_count(self, owner, delta: int):
+        """Adds delta to the number of allowances of an owner, as counted in
+        _delegates."""
+        delegates = self._delegates
+        if self.table is None:
+            count = delegates.get(owner, 0) + delta
+            if count:
+                delegates[owner] = count
+            else:
+                del delegates[owner]
+            return
+        missing = owner + 1 - len(delegates)
+        if missing > 0:
+            delegates.extend(itertools.repeat(0, missing))
+        count = delegates[owner] + delta
+        delegates[owner] = count
+        if count == delta:
+            self._owners += 1
+        elif not count:
+            self._owners -= 1
+
+    def _owner_of(self, key: Key) -> Hashable:
+        """Gives the owner of a key, as counted in _delegates."""
+        return key[0] if self.table is None else key >> _ID_BITS
+
+    def _pair_of(self, key: Key) -> Tuple[Any, Any]:
+        """Gives the owner and delegate addresses of a key."""
+        if self.table is None:
+            return key
+        address_of = self.table.address_of
+        return address_of(key >> _ID_BITS), address_of(key & _DELEGATE_MASK)
+
+    # Allowances
+
+    def _amount(self, key: Key):
+        """Gives the amount of an allowance, or None if it is missing or has
+        expired. Expired allowances are removed."""
+        amount = self._amounts.get(key)
+        if amount is not None and self._expiries:
+            expires_at = self._expiries.get(key)
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                return None
+        return amount
+
+    def _set(self, key: Key, amount: int, expires_at: float = None):
+        """Sets an allowance, removing it if amount is 0. A new allowance, or
+        one which has expired, gets an expiry after ttl seconds if none is
+        provided; an allowance still running keeps its expiry."""
+        current = self._amounts.get(key)
+        if current is not None and self._expiries:
+            current = self._amount(key)
+        if current is None:
+            if not amount:
+                return
+            self._add_count(self._owner_of(key), 1)
+            if expires_at is None and self.ttl is not None:
+                expires_at = time.time() + self.ttl
+        elif not amount:
+            self._remove(key)
+            return
+        self._amounts[key] = amount
+        if expires_at is not None:
+            self._expiries[key] = expires_at
+            heapq.heappush(self._deadlines,
+                           (expires_at, next(self._pushes), key))
+            if len(self._deadlines) > 2 * len(self._expiries) + 1024:
+                self._compact()
+
+    def _remove(self, key: Key):
+        del self._amounts[key]
+        self._expiries.pop(key, None)
+        self._add_count(self._owner_of(key), -1)
+
+    def _compact(self):
+        """Drops the entries of the heap of deadlines which no longer match
+        an allowance."""
+        pushes = self._pushes
+        self._deadlines = [(expires_at, next(pushes), key)
+                           for key, expires_at in self._expiries.items()]
+        heapq.heapify(self._deadlines)
+
+    def allowance(self, owner, delegate) -> int:
+        """Gives the amount a delegate can spend on behalf of an owner, 0 if
+        there is no such allowance."""
+        key = ((owner, delegate) if self.table is None
+               else self._key(owner, delegate))
+        amount = self._amounts.get(key)
+        if amount is not None and self._expiries:
+            amount = self._amount(key)
+        return amount or 0
+
+    def spend(self, owner, delegate, amount: int):
+        """Takes an amount from the allowance of a delegate on an owner, as a
+        transfer on behalf of the owner does. Raises a ValueError if the
+        allowance is too low."""
+        if amount < 0:
+            raise ValueError('Cannot spend a negative amount')
+        key = ((owner, delegate) if self.table is None
+               else self._key(owner, delegate))
+        allowance = self._amounts.get(key)
+        if allowance is not None and self._expiries:
+            allowance = self._amount(key)
+        if (allowance or 0) < amount:
+            raise ValueError("'{}' is not allowed to spend {} of '{}'".format(
+                delegate, amount, owner
+            ))
+        if not amount:
+            return
+        if allowance == amount:
+            self._remove(key)
+        else:
+            self._amounts[key] = allowance - amount
+
+    def approve(self, owner, delegate, amount: int, expires_at: float = None):
+        """Sets the amount a delegate can spend on behalf of an owner.
+
+        :param expires_at: The time the allowance expires, as given by
+            time.time. By default, a new allowance expires after ttl seconds
+            and an existing one keeps its expiry.
+        """
+        self._set(self._new_key(owner, delegate), amount, expires_at)
+
+    def expiry(self, owner, delegate):
+        """Gives the time an allowance expires, or None if it does not."""
+        key = self._key(owner, delegate)
+        if self._amount(key) is None:
+            raise KeyError((owner, delegate))
+        return self._expiries.get(key)
+
+    def sweep(self, now: float = None) -> int:
+        """Removes all the allowances expired at provided time, now by
+        default.
+
+        :return: The number of allowances removed.
+        """
+        now = time.time() if now is None else now
+        deadlines = self._deadlines
+        removed = 0
+        while deadlines and deadlines[0][0] <= now:
+            expires_at, _, key = heapq.heappop(deadlines)
+            if self._expiries.get(key) == expires_at:
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def entries(self) -> Iterator[Tuple[Any, Any, int]]:
+        """Gives the (owner, delegate, amount) of all the allowances."""
+        pair_of = self._pair_of
+        for key, amount in self._amounts.items():
+            owner, delegate = pair_of(key)
+            yield owner, delegate, amount
+
+    # Map of owners
+
+    def _view_of(self, owner) -> '_OwnerAllowances':
+        view = self._view
+        if view.owner != owner:
+            view = self._view = _OwnerAllowances(self, owner)
+        return view
+
+    def __getitem__(self, owner) -> '_OwnerAllowances':
+        if not self._count(self._owner_key(owner)):
+            raise KeyError(owner)
+        view = self._view
+        return view if view.owner == owner else self._view_of(owner)
+
+    def get(self, owner, default=None):
+        if not self._count(self._owner_key(owner)):
+            return default
+        view = self._view
+        return view if view.owner == owner else self._view_of(owner)
+
+    def setdefault(self, owner, default=None) -> '_OwnerAllowances':
+        """Gives the allowances of an owner, even if it has none yet, so that
+        they can be set."""
+        if default:
+            self[owner] = default
+        return self._view_of(owner)
+
+    def __contains__(self, owner) -> bool:
+        return self._count(self._owner_key(owner)) > 0
+
+    def __setitem__(self, owner, allowances: Dict[Any, int]):
+        """Replaces all the allowances of an owner."""
+        if owner in self:
+            del self[owner]
+        for delegate, amount in allowances.items():
+            self._set(self._new_key(owner, delegate), amount)
+
+    def __delitem__(self, owner):
+        if owner not in self:
+            raise KeyError(owner)
+        for key in self._keys_of(owner):
+            self._remove(key)
+
+    def _keys_of(self, owner) -> List[Key]:
+        """Gives the keys of the allowances of an owner, scanning the
+        store."""
+        if self.table is None:
+            return [key for key in self._amounts if key[0] == owner]
+        owner_id = self.table.id_of(owner)
+        return [key for key in self._amounts if key >> _ID_BITS == owner_id]
+
+    def __len__(self) -> int:
+        return len(self._delegates) if self.table is None else self._owners
+
+    def __iter__(self) -> Iterator:
+        if self.table is None:
+            return iter(list(self._delegates))
+        return iter([self.table.address_of(owner_id)
+                     for owner_id, count in enumerate(self._delegates)
+                     if count])
+
+    def items(self) -> List[Tuple[Any, Dict[Any, int]]]:
+        """Gives the owners and a copy of their allowances, in one scan of
+        the store."""
+        by_owner = {}
+        for owner, delegate, amount in self.entries():
+            by_owner.setdefault(owner, {})[delegate] = amount
+        return list(by_owner.items())
+
+
+class _OwnerAllowances(MutableMapping):
+    """The allowances of an owner, as a map of delegates to amounts.
+
+    Allowances set to 0 are removed, so a missing allowance reads as 0
+    instead of raising a KeyError.
+    """
+
+    __slots__ = ('store', 'owner')
+
+    def __init__(self, store: AllowanceStore, owner):
+        self.store = store
+        self.owner = owner
+
+    def __getitem__(self, delegate) -> int:
+        return self.get(delegate, 0)
+
+    def get(self, delegate, default=None):
+        store = self.store
+        key = ((self.owner, delegate) if store.table is None
+               else store._key(self.owner, delegate))
+        amount = store._amounts.get(key)
+        if amount is not None and store._expiries:
+            amount = store._amount(key)
+        return default if amount is None else amount
+
+    def __contains__(self, delegate) -> bool:
+        store = self.store
+        return store._amount(store._key(self.owner, delegate)) is not None
+
+    def __setitem__(self, delegate, amount: int):
+        store = self.store
+        store._set(store._new_key(self.owner, delegate), amount)
+
+    def __delitem__(self, delegate):
+        store = self.store
+        key = store._key(self.owner, delegate)
+        if store._amount(key) is None:
+            raise KeyError(delegate)
+        store._remove(key)
+
+    def __len__(self) -> int:
+        store = self.store
+        return store._count(store._owner_key(self.owner))
+
+    def __iter__(self) -> Iterator:
+        store = self.store
+        for key in store._keys_of(self.owner):
+            yield store._pair_of(key)[1]
+
+    def __reduce__(self) -> Tuple[Any, tuple]:
+        # Copies are plain maps, detached from the store.
+        return dict, (dict(self.items()),)
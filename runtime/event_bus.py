@@ -0,0 +1,295 @@
+"""The event bus takes the emission of events off the path of token calls.
+
+Token modules fire events through callables created by events.register, which
+write each event as soon as it is fired. Once attached to a module, the bus
+replaces those callables: firing an event only queues it, and a background
+thread delivers queued events by batches to pluggable sinks (a file, a local
+socket, an in-memory ring buffer...).
+
+Events are named after the module attribute holding them. For instance,
+base.minted events are named "minted".
+"""
+import collections
+import copy
+import json
+import socket
+import threading
+import time
+import types
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from pikciotok import base
+
+Event = Tuple[float, str, Dict[str, Any]]
+"""Timestamp, name and fields of an event."""
+
+BLOCK = 'block'
+"""Overflow policy making emitters wait for room in the queue."""
+DROP = 'drop'
+"""Overflow policy dropping events fired while the queue is full."""
+_IMMUTABLE = (int, float, str, bytes, bool, type(None), frozenset)
+"""Types of field values which can be queued as they are."""
+
+
+_EVENT_SIGNATURE = (type(base.minted), getattr(base.minted, '__qualname__',
+                                                None))
+"""Type and qualified name of the callables created by events.register."""
+
+
+def _is_event(obj) -> bool:
+    """Tells if an object is an event created by events.register."""
+    return (type(obj), getattr(obj, '__qualname__', None)) == _EVENT_SIGNATURE
+
+
+def _frozen(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Copies the fields of an event, so that the queued event keeps the
+    values they had when it was fired. Mutable values, such as the lists of
+    candidates or cards given to events, are copied deeply."""
+    return {key: value if isinstance(value, _IMMUTABLE) else
+            copy.deepcopy(value) for key, value in fields.items()}
+
+
+def to_json_lines(batch: Iterable[Event]) -> bytes:
+    """Encodes events as JSON lines, as they would have been printed."""
+    return ''.join(
+        json.dumps(dict(event=name, **fields), default=str) + '\n'
+        for _, name, fields in batch
+    ).encode('utf-8')
+
+
+# Sinks
+
+class Sink(object):
+    """Receives batches of events from the bus, in its background thread."""
+
+    def write(self, batch: List[Event]):
+        """Delivers a batch of events."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Makes sure delivered events are not buffered anymore."""
+
+    def close(self):
+        """Releases the resources of the sink."""
+
+
+class FileSink(Sink):
+    """Appends events to a file, as JSON lines."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'ab')
+
+    def write(self, batch: List[Event]):
+        self._file.write(to_json_lines(batch))
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SocketSink(Sink):
+    """Sends events as JSON lines to a local listener. The connection is
+    opened on first use and opened again after a failure.
+
+    :param address: The path of a Unix socket, or a (host, port) pair.
+    """
+
+    def __init__(self, address: Union[str, Tuple[str, int]]):
+        self.address = address
+        self._socket = None
+
+    def write(self, batch: List[Event]):
+        if self._socket is None:
+            family = (socket.AF_UNIX if isinstance(self.address, str) else
+                      socket.AF_INET)
+            self._socket = socket.socket(family, socket.SOCK_STREAM)
+            try:
+                self._socket.connect(self.address)
+            except OSError:
+                self.close()
+                raise
+        try:
+            self._socket.sendall(to_json_lines(batch))
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class RingBufferSink(Sink):
+    """Keeps the last events in memory.
+
+    :param capacity: The number of events kept. Older events are forgotten.
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self._events = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def write(self, batch: List[Event]):
+        with self._lock:
+            self._events.extend(batch)
+
+    def events(self) -> List[Event]:
+        """Gives the kept events, oldest first."""
+        with self._lock:
+            return list(self._events)
+
+
+# Bus
+
+class EventBus(object):
+    """Queues events fired by token modules and delivers them to sinks from a
+    background thread.
+
+    :param sinks: The sinks receiving the events.
+    :param max_queue: The maximum number of queued events.
+    :param batch_size: The number of queued events triggering a delivery
+        before the flush interval.
+    :param flush_interval: The maximum time, in seconds, an event stays
+        queued.
+    :param overflow: What to do with events fired while the queue is full:
+        BLOCK or DROP.
+    """
+
+    def __init__(self, sinks: Iterable[Sink] = (), max_queue: int = 65536,
+                 batch_size: int = 1024, flush_interval: float = 0.05,
+                 overflow: str = BLOCK):
+        if overflow not in (BLOCK, DROP):
+            raise ValueError("Invalid overflow policy: '{}'".format(overflow))
+        self.sinks = list(sinks)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+
+        self.dropped = 0
+        """Number of events dropped because the queue was full."""
+        self.errors = 0
+        """Number of batches a sink failed to deliver."""
+
+        self._queue = []
+        # type: List[Event]
+        self._delivering = 0
+        """Number of events taken from the queue but not delivered yet."""
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+        """Notified when the queue should be delivered."""
+        self._room = threading.Condition(self._lock)
+        """Notified when events leave the queue."""
+        self._attached = []
+        # type: List[Tuple[types.ModuleType, str, Any]]
+        """(module, attribute, original event) of patched events."""
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def emit(self, name: str, fields: Dict[str, Any]):
+        """Queues an event. Its fields are copied first: changing them, or
+        the values they hold, afterwards does not change the event."""
+        fields = _frozen(fields)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Event bus is closed")
+            queue = self._queue
+            if len(queue) >= self.max_queue:
+                if self.overflow == DROP:
+                    self.dropped += 1
+                    return
+                while len(self._queue) >= self.max_queue:
+                    self._pending.notify()
+                    self._room.wait()
+                queue = self._queue
+            queue.append((time.time(), name, fields))
+            if len(queue) == self.batch_size:
+                self._pending.notify()
+
+    def attach(self, module: types.ModuleType, *names: str):
+        """Routes the events of a module through the bus.
+
+        :param names: The attributes of the module holding events. If none is
+            provided, all the events of the module are attached.
+        """
+        names = names or [name for name, obj in vars(module).items()
+                          if _is_event(obj)]
+        for name in names:
+            original = getattr(module, name)
+            if not _is_event(original):
+                raise ValueError("'{}' is not an event of {}".format(
+                    name, module.__name__
+                ))
+            self._attached.append((module, name, original))
+            setattr(module, name, self._emitter(name))
+
+    def _emitter(self, name: str):
+        """Creates a callable queuing events of provided name."""
+        emit = self.emit
+
+        def fire(**fields):
+            emit(name, fields)
+
+        fire.__name__ = name
+        return fire
+
+    def detach(self):
+        """Gives back their original events to all attached modules."""
+        for module, name, original in reversed(self._attached):
+            setattr(module, name, original)
+        self._attached = []
+
+    def flush(self):
+        """Blocks until all the events fired so far have been delivered."""
+        with self._lock:
+            while self._queue or self._delivering:
+                self._pending.notify()
+                self._room.wait()
+
+    def close(self):
+        """Detaches the bus, delivers the remaining events and closes the
+        sinks."""
+        self.detach()
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._pending.notify()
+        self._thread.join()
+        for sink in self.sinks:
+            sink.close()
+
+    def _run(self):
+        """Delivers the queued events until the bus is closed."""
+        while True:
+            with self._lock:
+                if len(self._queue) < self.batch_size and not self._closed:
+                    self._pending.wait(self.flush_interval)
+                if self._closed and not self._queue:
+                    return
+                batch, self._queue = self._queue, []
+                self._delivering = len(batch)
+            if batch:
+                self._deliver(batch)
+            with self._lock:
+                self._delivering = 0
+                self._room.notify_all()
+
+    def _deliver(self, batch: List[Event]):
+        """Writes a batch to all the sinks. A failing sink does not prevent
+        the others from receiving the batch."""
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+                sink.flush()
+            except Exception:
+                self.errors += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
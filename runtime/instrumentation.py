@@ -0,0 +1,242 @@
+"""Instrumentation measures the calls made to tokens: how many, how many
+failed and how long they took.
+
+Instrumentation is opt-in. Enabling it on a token class, or on a token
+module, wraps its public methods (and any other method asked for). Disabling
+it puts the original methods back, so that a token which is not instrumented
+runs exactly as before, without any overhead.
+
+Durations are kept in histograms with power of two buckets, from which
+percentiles are estimated. Profiler hooks can also be run around one call out
+of N, to profile samples of the traffic.
+
+The module functions are a facade over a default Instrumentation, so that an
+exporter can scrape metrics with snapshot().
+"""
+import contextlib
+import cProfile
+import functools
+import inspect
+import threading
+import time
+import types
+from typing import Any, Callable, ContextManager, Dict, List, Tuple
+
+_BUCKETS = 64
+"""Number of buckets of the histograms. Bucket i holds durations up to 2^i
+nanoseconds."""
+
+
+class OperationMetrics(object):
+    """Measures of the calls of one method."""
+
+    __slots__ = ('calls', 'errors', 'total_ns', 'max_ns', 'buckets', '_lock')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        """Number of calls which raised an exception."""
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * _BUCKETS
+        """Bucket i counts the calls which took less than 2^i nanoseconds,
+        and at least 2^(i - 1)."""
+        self._lock = threading.Lock()
+
+    def record(self, duration_ns: int, failed: bool):
+        """Adds a call to the measures."""
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.total_ns += duration_ns
+            if duration_ns > self.max_ns:
+                self.max_ns = duration_ns
+            self.buckets[min(duration_ns.bit_length(), _BUCKETS - 1)] += 1
+
+    def percentile(self, percentile: float) -> float:
+        """Estimates the duration, in seconds, under which lies provided
+        percentage of the calls. The estimation is the upper bound of the
+        bucket holding the percentile."""
+        rank = self.calls * percentile / 100
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(2 ** i, self.max_ns) / 1e9
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Gives the current measures."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'total_seconds': self.total_ns / 1e9,
+                'mean_seconds': (self.total_ns / self.calls / 1e9
+                                 if self.calls else 0.0),
+                'max_seconds': self.max_ns / 1e9,
+                'p50_seconds': self.percentile(50),
+                'p90_seconds': self.percentile(90),
+                'p99_seconds': self.percentile(99),
+                'histogram': [(2 ** i / 1e9, count)
+                              for i, count in enumerate(self.buckets)
+                              if count],
+            }
+
+
+class ProfilerHook(object):
+    """Profiles sampled calls with cProfile. Statistics of all the samples are
+    accumulated in the profile attribute, which can be given to pstats.
+
+    Sampled calls are profiled one at a time. Calls sampled while another one
+    is profiled are part of its profile.
+    """
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def __call__(self, operation: str):
+        with self._lock:
+            self._depth += 1
+            if self._depth == 1:
+                self.profile.enable()
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self.profile.disable()
+
+
+class Instrumentation(object):
+    """Wraps methods of tokens to measure their calls."""
+
+    def __init__(self):
+        self.metrics = {}
+        # type: Dict[str, OperationMetrics]
+        """Measures by operation, named after the class and the method."""
+        self._patched = []
+        # type: List[Tuple[Any, str, Any]]
+        """(owner, attribute, original value) of patched attributes."""
+        self._hooks = []
+        # type: List[Tuple[Callable[[str], ContextManager], int]]
+
+    def enable(self, token, *methods: str):
+        """Instruments a token class, or the class of a token module and the
+        module functions.
+
+        :param methods: The names of the methods to instrument. All the public
+            methods of the class by default.
+        """
+        module = token if isinstance(token, types.ModuleType) else None
+        cls = type(module._token) if module else token
+        methods = methods or [
+            name for name, value in vars(cls).items()
+            if not name.startswith('_') and inspect.isfunction(value)
+        ]
+
+        for name in methods:
+            original = vars(cls).get(name)
+            if not inspect.isfunction(original):
+                raise ValueError("'{}' is not a method of {}".format(
+                    name, cls.__name__
+                ))
+            if getattr(original, '__instrumented__', False):
+                continue
+            self._patched.append((cls, name, original))
+            setattr(cls, name, self._instrument(
+                '{}.{}'.format(cls.__name__, name), original
+            ))
+
+        if module is not None:
+            # Module functions are bound to the default instance, and thus
+            # still refer to the original methods.
+            for name in methods:
+                bound = getattr(module, name, None)
+                if getattr(bound, '__self__', None) is module._token:
+                    self._patched.append((module, name, bound))
+                    setattr(module, name, getattr(module._token, name))
+
+    def disable(self):
+        """Puts back all the original methods."""
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched = []
+
+    def add_profiler_hook(self, hook: Callable[[str], ContextManager],
+                          every: int = 1000):
+        """Runs one call out of every calls of each operation inside the
+        context given by hook(operation name)."""
+        self._hooks.append((hook, every))
+
+    def remove_profiler_hooks(self):
+        """Stops calling the profiler hooks."""
+        self._hooks = []
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Gives the current measures of all the operations."""
+        return {operation: metrics.snapshot()
+                for operation, metrics in list(self.metrics.items())}
+
+    def reset(self):
+        """Forgets all the measures."""
+        for operation in self.metrics:
+            self.metrics[operation] = OperationMetrics()
+
+    def _instrument(self, operation: str, func: Callable) -> Callable:
+        """Wraps a function so that its calls are measured."""
+        clock = time.perf_counter_ns
+        instrumentation = self
+        self.metrics.setdefault(operation, OperationMetrics())
+
+        @functools.wraps(func)
+        def instrumented(*args, **kwargs):
+            metrics = instrumentation.metrics[operation]
+            hooks = instrumentation._hooks
+            if hooks:
+                return instrumentation._sample(operation, metrics, hooks,
+                                               func, args, kwargs)
+            start = clock()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                metrics.record(clock() - start, True)
+                raise
+            metrics.record(clock() - start, False)
+            return result
+
+        instrumented.__instrumented__ = True
+        return instrumented
+
+    @staticmethod
+    def _sample(operation: str, metrics: OperationMetrics, hooks: list,
+                func: Callable, args: tuple, kwargs: dict):
+        """Calls a function inside the contexts of the hooks sampling it."""
+        with contextlib.ExitStack() as stack:
+            for hook, every in hooks:
+                if metrics.calls % every == 0:
+                    stack.enter_context(hook(operation))
+            start = time.perf_counter_ns()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                metrics.record(time.perf_counter_ns() - start, failed)
+
+
+# Default instance
+
+_instrumentation = Instrumentation()
+"""The instrumentation behind the module functions."""
+
+enable = _instrumentation.enable
+disable = _instrumentation.disable
+add_profiler_hook = _instrumentation.add_profiler_hook
+remove_profiler_hooks = _instrumentation.remove_profiler_hooks
+snapshot = _instrumentation.snapshot
+reset = _instrumentation.reset
@@ -0,0 +1,279 @@
+"""Interned balances keep the accounts of a token in compact columns, for
+tokens with millions of accounts.
+
+An AddressTable gives each address a dense integer id, in order of first
+use. Addresses are kept once, encoded in a single buffer, and found through
+an open addressing table of ids: an address costs its encoded length plus
+about 20 bytes, where a dict key costs a string object and a slot.
+
+InternedBalances keeps balances in an array of 64-bit integers indexed by
+id, where ids without account hold a marker value. It is a mapping from
+addresses to balances, which tokens use as their balance_of attribute: base
+functions work on it unchanged, and addresses only exist as strings at this
+boundary. Several mappings can share a table, so that the addresses of all
+the maps of a token are kept once. An AllowanceStore (see allowance_store)
+can share it as well, to key allowances by ids.
+
+Addresses are hashed with CRC-32 rather than hash(), which is salted per
+process: a table pickled or sent to another process still finds its
+addresses.
+
+Addresses must be strings.
+
+Interning saves memory rather than time: finding an address not used
+recently hashes and compares its encoding, which is slower than a dict
+lookup. Snapshots (see snapshot) store interned balances as a plain map of
+addresses to balances, and restore them as such: intern them again after a
+restore if needed.
+"""
+import itertools
+import zlib
+from array import array
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Mapping, Optional
+
+_FREE = -1
+"""Marks an empty slot of the index of a table."""
+
+_ABSENT = -(1 << 63)
+"""Marks the balance of an id without account. A balance of that value does
+not fit in the column."""
+
+
+class AddressTable(object):
+    """Gives dense integer ids to addresses.
+
+    Ids of recently used addresses are also kept in a small map, cleared
+    when full, so that the addresses of busy accounts are found at the speed
+    of a dict.
+
+    :param capacity: The number of addresses expected. The table grows past
+        it if needed.
+    :param cache_size: The number of recently used addresses kept in the
+        map.
+    """
+
+    __slots__ = ('_data', '_offsets', '_hashes', '_index', '_mask',
+                 '_recent', 'cache_size')
+
+    def __init__(self, capacity: int = 1024, cache_size: int = 4096):
+        size = 8
+        while size < 2 * capacity:
+            size <<= 1
+        self._data = bytearray()
+        """The addresses, encoded in UTF-8, in order of their ids."""
+        self._offsets = array('I', [0])
+        """Start of each address in the data, and end of the last one. They
+        switch to 64-bit integers past 4GB of data."""
+        self._hashes = array('I')
+        """CRC-32 of each encoded address, by id."""
+        self._index = array('i', [_FREE]) * size
+        """Ids of the addresses, by hash, with linear probing. It is kept
+        at most half full."""
+        self._mask = size - 1
+        self._recent = {}
+        # type: Dict[str, int]
+        """Ids of recently used addresses."""
+        self.cache_size = cache_size
+
+    def _slot(self, encoded: bytes, hash_: int) -> int:
+        """Gives the slot of the index holding the id of an address, or the
+        free slot where it would go."""
+        index, hashes, data, offsets = (self._index, self._hashes,
+                                        self._data, self._offsets)
+        mask = self._mask
+        slot = hash_ & mask
+        while True:
+            id_ = index[slot]
+            if id_ == _FREE or (
+                    hashes[id_] == hash_
+                    and data[offsets[id_]:offsets[id_ + 1]] == encoded):
+                return slot
+            slot = (slot + 1) & mask
+
+    def id_of(self, address: str) -> Optional[int]:
+        """Gives the id of an address, or None if it has never been
+        interned."""
+        recent = self._recent
+        id_ = recent.get(address)
+        if id_ is not None:
+            return id_
+        # Same probing as _slot, inlined as this is the path of every
+        # address not used recently.
+        encoded = address.encode('utf-8')
+        hash_ = zlib.crc32(encoded)
+        index, hashes, data, offsets = (self._index, self._hashes,
+                                        self._data, self._offsets)
+        mask = self._mask
+        slot = hash_ & mask
+        while True:
+            id_ = index[slot]
+            if id_ == _FREE:
+                return None
+            if hashes[id_] == hash_ \
+                    and data[offsets[id_]:offsets[id_ + 1]] == encoded:
+                break
+            slot = (slot + 1) & mask
+        if len(recent) >= self.cache_size:
+            recent.clear()
+        recent[address] = id_
+        return id_
+
+    def _remember(self, address: str, id_: int):
+        if len(self._recent) >= self.cache_size:
+            self._recent.clear()
+        self._recent[address] = id_
+
+    def intern(self, address: str) -> int:
+        """Gives the id of an address, giving it the next id if it is new."""
+        id_ = self._recent.get(address)
+        if id_ is not None:
+            return id_
+        encoded = address.encode('utf-8')
+        hash_ = zlib.crc32(encoded)
+        slot = self._slot(encoded, hash_)
+        id_ = self._index[slot]
+        if id_ != _FREE:
+            self._remember(address, id_)
+            return id_
+
+        id_ = len(self._hashes)
+        self._data += encoded
+        try:
+            self._offsets.append(len(self._data))
+        except OverflowError:
+            self._offsets = array('Q', self._offsets)
+            self._offsets.append(len(self._data))
+        self._hashes.append(hash_)
+        self._index[slot] = id_
+        if 2 * len(self._hashes) > len(self._index):
+            self._grow()
+        self._remember(address, id_)
+        return id_
+
+    def _grow(self):
+        """Doubles the size of the index."""
+        size = 2 * len(self._index)
+        index = array('i', [_FREE]) * size
+        mask = size - 1
+        for id_, hash_ in enumerate(self._hashes):
+            slot = hash_ & mask
+            while index[slot] != _FREE:
+                slot = (slot + 1) & mask
+            index[slot] = id_
+        self._index, self._mask = index, mask
+
+    def address_of(self, id_: int) -> str:
+        """Gives the address of an id. Raises an IndexError if the id has not
+        been given."""
+        offsets = self._offsets
+        return self._data[offsets[id_]:offsets[id_ + 1]].decode('utf-8')
+
+    def __contains__(self, address: str) -> bool:
+        return self.id_of(address) is not None
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __iter__(self) -> Iterator[str]:
+        """Gives the addresses in order of their ids."""
+        for id_ in range(len(self)):
+            yield self.address_of(id_)
+
+
+class InternedBalances(MutableMapping):
+    """Balances of a token, kept in a column indexed by the ids of their
+    addresses.
+
+    Balances are 64-bit integers. If a balance does not fit, the column
+    falls back to a list of Python integers, where ids without account hold
+    None.
+
+    :param table: The table of addresses, possibly shared with other maps. A
+        new table is created if none is provided.
+    :param balances: Balances to start with.
+    """
+
+    def __init__(self, table: AddressTable = None, balances: Mapping = None):
+        self.table = AddressTable() if table is None else table
+        self._values = array('q')
+        """Balances by id. Ids without account hold _absent."""
+        self._absent = _ABSENT
+        """The balance of ids without account: _ABSENT in the array, None
+        once the column is a list."""
+        self._count = 0
+        """Number of accounts."""
+        if balances:
+            self.update(balances)
+
+    def _id(self, address: str) -> int:
+        """Gives the id of the account of an address, or -1 if it has
+        none."""
+        id_ = self.table.id_of(address)
+        if id_ is None or id_ >= len(self._values) \
+                or self._values[id_] == self._absent:
+            return -1
+        return id_
+
+    def __getitem__(self, address: str) -> int:
+        id_ = self.table.id_of(address)
+        values = self._values
+        if id_ is not None and id_ < len(values):
+            balance = values[id_]
+            if balance != self._absent:
+                return balance
+        raise KeyError(address)
+
+    def get(self, address: str, default=None):
+        id_ = self.table.id_of(address)
+        values = self._values
+        if id_ is not None and id_ < len(values):
+            balance = values[id_]
+            if balance != self._absent:
+                return balance
+        return default
+
+    def __contains__(self, address) -> bool:
+        return self._id(address) >= 0
+
+    def __setitem__(self, address: str, balance: int):
+        id_ = self.table.intern(address)
+        values = self._values
+        missing = id_ + 1 - len(values)
+        if missing > 0:
+            values.extend(itertools.repeat(self._absent, missing))
+        if values[id_] == self._absent:
+            self._count += 1
+        if balance == _ABSENT:
+            # Such balances would read as missing in the array.
+            self._to_list()
+            values = self._values
+        try:
+            values[id_] = balance
+        except (OverflowError, TypeError):
+            self._to_list()
+            self._values[id_] = balance
+
+    def _to_list(self):
+        """Turns the column into a list of Python integers."""
+        if self._absent is not None:
+            self._values = [None if balance == _ABSENT else balance
+                            for balance in self._values]
+            self._absent = None
+
+    def __delitem__(self, address: str):
+        id_ = self._id(address)
+        if id_ < 0:
+            raise KeyError(address)
+        self._values[id_] = self._absent
+        self._count -= 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        address_of = self.table.address_of
+        absent = self._absent
+        for id_, balance in enumerate(self._values):
+            if balance != absent:
+                yield address_of(id_)
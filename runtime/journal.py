@@ -0,0 +1,413 @@
+"""The journal keeps track of every call changing the state of a token, so that
+the state can be rebuilt after a restart: the last snapshot is restored, then
+the calls journaled after it are replayed.
+
+Each call is appended as a record holding its sequence number, the sender,
+the name of the method, its arguments and the time of the call. Token classes
+reading the time do so through their clock attribute: the journal makes it
+give the time of the call, both when the call runs and when it is replayed,
+so that replayed calls see the time they originally saw. Queries which may
+change the state of the token, listed in the UPDATING_QUERIES attribute of
+its class, are journaled as well.
+
+Arguments are encoded before the call runs, so that a call is either
+journaled or not run at all. Maps such as Counters are passed on as dicts and
+iterators such as generators as lists, which marshal can encode; a call with
+other arguments marshal cannot encode raises a ValueError without running. A
+call which fails is journaled too, with a failure flag, since it may have
+changed the state before failing: it is replayed, and expected to fail again.
+
+Records are written by a background
+thread, in batches: one write and one fsync make a whole batch durable, however
+many calls it holds (group commit). Token calls then keep running at
+in-memory speed, unless they explicitly wait for their record to be durable.
+
+Record layout: payload length, CRC32, sequence number, then a payload made
+of the failure flag byte and the marshalled (sender, method, args, kwargs,
+time) tuple. A torn record at the end of the
+file, left by a crash, is discarded when the journal is opened again.
+
+Arguments are encoded with marshal, so a journal must be read with the same
+Python version as the one which wrote it.
+"""
+import contextlib
+import contextvars
+import marshal
+import os
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterator as AnyIterator, Mapping
+from typing import Any, Dict, Iterator, Tuple
+
+from pikciotok import context
+
+import snapshot
+
+_RECORD_HEADER = struct.Struct('<IIQ')
+"""Payload length, CRC32 of sequence and payload, sequence number."""
+_SEQUENCE = struct.Struct('<Q')
+_MARSHAL_VERSION = 4
+_FAILED = b'\x01'
+_SUCCEEDED = b'\x00'
+"""First byte of the payload of a call, telling whether it failed."""
+_PLAIN_TYPES = frozenset((str, int, float, bool, type(None), bytes, tuple,
+                          list, dict, set, frozenset))
+"""Types of arguments passed on as they are."""
+
+_call_time = contextvars.ContextVar('call_time')
+"""The time given by the clocks of tokens during a journaled or replayed
+call."""
+_install_lock = threading.Lock()
+
+
+def _clock() -> float:
+    """The clock of token classes once the journal is installed."""
+    call_time = _call_time.get(None)
+    return time.time() if call_time is None else call_time
+
+
+def install(cls: type):
+    """Makes the clock of a token class give the time of the journaled or
+    replayed call running, if any, and the current time otherwise."""
+    with _install_lock:
+        if 'clock' in vars(cls) and cls.clock is not _clock:
+            cls.clock = staticmethod(_clock)
+
+
+@contextlib.contextmanager
+def clock_at(call_time: float):
+    """Makes the clocks of installed token classes (see install) give
+    provided time within the block."""
+    reset_token = _call_time.set(call_time)
+    try:
+        yield
+    finally:
+        _call_time.reset(reset_token)
+
+
+def _plain(value):
+    if type(value) in _PLAIN_TYPES:
+        return value
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, AnyIterator):
+        return list(value)
+    return value
+
+
+def marshallable(args: tuple, kwargs: Dict[str, Any]
+                 ) -> Tuple[tuple, Dict[str, Any]]:
+    """Gives the arguments of a call with maps turned into dicts and
+    iterators into lists, so that marshal can encode them. Other arguments
+    are left as they are.
+
+    The call must then run with the arguments given back, as iterators have
+    been consumed.
+    """
+    return (tuple([_plain(value) for value in args]),
+            {name: _plain(value) for name, value in kwargs.items()})
+
+
+def _encode(sender: str, method: str, args: tuple, kwargs: Dict[str, Any],
+            call_time: float) -> bytes:
+    """Encodes a call. Raises a ValueError if marshal cannot encode an
+    argument."""
+    try:
+        return marshal.dumps((sender, method, args, kwargs, call_time),
+                             _MARSHAL_VERSION)
+    except ValueError as e:
+        raise ValueError("Cannot journal a call of '{}': {}".format(
+            method, e
+        )) from e
+
+
+def read_records(path: str) -> Iterator[
+        Tuple[int, str, str, tuple, Dict, float, bool]]:
+    """Reads the valid records of a journal file, stopping at the first torn
+    or corrupted one.
+
+    :return: (sequence, sender, method, args, kwargs, time, failed) tuples.
+    """
+    for sequence, _, payload in _scan(path):
+        if payload:
+            yield (sequence,) + marshal.loads(payload[1:]) + (
+                payload[:1] == _FAILED,
+            )
+
+
+def _scan(path: str) -> Iterator[Tuple[int, int, bytes]]:
+    """Reads the valid records of a journal file.
+
+    :return: (sequence, end position, payload) tuples.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 0
+    while pos + _RECORD_HEADER.size <= len(data):
+        length, crc, sequence = _RECORD_HEADER.unpack_from(data, pos)
+        start = pos + _RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or crc != zlib.crc32(
+                payload, zlib.crc32(_SEQUENCE.pack(sequence))):
+            return
+        pos = start + length
+        yield sequence, pos, payload
+
+
+class Journal(object):
+    """An append-only journal file, flushed by group commit.
+
+    :param path: The path of the journal file. It is created if needed.
+    :param flush_interval: The maximum time, in seconds, a record waits in
+        memory before being written.
+    :param max_batch: The size, in bytes, of pending records triggering an
+        early flush.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.01,
+                 max_batch: int = 1 << 20):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self.sequence = 0
+        """Sequence number of the last appended record."""
+        end = 0
+        for self.sequence, end, _ in _scan(path):
+            pass
+
+        # Drop the torn tail left by a crash, if any.
+        self._file = open(path, 'ab')
+        self._file.truncate(end)
+
+        self.synced = self.sequence
+        """Sequence number of the last durable record."""
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        """Notified each time a batch becomes durable."""
+        self._pending = threading.Condition(self._lock)
+        """Notified when the flusher should not wait for the interval."""
+        self._io_lock = threading.Lock()
+        """Serializes writes of batches to the file."""
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run, daemon=True)
+        self._flusher.start()
+
+    def append(self, sender: str, method: str, args: tuple,
+               kwargs: Dict[str, Any], call_time: float,
+               failed: bool = False) -> int:
+        """Appends a call to the journal. The record is only buffered: use
+        wait to make sure it is durable.
+
+        :param call_time: The time of the call, as a POSIX timestamp.
+        :param failed: Whether the call raised an exception.
+        :return: The sequence number of the record.
+        """
+        return self._append(_encode(sender, method, args, kwargs, call_time),
+                            failed)
+
+    def _append(self, call: bytes, failed: bool) -> int:
+        """Appends an encoded call to the journal."""
+        payload = (_FAILED if failed else _SUCCEEDED) + call
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Journal is closed")
+            self.sequence += 1
+            sequence = self.sequence
+            self._buffer += _RECORD_HEADER.pack(
+                len(payload),
+                zlib.crc32(payload, zlib.crc32(_SEQUENCE.pack(sequence))),
+                sequence
+            )
+            self._buffer += payload
+            if len(self._buffer) >= self.max_batch:
+                self._pending.notify()
+        return sequence
+
+    def wait(self, sequence: int):
+        """Blocks until the record of provided sequence number is durable."""
+        with self._lock:
+            while self.synced < sequence:
+                self._pending.notify()
+                self._flushed.wait()
+
+    def flush(self):
+        """Writes and syncs all the pending records."""
+        with self._io_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, bytearray()
+                sequence = self.sequence
+            if batch:
+                self._file.write(batch)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            with self._lock:
+                self.synced = max(self.synced, sequence)
+                self._flushed.notify_all()
+
+    def truncate(self):
+        """Empties the journal, once its records are all included in a
+        snapshot.
+
+        An empty record is left, so that sequence numbers keep increasing
+        when the journal is opened again.
+        """
+        with self._io_lock:
+            with self._lock:
+                self._buffer = bytearray()
+                sequence = self.synced = self.sequence
+                self._flushed.notify_all()
+            self._file.truncate(0)
+            self._file.write(_RECORD_HEADER.pack(
+                0, zlib.crc32(_SEQUENCE.pack(sequence)), sequence
+            ))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Flushes the pending records and stops the background flusher."""
+        with self._lock:
+            self._closed = True
+            self._pending.notify()
+        self._flusher.join()
+        self.flush()
+        self._file.close()
+
+    def _run(self):
+        """Flushes batches until the journal is closed."""
+        while True:
+            with self._lock:
+                if not self._closed and len(self._buffer) < self.max_batch:
+                    self._pending.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _journaled_methods(cls: type) -> Tuple[str, ...]:
+    """Gives the names of the methods of a token class which are journaled."""
+    return cls.MUTATORS + getattr(cls, 'UPDATING_QUERIES', ())
+
+
+class JournaledToken(object):
+    """Journals the calls changing the state of a token. The calls of the
+    methods listed in the MUTATORS and UPDATING_QUERIES attributes of the
+    token class are journaled once they have run, whether they succeeded or
+    failed. Only successful calls wait for their record to be durable. Other
+    attributes are those of the token.
+
+    Installs the journal clock (see install) on the token class.
+
+    A journal must only be used by one token.
+
+    :param token: A token instance, or a token module.
+    :param journal: The journal receiving the calls.
+    :param durable: If True, a call only returns once its record is durable.
+    """
+
+    def __init__(self, token, journal: Journal, durable: bool = False):
+        self.token = snapshot.instance_of(token)
+        self.journal = journal
+        self.durable = durable
+        self._lock = threading.Lock()
+        """Keeps a call and its record together, so that snapshots taken by
+        checkpoint match a sequence number."""
+        install(type(self.token))
+        for method in _journaled_methods(type(self.token)):
+            setattr(self, method, self._journaled(method))
+
+    def _journaled(self, method: str):
+        """Wraps a method of the token so that its calls get journaled."""
+        func = getattr(self.token, method)
+        journal = self.journal
+
+        def journaled(*args, **kwargs):
+            args, kwargs = marshallable(args, kwargs)
+            with self._lock:
+                call_time = time.time()
+                call = _encode(context.sender, method, args, kwargs,
+                               call_time)
+                reset_token = _call_time.set(call_time)
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    # The call may have changed the state before failing.
+                    journal._append(call, True)
+                    raise
+                finally:
+                    _call_time.reset(reset_token)
+                sequence = journal._append(call, False)
+            if self.durable:
+                journal.wait(sequence)
+            return result
+
+        journaled.__name__ = method
+        journaled.__doc__ = func.__doc__
+        return journaled
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.token, attribute)
+
+    def checkpoint(self, snapshot_path: str):
+        """Saves a snapshot of the token, then empties the journal. If the
+        process stops in between, recovery skips the journaled calls already
+        included in the snapshot."""
+        with self._lock:
+            self.journal.flush()
+            snapshot.save(self.token, snapshot_path, self.journal.sequence)
+            self.journal.truncate()
+
+
+def replay(token, path: str, after: int = 0) -> int:
+    """Replays the calls of a journal on a token. Calls which failed when
+    journaled are expected to fail again: their exceptions are ignored.
+
+    :param token: A token instance, or a token module.
+    :param after: Calls with a sequence number up to this one are skipped.
+    :return: The number of calls replayed.
+    """
+    token = snapshot.instance_of(token)
+    install(type(token))
+    count = 0
+    sender = context.sender
+    try:
+        for (sequence, sender_, method, args, kwargs, call_time,
+             failed) in read_records(path):
+            if sequence <= after:
+                continue
+            context.sender = sender_
+            with clock_at(call_time):
+                try:
+                    getattr(token, method)(*args, **kwargs)
+                except Exception:
+                    if not failed:
+                        raise
+            count += 1
+    finally:
+        context.sender = sender
+    return count
+
+
+def recover(token, snapshot_path: str, journal_path: str) -> int:
+    """Rebuilds the state of a token from its last snapshot, if any, and its
+    journal.
+
+    :return: The number of calls replayed from the journal.
+    """
+    after = 0
+    if os.path.exists(snapshot_path):
+        last_snapshot = snapshot.Snapshot(snapshot_path)
+        snapshot.restore(token, last_snapshot)
+        after = last_snapshot.sequence
+    return replay(token, journal_path, after)
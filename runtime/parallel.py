@@ -0,0 +1,408 @@
+"""The parallel executor runs blocks of transactions on a token across a pool
+of processes, with the same outcome as running them one after the other.
+
+Execution is optimistic. The state of the token before the block is saved to
+a snapshot, which every worker process maps. Workers run the transactions of
+the block on that state, each as if it came first, and track what it does:
+the state entries it reads and the ones it writes, with their new values.
+State entries are the entries of the maps of the token, such as an account
+in balance_of, and the other attributes of the token.
+
+Transactions are then committed in the order of the block. A transaction is
+valid if none of the entries it read has been written by a transaction
+committed before it: it would then have done the same thing if run in order,
+and its writes are applied to the token. Otherwise, it is run again on the
+current state of the token. The final state, results and events are thus
+those of a serial execution, whatever the timing of the workers.
+
+Values read by a transaction are copied before it can change them, so that
+changes made inside a value (an allowance in the map of an owner, for
+instance) are detected and written back.
+
+Transactions reading the clock, as votes do, only get the same state as a
+serial execution run at the same time.
+"""
+import functools
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pikciotok import base, context
+
+import event_bus
+import snapshot
+
+Transaction = Tuple[str, str, tuple]
+"""Sender, method name and arguments of a transaction."""
+
+Address = tuple
+"""A state entry: (attribute,) or (attribute, key) for an entry of a map."""
+
+_IMMUTABLE = (int, float, str, bytes, bool, type(None), tuple, frozenset)
+"""Types of the values which do not need to be copied when read."""
+
+
+class _Deleted(object):
+    """Marks an entry deleted by a transaction."""
+
+    def __reduce__(self):
+        return '_DELETED'
+
+
+_DELETED = _Deleted()
+
+
+# Tracking
+
+class _Transaction(object):
+    """What a transaction did to the state, so far."""
+
+    __slots__ = ('reads', 'values', 'written', 'pristine', 'events')
+
+    def __init__(self):
+        self.reads = set()
+        """Entries read from the state before the block."""
+        self.values = {}
+        # type: Dict[Address, Any]
+        """Values of the entries written or copied by the transaction."""
+        self.written = set()
+        """Entries assigned by the transaction."""
+        self.pristine = {}
+        # type: Dict[Address, bytes]
+        """Pickled values of the copied entries, as they were read."""
+        self.events = []
+        # type: List[Tuple[str, str, Dict[str, Any]]]
+        """(module, event, fields) of the events fired by the transaction."""
+
+    def writes(self) -> List[Tuple[Address, Any]]:
+        """Gives the entries written by the transaction and their values.
+        Copied entries are written if they have been changed."""
+        return [
+            (address, value) for address, value in self.values.items()
+            if address in self.written
+            or pickle.dumps(value) != self.pristine[address]
+        ]
+
+
+class _Tracker(object):
+    """Runs transactions on a token without changing it, tracking what they
+    do.
+
+    :param token: The token holding the state before the block.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.tx = None
+        # type: _Transaction
+        self.tracked = object.__new__(_tracked_class(type(token)))
+        self.tracked._tracker = self
+        self._views = {}
+        # type: Dict[str, _TrackedDict]
+
+    def run(self, sender: str, method: str, args: tuple
+            ) -> Tuple[Any, _Transaction]:
+        """Runs a transaction.
+
+        :return: The result of the call, or the exception it raised, and what
+            it did.
+        """
+        self.tx = _Transaction()
+        context.sender = sender
+        try:
+            result = getattr(self.tracked, method)(*args)
+        except Exception as e:
+            result = e
+        return result, self.tx
+
+    def get(self, name: str):
+        """Reads an attribute of the token."""
+        tx = self.tx
+        address = (name,)
+        if address in tx.values:
+            return tx.values[address]
+        value = getattr(self.token, name)
+        if isinstance(value, Mapping):
+            view = self._views.get(name)
+            if view is None or view.base is not value:
+                view = self._views[name] = _TrackedDict(self, name, value)
+            return view
+        tx.reads.add(address)
+        return self.own(address, value)
+
+    def set(self, name: str, value):
+        """Assigns an attribute of the token."""
+        self.tx.values[(name,)] = value
+        self.tx.written.add((name,))
+
+    def own(self, address: Address, value):
+        """Gives the transaction its own copy of a value it read."""
+        if isinstance(value, _IMMUTABLE):
+            return value
+        data = pickle.dumps(value)
+        value = self.tx.values[address] = pickle.loads(data)
+        self.tx.pristine[address] = data
+        return value
+
+
+class _TrackedDict(MutableMapping):
+    """A map of the token, as seen by the running transaction."""
+
+    def __init__(self, tracker: _Tracker, name: str, base_map: Mapping):
+        self.tracker = tracker
+        self.name = name
+        self.base = base_map
+
+    def __getitem__(self, key):
+        tx = self.tracker.tx
+        address = (self.name, key)
+        if address in tx.values:
+            value = tx.values[address]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        tx.reads.add(address)
+        return self.tracker.own(address, self.base[key])
+
+    def __setitem__(self, key, value):
+        tx = self.tracker.tx
+        tx.values[(self.name, key)] = value
+        tx.written.add((self.name, key))
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self[key] = _DELETED
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def _entries(self) -> List[Tuple[Any, Any]]:
+        """Gives the keys and values of the entries of the map the running
+        transaction has written or copied."""
+        return [(address[1], value)
+                for address, value in self.tracker.tx.values.items()
+                if len(address) == 2 and address[0] == self.name]
+
+    def __iter__(self) -> Iterator:
+        self.tracker.tx.reads.add((self.name,))
+        entries = self._entries()
+        if not entries:
+            yield from self.base
+            return
+        deleted = {key for key, value in entries if value is _DELETED}
+        for key in self.base:
+            if key not in deleted:
+                yield key
+        for key, value in entries:
+            if value is not _DELETED and key not in self.base:
+                yield key
+
+    def __len__(self) -> int:
+        self.tracker.tx.reads.add((self.name,))
+        length = len(self.base)
+        for key, value in self._entries():
+            in_base = key in self.base
+            if value is _DELETED and in_base:
+                length -= 1
+            elif value is not _DELETED and not in_base:
+                length += 1
+        return length
+
+
+@functools.lru_cache(maxsize=None)
+def _tracked_class(cls: type) -> type:
+    """Creates a subclass of a token class whose attributes are read and
+    assigned through a tracker."""
+    def attribute(name: str):
+        return property(
+            lambda self: self._tracker.get(name),
+            lambda self, value: self._tracker.set(name, value)
+        )
+
+    namespace = {name: attribute(name) for name in snapshot.slots_of(cls)}
+    namespace['__slots__'] = ('_tracker',)
+    return type('Tracked' + cls.__name__, (cls,), namespace)
+
+
+def _apply(token, writes: List[Tuple[Address, Any]]):
+    """Writes the changes of a transaction to a token."""
+    for address, value in writes:
+        if len(address) == 1:
+            setattr(token, address[0], value)
+        elif value is _DELETED:
+            getattr(token, address[0]).pop(address[1], None)
+        else:
+            getattr(token, address[0])[address[1]] = value
+
+
+def _conflicts(reads: set, written: set, written_attributes: set) -> bool:
+    """Tells if a transaction read entries written before it. Reading a
+    whole map conflicts with writing any of its entries, and reading an entry
+    conflicts with replacing its map."""
+    for address in reads:
+        if address in written:
+            return True
+        if len(address) == 1:
+            if address[0] in written_attributes:
+                return True
+        elif address[:1] in written:
+            return True
+    return False
+
+
+def _event_names(module) -> List[str]:
+    """Gives the attributes of a module holding events, possibly routed
+    through an event bus."""
+    return [name for name, obj in vars(module).items()
+            if event_bus._is_event(obj)
+            or getattr(obj, '__module__', None) == event_bus.__name__]
+
+
+# Workers
+
+_worker = {}
+"""Snapshot path and tracker of a worker process."""
+
+
+def _capture(module_name: str, name: str):
+    """Creates an event recording its firings in the running transaction."""
+    def fire(**fields):
+        _worker['tracker'].tx.events.append((module_name, name, fields))
+
+    return fire
+
+
+def _run_chunk(snapshot_path: str, events: Dict[str, List[str]],
+               transactions: List[Transaction]) -> List[Tuple]:
+    """Runs transactions on the state of a snapshot, in a worker process.
+
+    :param events: The names of the events of each module.
+    :return: The result, reads, writes and events of each transaction.
+    """
+    if _worker.get('path') != snapshot_path:
+        with snapshot.Snapshot(snapshot_path) as state:
+            token = snapshot.resolve_type(state.type_name)()
+        snapshot.restore(token, snapshot_path)
+        _worker['path'] = snapshot_path
+        _worker['tracker'] = _Tracker(token)
+        for module_name, names in events.items():
+            module = sys.modules[module_name]
+            for name in names:
+                setattr(module, name, _capture(module_name, name))
+
+    tracker = _worker['tracker']
+    outcomes = []
+    for sender, method, args in transactions:
+        result, tx = tracker.run(sender, method, args)
+        outcomes.append((result, tx.reads, tx.writes(), tx.events))
+    return outcomes
+
+
+# Executor
+
+class ParallelExecutor(object):
+    """Runs blocks of transactions on a token across worker processes.
+
+    Each block costs a snapshot of the token, so blocks should be large
+    enough to pay for it.
+
+    :param token: A token instance, or a token module.
+    :param workers: The number of worker processes. The number of CPUs by
+        default.
+    :param chunk_size: The number of transactions sent at once to a worker.
+    """
+
+    def __init__(self, token, workers: int = None, chunk_size: int = 512):
+        self.token = snapshot.instance_of(token)
+        self.chunk_size = chunk_size
+        self.reexecuted = 0
+        """Number of transactions of the last block which were run again
+        because of a conflict."""
+
+        module = sys.modules[type(self.token).__module__]
+        self._events = {
+            module.__name__: _event_names(module),
+            base.__name__: _event_names(base),
+        }
+        self._folder = tempfile.mkdtemp(prefix='parallel')
+        self._blocks = 0
+        # Forked workers could inherit locks held by the threads of the
+        # journal or of the event bus.
+        self._pool = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def execute(self, transactions: List[Transaction]) -> List[Any]:
+        """Runs a block of transactions.
+
+        :return: The results of the transactions, in order. A transaction
+            which failed gives its exception.
+        """
+        self._blocks += 1
+        path = os.path.join(self._folder, '{}.snapshot'.format(self._blocks))
+        snapshot.save(self.token, path)
+        try:
+            chunks = [
+                self._pool.submit(
+                    _run_chunk, path, self._events,
+                    transactions[i:i + self.chunk_size]
+                )
+                for i in range(0, len(transactions), self.chunk_size)
+            ]
+            outcomes = (outcome for chunk in chunks
+                        for outcome in chunk.result())
+            return self._commit(transactions, outcomes)
+        finally:
+            os.remove(path)
+
+    def _commit(self, transactions: List[Transaction],
+                outcomes: Iterator[Tuple]) -> List[Any]:
+        """Commits the outcomes of transactions in order, running again the
+        ones which conflict with the transactions before them."""
+        tracker = _Tracker(self.token)
+        written = set()
+        written_attributes = set()
+        results = []
+        self.reexecuted = 0
+        sender = context.sender
+        try:
+            for (sender_, method, args), outcome in zip(transactions,
+                                                        outcomes):
+                result, reads, writes, events = outcome
+                if _conflicts(reads, written, written_attributes):
+                    self.reexecuted += 1
+                    # Events are fired as the transaction runs again.
+                    result, tx = tracker.run(sender_, method, args)
+                    writes = tx.writes()
+                else:
+                    for module_name, name, fields in events:
+                        getattr(sys.modules[module_name], name)(**fields)
+                _apply(self.token, writes)
+                for address, _ in writes:
+                    written.add(address)
+                    written_attributes.add(address[0])
+                results.append(result)
+        finally:
+            context.sender = sender
+        return results
+
+    def close(self):
+        """Stops the worker processes."""
+        self._pool.shutdown(wait=True)
+        os.rmdir(self._folder)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
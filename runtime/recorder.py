@@ -0,0 +1,259 @@
+"""The recorder captures the traffic of a token module in a trace file, so that
+it can be replayed offline, for instance under a profiler.
+
+Once a module is recorded, each call of its functions is written to the trace
+with its time, the sender and the arguments, whether it changes the state of
+the token or not. The state of the token when the recording starts is saved
+at the beginning of the trace: a replay starts from a fresh instance in that
+state, so that calls behave as they did when recorded. The clock of the token
+class gives each call the time recorded with it (see journal.install), both
+when it is recorded and when it is replayed.
+
+Recording never changes what the calls do. Arguments are converted as the
+journal does (see journal.marshallable): maps become dicts and iterators
+lists. A call with arguments marshal still cannot encode runs all the same,
+and is only counted as skipped.
+
+Trace layout: a header, the name of the token class, a snapshot of the token
+(possibly empty), then the records. Each record holds the time of the call
+since the start of the recording in nanoseconds, its payload length, whether
+the call failed, then the marshalled (sender, method, args, kwargs, time)
+tuple, where time is the time of the call as a POSIX timestamp.
+
+Arguments are encoded with marshal, so a trace must be replayed with the same
+Python version as the one which recorded it.
+"""
+import inspect
+import marshal
+import struct
+import threading
+import time
+import types
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pikciotok import context
+
+import journal
+import snapshot
+
+_MAGIC = b'PKTR'
+_VERSION = 3
+_HEADER = struct.Struct('<4sBxHQ')
+"""Magic, version, length of the class name and length of the snapshot."""
+_RECORD_HEADER = struct.Struct('<QIB')
+"""Time of the call, payload length and failure flag."""
+_MARSHAL_VERSION = 4
+
+Record = Tuple[int, bool, str, str, tuple, Dict[str, Any], float]
+"""Time in nanoseconds since the start of the recording, failure, sender,
+method, args, kwargs and POSIX time of a call."""
+
+ReplayedCall = Tuple[str, float, bool, bool]
+"""Method, latency in seconds, failure when replayed and failure when
+recorded of a call."""
+
+
+class Recorder(object):
+    """Records the calls of the functions of a token module to a trace file,
+    until it is closed.
+
+    :param module: The token module to record.
+    :param path: The path of the trace file. It is overwritten.
+    :param methods: The names of the functions to record. All the public
+        methods of the token class by default.
+    :param include_state: If False, the state of the token is not saved and
+        the trace must be replayed from a fresh instance.
+    """
+
+    def __init__(self, module: types.ModuleType, path: str, *methods: str,
+                 include_state: bool = True):
+        token = module._token
+        cls = type(token)
+        self.module = module
+        self.path = path
+        self.methods = methods or [
+            name for name, value in vars(cls).items()
+            if not name.startswith('_') and inspect.isfunction(value)
+        ]
+        self.calls = 0
+        """Number of calls recorded so far."""
+        self.skipped = 0
+        """Number of calls not recorded, as marshal cannot encode their
+        arguments."""
+
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb', buffering=1 << 16)
+        type_name = snapshot.type_name_of(cls).encode('utf-8')
+        state = snapshot.dumps(token) if include_state else b''
+        self._file.write(_HEADER.pack(
+            _MAGIC, _VERSION, len(type_name), len(state)
+        ))
+        self._file.write(type_name)
+        self._file.write(state)
+
+        journal.install(cls)
+        self._originals = []
+        # type: List[Tuple[str, Any]]
+        self._start = time.perf_counter_ns()
+        for name in self.methods:
+            original = getattr(module, name)
+            self._originals.append((name, original))
+            setattr(module, name, self._recorded(name, original))
+
+    def _recorded(self, method: str, func):
+        """Wraps a function of the module so that its calls get recorded."""
+        clock = time.perf_counter_ns
+        start = self._start
+        write = self._write
+
+        def recorded(*args, **kwargs):
+            args, kwargs = journal.marshallable(args, kwargs)
+            timestamp = clock() - start
+            call_time = time.time()
+            try:
+                call = marshal.dumps(
+                    (context.sender, method, args, kwargs, call_time),
+                    _MARSHAL_VERSION
+                )
+            except ValueError:
+                call = None
+            with journal.clock_at(call_time):
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    write(timestamp, True, call)
+                    raise
+            write(timestamp, False, call)
+            return result
+
+        recorded.__name__ = method
+        recorded.__doc__ = func.__doc__
+        return recorded
+
+    def _write(self, timestamp: int, failed: bool, payload: bytes = None):
+        """Appends a record to the trace, or counts the call as skipped if
+        it could not be encoded."""
+        with self._lock:
+            if self._file.closed:
+                return
+            if payload is None:
+                self.skipped += 1
+                return
+            self._file.write(_RECORD_HEADER.pack(timestamp, len(payload),
+                                                 failed))
+            self._file.write(payload)
+            self.calls += 1
+
+    def close(self):
+        """Gives back its original functions to the module and closes the
+        trace."""
+        for name, original in reversed(self._originals):
+            setattr(self.module, name, original)
+        self._originals = []
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Trace(object):
+    """A recorded trace, read back.
+
+    :param path: The path of the trace file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._data = f.read()
+        if len(self._data) < _HEADER.size:
+            raise ValueError("Not a trace: '{}'".format(path))
+        magic, version, name_size, state_size = _HEADER.unpack_from(
+            self._data
+        )
+        if magic != _MAGIC:
+            raise ValueError("Not a trace: '{}'".format(path))
+        if version != _VERSION:
+            raise ValueError("Unsupported trace version: {}".format(version))
+        pos = _HEADER.size
+
+        self.type_name = self._data[pos:pos + name_size].decode('utf-8')
+        """The name of the recorded token class, as in snapshots."""
+        pos += name_size
+        self.state = self._data[pos:pos + state_size]
+        """The snapshot of the token when the recording started. Empty if it
+        was not included."""
+        self._records_pos = pos + state_size
+
+    def records(self) -> Iterator[Record]:
+        """Reads the records of the trace, stopping at a torn one."""
+        data = self._data
+        pos = self._records_pos
+        while pos + _RECORD_HEADER.size <= len(data):
+            timestamp, length, failed = _RECORD_HEADER.unpack_from(data, pos)
+            pos += _RECORD_HEADER.size
+            if pos + length > len(data):
+                return
+            yield (timestamp, bool(failed)) + marshal.loads(
+                data[pos:pos + length]
+            )
+            pos += length
+
+    def new_token(self):
+        """Creates a fresh instance of the recorded token class, in the state
+        the token had when the recording started."""
+        token = snapshot.resolve_type(self.type_name)()
+        if self.state:
+            # Lazy maps would decode accounts during the replay, and thus
+            # distort the latencies.
+            snapshot.restore(token, self.state, lazy=False)
+        return token
+
+
+def replay(path: str, token=None, timed: bool = False,
+           speed: float = 1.0) -> List[ReplayedCall]:
+    """Replays a trace and measures the latency of each call. Failing calls
+    do not stop the replay. Calls see the time they were recorded at through
+    the clock of the token class.
+
+    :param token: The token to replay the calls on. By default, a fresh
+        instance in the state of the recorded token.
+    :param timed: If True, calls are replayed at their original pace instead
+        of as fast as possible.
+    :param speed: Divides the delays between calls when timed.
+    """
+    trace = Trace(path)
+    token = snapshot.instance_of(token) if token is not None else (
+        trace.new_token()
+    )
+    journal.install(type(token))
+    methods = {}
+    results = []
+    clock = time.perf_counter
+    sender = context.sender
+    try:
+        start = clock()
+        for (timestamp, recorded_failure, context.sender, method, args,
+             kwargs, call_time) in trace.records():
+            if timed:
+                delay = start + timestamp / 1e9 / speed - clock()
+                if delay > 0:
+                    time.sleep(delay)
+            func = methods.get(method)
+            if func is None:
+                func = methods[method] = getattr(token, method)
+            failed = False
+            with journal.clock_at(call_time):
+                call_start = clock()
+                try:
+                    func(*args, **kwargs)
+                except Exception:
+                    failed = True
+                latency = clock() - call_start
+            results.append((method, latency, failed, recorded_failure))
+    finally:
+        context.sender = sender
+    return results
@@ -0,0 +1,213 @@
+"""Read replicas serve the queries of other processes from a snapshot of a
+token published in shared memory.
+
+The writer publishes snapshots of its token in a shared memory region, with
+two buffers: each snapshot is written to the buffer readers are not using,
+then made current by bumping a generation counter. The writer never waits
+for readers.
+
+Readers open the current snapshot in place, without copying it, and run
+queries on a token restored lazily from it. Only the accounts a query uses
+are decoded. A reader checks the generation counter after each query: if the
+buffer it read has been rewritten in the meantime, the query is run again on
+the current snapshot. Each read reports its version and how old the snapshot
+was, and can be refused past a staleness bound.
+
+Region layout: a header (magic, version, capacity of a buffer, generation),
+one slot per buffer (length, snapshot version and publication time), then
+the two buffers.
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Any, Tuple
+
+from pikciotok import context
+
+import snapshot
+
+_MAGIC = b'PKRP'
+_VERSION = 2
+_HEADER = struct.Struct('<4sB3xQQ')
+"""Magic, version, capacity of a buffer and generation."""
+_GENERATION = struct.Struct('<Q')
+_GENERATION_OFFSET = 16
+_SLOT = struct.Struct('<QQd')
+"""Length of the snapshot, its version and its publication time."""
+_BUFFERS_OFFSET = _HEADER.size + 2 * _SLOT.size
+
+Read = Tuple[Any, int, float]
+"""Result of a query, version of the snapshot it ran on and age of the
+snapshot when the query ended, in seconds."""
+
+
+def _slot_offset(index: int) -> int:
+    return _HEADER.size + index * _SLOT.size
+
+
+def _buffer_offset(index: int, capacity: int) -> int:
+    return _BUFFERS_OFFSET + index * capacity
+
+
+class Publisher(object):
+    """Publishes snapshots of a token to a new shared memory region.
+
+    The generation counter is even between two publications and odd during
+    one. Publication n is written to buffer n % 2.
+
+    :param token: A token instance, or a token module.
+    :param name: The name of the region. A name is generated if none is
+        provided.
+    :param capacity: The size of a buffer, in bytes: the largest snapshot
+        which can be published.
+    """
+
+    def __init__(self, token, name: str = None, capacity: int = 1 << 26):
+        self.token = snapshot.instance_of(token)
+        self.capacity = capacity
+        self.version = 0
+        """Version of the last published snapshot."""
+        self._memory = shared_memory.SharedMemory(
+            name, create=True, size=_BUFFERS_OFFSET + 2 * capacity
+        )
+        self.name = self._memory.name
+        """The name readers attach to."""
+        _HEADER.pack_into(self._memory.buf, 0, _MAGIC, _VERSION, capacity, 0)
+
+    def publish(self) -> int:
+        """Publishes the current state of the token. The writer must not
+        change the token while it is published.
+
+        :return: The version of the published snapshot.
+        """
+        version = self.version + 1
+        data = snapshot.dumps(self.token, version)
+        if len(data) > self.capacity:
+            raise ValueError("Snapshot of {} bytes exceeds the capacity of "
+                             "the replica ({} bytes)".format(len(data),
+                                                             self.capacity))
+        buf = self._memory.buf
+        index = version % 2
+        _GENERATION.pack_into(buf, _GENERATION_OFFSET, 2 * version - 1)
+        start = _buffer_offset(index, self.capacity)
+        buf[start:start + len(data)] = data
+        _SLOT.pack_into(buf, _slot_offset(index), len(data), version,
+                        time.time())
+        _GENERATION.pack_into(buf, _GENERATION_OFFSET, 2 * version)
+        self.version = version
+        return version
+
+    def close(self):
+        """Destroys the region. Attached readers can no longer query it."""
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Replica(object):
+    """Runs queries on the snapshots published to a region.
+
+    Queries run on a private token: calls changing its state are refused,
+    and changes made by queries (such as points expiring) are not seen by
+    the writer.
+
+    :param name: The name of the region.
+    :param max_staleness: If provided, reads of a snapshot older than this,
+        in seconds, raise an exception.
+    """
+
+    def __init__(self, name: str, max_staleness: float = None):
+        self.max_staleness = max_staleness
+        self._memory = shared_memory.SharedMemory(name)
+        magic, version, self._capacity, _ = _HEADER.unpack_from(
+            self._memory.buf
+        )
+        if magic != _MAGIC:
+            raise ValueError("Not a replica region: '{}'".format(name))
+        if version != _VERSION:
+            raise ValueError("Unsupported replica version: {}".format(
+                version
+            ))
+        self._token = None
+        self._token_version = 0
+
+    def _generation(self) -> int:
+        return _GENERATION.unpack_from(self._memory.buf,
+                                       _GENERATION_OFFSET)[0]
+
+    def _token_of(self, generation: int) -> Tuple[Any, int, float]:
+        """Gives the token restored from the current snapshot of a
+        generation, its version and publication time."""
+        index = (generation // 2) % 2
+        length, version, published_at = _SLOT.unpack_from(
+            self._memory.buf, _slot_offset(index)
+        )
+        if version != self._token_version:
+            start = _buffer_offset(index, self._capacity)
+            view = snapshot.Snapshot(
+                self._memory.buf[start:start + length]
+            )
+            token = snapshot.resolve_type(view.type_name)()
+            snapshot.restore(token, view)
+            self._token, self._token_version = token, version
+        return self._token, version, published_at
+
+    def query(self, method: str, *args, sender: str = '', **kwargs) -> Read:
+        """Runs a query on the current snapshot.
+
+        :param sender: The sender of the query, for methods depending on it.
+        """
+        while True:
+            generation = self._generation()
+            if not generation:
+                raise RuntimeError("Nothing has been published yet")
+            failure = result = None
+            previous = context.sender
+            try:
+                token, version, published_at = self._token_of(generation)
+                context.sender = sender
+                if method in type(token).MUTATORS:
+                    raise ValueError("'{}' changes the state of the "
+                                     "token".format(method))
+                result = getattr(token, method)(*args, **kwargs)
+            except Exception as e:
+                failure = e
+            finally:
+                context.sender = previous
+
+            # The buffer is rewritten once the next publication but one
+            # starts. The query may then have read anything.
+            if self._generation() >= generation // 2 * 2 + 3:
+                self._token, self._token_version = None, 0
+                continue
+            if failure is not None:
+                raise failure
+
+            staleness = time.time() - published_at
+            if self.max_staleness is not None and (
+                    staleness > self.max_staleness):
+                raise RuntimeError("Replica is {:.3f}s stale".format(
+                    staleness
+                ))
+            return result, version, staleness
+
+    def close(self):
+        """Detaches from the region."""
+        self._token = None
+        try:
+            self._memory.close()
+        except BufferError:
+            # Results still referring to the region keep it mapped until
+            # they are collected.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,247 @@
+"""The scheduler runs calls on a token from several threads at once.
+
+Token modules read the sender of a call from context.sender, which is global
+to the process. Once the scheduler is installed, context.sender is instead
+local to each thread, or asyncio task: each call carries its own sender.
+
+Calls are then isolated from each other by locks. The ACCOUNTS attribute of
+the token class lists the methods which only touch some accounts. Their
+calls lock those accounts only, so that calls on disjoint accounts run
+concurrently. An account named after an attribute which is None is not
+locked: a token can use it for accounts only some calls touch. Accounts share
+a fixed number of locks (lock striping), always acquired in the same order so
+that calls cannot deadlock. Other calls may touch the whole token and run
+alone.
+"""
+import contextlib
+import contextvars
+import inspect
+import threading
+import types
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from pikciotok import context
+
+import snapshot
+
+_sender = contextvars.ContextVar('sender')
+"""The sender of the calls of the current thread or task."""
+_default_sender = ['']
+"""The sender of threads and tasks which did not set any. It is the value of
+context.sender when the scheduler was installed."""
+_install_lock = threading.Lock()
+
+
+class _Context(types.ModuleType):
+    """The class of the context module once the scheduler is installed."""
+
+    @property
+    def sender(self) -> str:
+        return _sender.get(_default_sender[0])
+
+    @sender.setter
+    def sender(self, value: str):
+        _sender.set(value)
+
+
+def install():
+    """Makes context.sender local to each thread or task. Setting it then
+    only changes the sender of the current one. Code running in a single
+    thread sees no difference."""
+    with _install_lock:
+        if not isinstance(context, _Context):
+            _default_sender[0] = vars(context).pop('sender', '')
+            context.__class__ = _Context
+
+
+@contextlib.contextmanager
+def as_sender(sender: str):
+    """Sets the sender of the calls made in the current thread or task, for
+    the duration of the block."""
+    install()
+    reset_token = _sender.set(sender)
+    try:
+        yield
+    finally:
+        _sender.reset(reset_token)
+
+
+class _SharedLock(object):
+    """A lock held either by many shared holders, or by a single exclusive
+    one. Exclusive holders are given priority, so that they cannot starve."""
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+        """Number of exclusive holders waiting for the lock."""
+
+    def acquire_shared(self):
+        with self._condition:
+            while self._exclusive or self._waiting:
+                self._condition.wait()
+            self._shared += 1
+
+    def release_shared(self):
+        with self._condition:
+            self._shared -= 1
+            if not self._shared and self._waiting:
+                self._condition.notify_all()
+
+    def acquire_exclusive(self):
+        with self._condition:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._condition.wait()
+            self._waiting -= 1
+            self._exclusive = True
+
+    def release_exclusive(self):
+        with self._condition:
+            self._exclusive = False
+            self._condition.notify_all()
+
+
+class Scheduler(object):
+    """Runs calls on a token concurrently, locking the accounts they touch.
+
+    Installs the scheduler (see install) if needed.
+
+    :param token: A token instance, or a token module.
+    :param workers: The number of threads running submitted calls.
+    :param stripes: The number of account locks. Accounts sharing a lock
+        cannot be used concurrently.
+    """
+
+    def __init__(self, token, workers: int = 8, stripes: int = 1024):
+        install()
+        self.token = snapshot.instance_of(token)
+        self.accounts = getattr(type(self.token), 'ACCOUNTS', {})
+        # type: Dict[str, Tuple[str, ...]]
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._gate = _SharedLock()
+        """Held shared by calls locking accounts, and exclusive by the
+        others."""
+        self._methods = {}
+        # type: Dict[str, Tuple[Callable, Callable]]
+        """Bound method and accounts resolver by method name."""
+        self._executor = ThreadPoolExecutor(workers,
+                                            thread_name_prefix='scheduler')
+
+    def call(self, sender: str, method: str, *args, **kwargs) -> Any:
+        """Calls a method of the token on behalf of provided sender, in the
+        current thread, once the accounts it touches are available."""
+        entry = self._methods.get(method)
+        if entry is None:
+            entry = self._methods[method] = self._prepare(method)
+        func, accounts_of = entry
+
+        reset_token = _sender.set(sender)
+        try:
+            if accounts_of is None:
+                self._gate.acquire_exclusive()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._gate.release_exclusive()
+
+            # Accounts are found once the gate is held, so that the
+            # attributes naming them cannot change meanwhile.
+            self._gate.acquire_shared()
+            try:
+                locks = self._locks_of(accounts_of(sender, args, kwargs))
+                for lock in locks:
+                    lock.acquire()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    for lock in reversed(locks):
+                        lock.release()
+            finally:
+                self._gate.release_shared()
+        finally:
+            _sender.reset(reset_token)
+
+    def submit(self, sender: str, method: str, *args, **kwargs) -> Future:
+        """Schedules a call to run in a worker thread."""
+        return self._executor.submit(self.call, sender, method, *args,
+                                     **kwargs)
+
+    def run(self, calls: List[Tuple[str, str, tuple]]) -> List[Any]:
+        """Runs many (sender, method, args) calls concurrently and waits for
+        all of them.
+
+        :return: The results of the calls, in order. A call which failed
+            gives its exception.
+        """
+        futures = [self.submit(sender, method, *args)
+                   for sender, method, args in calls]
+        return [future.exception() or future.result() for future in futures]
+
+    def close(self):
+        """Waits for the submitted calls and stops the workers."""
+        self._executor.shutdown(wait=True)
+
+    def _locks_of(self, accounts: List) -> List[threading.Lock]:
+        """Gives the locks of provided accounts, in acquisition order.
+        Accounts which are None are left out."""
+        stripes = self._stripes
+        count = len(stripes)
+        return [stripes[i]
+                for i in sorted({hash(account) % count
+                                 for account in accounts
+                                 if account is not None})]
+
+    def _prepare(self, method: str) -> Tuple[Callable, Callable]:
+        """Gives the bound method and, for methods listed in ACCOUNTS, a
+        function giving the accounts a call touches from the sender and
+        arguments."""
+        func = getattr(self.token, method)
+        names = self.accounts.get(method)
+        if names is None:
+            return func, None
+
+        parameters = list(inspect.signature(func).parameters.values())
+        positions = {parameter.name: i
+                     for i, parameter in enumerate(parameters)}
+        getters = []
+        for name in names:
+            if name == 'sender':
+                getters.append(lambda sender, args, kwargs: sender)
+            elif name in positions:
+                getters.append(self._argument_getter(
+                    name, positions[name], parameters[positions[name]].default
+                ))
+            elif hasattr(type(self.token), name):
+                getters.append(
+                    lambda sender, args, kwargs, name=name: getattr(
+                        self.token, name
+                    )
+                )
+            else:
+                raise ValueError("'{}' is neither a parameter of {} nor an "
+                                 "attribute of the token".format(name,
+                                                                 method))
+
+        def accounts_of(sender, args, kwargs):
+            return [getter(sender, args, kwargs) for getter in getters]
+
+        return func, accounts_of
+
+    @staticmethod
+    def _argument_getter(name: str, position: int, default) -> Callable:
+        """Creates a function giving the value of an argument of a call."""
+        def argument(sender, args, kwargs):
+            if position < len(args):
+                return args[position]
+            return kwargs.get(name, default)
+
+        return argument
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,285 @@
+"""Sharded balances spread the accounts of a token over several processes,
+for tokens whose balances no longer fit comfortably in one.
+
+Addresses are partitioned by hash between shard processes, each holding the
+balances of its addresses in a map. The token talks to the shards through
+pipes: a ShardedBalances is a mapping, which tokens use as their balance_of
+attribute, and base functions work on it unchanged. Each access is a single
+request to the shard owning the address.
+
+ShardedBalances.transfer also moves a balance with a single request when
+both addresses belong to the same shard. Across shards, the coordinator
+debits the source shard, then credits the destination shard. If the credit
+fails, the debit is refunded. Only transfers across shards go through the
+coordinator, which locks the two shards involved: transfers between other
+shards run meanwhile.
+
+base functions read and write balances one at a time. The token helpers of
+the common folder use ShardedBalances.transfer instead when the balances of
+a token have it: token transfers are then single requests, or go through the
+coordinator.
+"""
+import multiprocessing
+import threading
+import zlib
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+
+class _Missing(object):
+    """Marks an address without balance in a reply of a shard."""
+
+    def __reduce__(self):
+        return '_MISSING'
+
+
+_MISSING = _Missing()
+
+
+# Shard processes
+
+def _debit(balances: dict, address, amount: int, drop_zero: bool) -> int:
+    if amount < 0:
+        raise ValueError('Cannot transfer a negative amount')
+    balance = balances.get(address, 0) if drop_zero else balances[address]
+    if balance < amount:
+        raise ValueError("'{}' balance is too low".format(address))
+    balance -= amount
+    if balance or not drop_zero:
+        balances[address] = balance
+    else:
+        balances.pop(address, None)
+    return balance
+
+
+def _credit(balances: dict, address, amount: int) -> int:
+    balances[address] = balances.get(address, 0) + amount
+    return balances[address]
+
+
+def _transfer(balances: dict, from_address, to_address, amount: int,
+              drop_zero: bool) -> bool:
+    _debit(balances, from_address, amount, drop_zero)
+    _credit(balances, to_address, amount)
+    return True
+
+
+def _update(balances: dict, items: List[Tuple[Any, int]]):
+    balances.update(items)
+
+
+_OPERATIONS = {
+    'get': lambda balances, address: balances.get(address, _MISSING),
+    'get_many': lambda balances, addresses: [
+        balances.get(address, _MISSING) for address in addresses
+    ],
+    'set': dict.__setitem__,
+    'delete': lambda balances, address: balances.pop(address, _MISSING),
+    'update': _update,
+    'len': len,
+    'keys': list,
+    'total': lambda balances: sum(balances.values()),
+    'debit': _debit,
+    'credit': _credit,
+    'transfer': _transfer,
+}
+"""Requests a shard can serve, by name. Each receives the balances of the
+shard followed by the arguments of the request."""
+
+
+def _serve(connection):
+    """Serves the requests of the owner of the shard until it is closed."""
+    balances = {}
+    while True:
+        try:
+            operation, args = connection.recv()
+        except EOFError:
+            return
+        if operation == 'close':
+            connection.send((True, None))
+            return
+        try:
+            connection.send((True, _OPERATIONS[operation](balances, *args)))
+        except Exception as e:
+            connection.send((False, e))
+
+
+class _Shard(object):
+    """The end of the pipe to a shard process."""
+
+    def __init__(self, context):
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child,),
+                                        daemon=True)
+        self._process.start()
+        child.close()
+        self._lock = threading.Lock()
+        """Keeps the requests of several threads from mixing."""
+
+    def request(self, operation: str, *args):
+        """Sends a request to the shard and gives its reply, or raises the
+        exception the shard raised."""
+        with self._lock:
+            self._connection.send((operation, args))
+            succeeded, result = self._connection.recv()
+        if not succeeded:
+            raise result
+        return result
+
+    def close(self):
+        self.request('close')
+        self._process.join()
+        self._connection.close()
+
+
+class _Coordinator(object):
+    """Runs the transfers across shards.
+
+    Each shard has a lock, held while a transfer across shards debits or
+    credits it. A transfer holds the locks of its two shards from the debit
+    to the credit, taking them in the order of the shards so that two
+    transfers never wait for each other. A total takes all the locks, so it
+    never sees an amount debited and not yet credited.
+    """
+
+    def __init__(self, shards: int):
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def transfer(self, shards: List[_Shard], source: int, destination: int,
+                 from_address, to_address, amount: int, drop_zero: bool):
+        first, second = sorted((source, destination))
+        with self._locks[first], self._locks[second]:
+            shards[source].request('debit', from_address, amount, drop_zero)
+            try:
+                shards[destination].request('credit', to_address, amount)
+            except BaseException:
+                shards[source].request('credit', from_address, amount)
+                raise
+
+    def total(self, shards: List[_Shard]) -> int:
+        """Sums the balances of the shards."""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            return sum(shard.request('total') for shard in shards)
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+
+# Balances
+
+class ShardedBalances(MutableMapping):
+    """Balances of a token, spread over shard processes.
+
+    :param shards: The number of shard processes.
+    :param balances: Balances to start with.
+    """
+
+    def __init__(self, shards: int = 4, balances: Mapping = None):
+        if shards < 1:
+            raise ValueError('At least one shard is required')
+        context = multiprocessing.get_context('spawn')
+        self._shards = [_Shard(context) for _ in range(shards)]
+        self._coordinator = _Coordinator(shards)
+        if balances:
+            self.update(balances)
+
+    def shard_of(self, address) -> int:
+        """Gives the index of the shard holding the balance of an address."""
+        return zlib.crc32(str(address).encode('utf-8')) % len(self._shards)
+
+    def _shard(self, address) -> _Shard:
+        return self._shards[self.shard_of(address)]
+
+    def __getitem__(self, address) -> int:
+        balance = self._shard(address).request('get', address)
+        if balance is _MISSING:
+            raise KeyError(address)
+        return balance
+
+    def get(self, address, default=None):
+        balance = self._shard(address).request('get', address)
+        return default if balance is _MISSING else balance
+
+    def __setitem__(self, address, balance: int):
+        self._shard(address).request('set', address, balance)
+
+    def __delitem__(self, address):
+        if self._shard(address).request('delete', address) is _MISSING:
+            raise KeyError(address)
+
+    def __contains__(self, address) -> bool:
+        return self._shard(address).request('get', address) is not _MISSING
+
+    def __len__(self) -> int:
+        return sum(shard.request('len') for shard in self._shards)
+
+    def __iter__(self) -> Iterator:
+        for shard in self._shards:
+            yield from shard.request('keys')
+
+    def get_many(self, addresses: Iterable) -> Dict[Any, int]:
+        """Gives the balances of several addresses, with one request per
+        shard. Addresses without balance are left out."""
+        by_shard = self._group(addresses)
+        balances = {}
+        for index, shard_addresses in by_shard.items():
+            values = self._shards[index].request('get_many', shard_addresses)
+            balances.update(
+                (address, value)
+                for address, value in zip(shard_addresses, values)
+                if value is not _MISSING
+            )
+        return balances
+
+    def update(self, balances=(), **kwargs):
+        """Sets several balances, with one request per shard."""
+        items = dict(balances, **kwargs)
+        for index, addresses in self._group(items).items():
+            self._shards[index].request(
+                'update', [(address, items[address]) for address in addresses]
+            )
+
+    def _group(self, addresses: Iterable) -> Dict[int, List]:
+        """Groups addresses by shard."""
+        by_shard = {}
+        for address in addresses:
+            by_shard.setdefault(self.shard_of(address), []).append(address)
+        return by_shard
+
+    def transfer(self, from_address, to_address, amount: int,
+                 drop_zero: bool = True) -> bool:
+        """Moves an amount from an account to another. Raises an exception if
+        the balance of the source account is too low.
+
+        :param drop_zero: If True, a missing source account reads as 0 and
+            an account left empty is removed. Otherwise, a missing source
+            account raises a KeyError and an empty one is kept.
+        """
+        source, destination = (self.shard_of(from_address),
+                               self.shard_of(to_address))
+        if source == destination:
+            return self._shards[source].request(
+                'transfer', from_address, to_address, amount, drop_zero
+            )
+        self._coordinator.transfer(self._shards, source, destination,
+                                   from_address, to_address, amount,
+                                   drop_zero)
+        return True
+
+    def total(self) -> int:
+        """Gives the sum of all the balances."""
+        return self._coordinator.total(self._shards)
+
+    def close(self):
+        """Stops the shard processes. Their balances are lost."""
+        for shard in self._shards:
+            shard.close()
+        self._shards = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,602 @@
+"""Snapshots save the whole state of a token instance to a compact binary file,
+and restore it later into a fresh instance.
+
+The state of a token is the content of its slots. Values are encoded with a
+tag byte followed by their payload, integers as variable length numbers. Every
+string is stored once in a table at the beginning of the file, and values
+refer to it by index, so that addresses used in many maps cost a few bytes
+only.
+
+Large maps are indexed: their entries are sorted by key and an offset table
+allows to find any of them by binary search, without decoding the others.
+Snapshots are opened through a memory mapping, so that restoring a token with
+millions of accounts only decodes the entries which are actually used.
+
+File layout:
+- a 32 bytes header: magic, version, offset of the string table, offset of
+  the values and sequence number of the last journaled call included,
+- the string table: count, offsets of each string, then UTF-8 blob,
+- the values, starting with the record of the token itself.
+
+Records name the class of their object, and restoring a snapshot imports the
+module of that class: snapshots must come from trusted sources, as pickles.
+"""
+import importlib
+import mmap
+import os
+import struct
+import types
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+_MAGIC = b'PKTS'
+"""Identifies a snapshot file."""
+_VERSION = 1
+"""Version of the format written by this module."""
+_HEADER = struct.Struct('<4sB3xQQQ')
+"""Magic, version, string table offset, values offset, sequence."""
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_FLOAT = struct.Struct('<d')
+_ENTRY = struct.Struct('<QQ')
+"""Key and value offsets of an entry of an indexed map."""
+
+_INDEX_THRESHOLD = 64
+"""Maps with at least that many entries are indexed."""
+
+# Value tags
+_NONE = b'N'[0]
+_TRUE = b'T'[0]
+_FALSE = b'F'[0]
+_INT = b'I'[0]
+_FLOAT_TAG = b'D'[0]
+_STR = b'S'[0]
+_BYTES = b'Y'[0]
+_LIST = b'L'[0]
+_TUPLE = b'U'[0]
+_SET = b'E'[0]
+_DICT = b'M'[0]
+_INDEXED_DICT = b'X'[0]
+_RECORD = b'R'[0]
+
+
+def slots_of(cls: type) -> List[str]:
+    """Gives the names of all the slots of a class, including inherited ones.
+    """
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = getattr(klass, '__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend(s for s in slots if s not in ('__dict__', '__weakref__'))
+    return names
+
+
+def type_name_of(cls: type) -> str:
+    """Gives the name under which a class is stored in snapshots."""
+    return '{}:{}'.format(cls.__module__, cls.__qualname__)
+
+
+def resolve_type(type_name: str) -> type:
+    """Finds back a class from the name it is stored under.
+
+    The module named is imported if needed: only open snapshots from trusted
+    sources, as with pickle."""
+    module_name, qualname = type_name.split(':')
+    obj = importlib.import_module(module_name)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def instance_of(token):
+    """Gives the token instance behind a token module, or the token itself."""
+    if isinstance(token, types.ModuleType):
+        return token._token
+    return token
+
+
+# Encoding
+
+class _Encoder(object):
+    """Encodes values into the values area, collecting strings on the way."""
+
+    __slots__ = ('out', 'strings')
+
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}
+        # type: Dict[str, int]
+        """Maps each string to its index in the string table."""
+
+    def uint(self, n: int):
+        """Writes an unsigned number on as few bytes as possible."""
+        out = self.out
+        while n > 0x7f:
+            out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        out.append(n)
+
+    def string_id(self, s: str) -> int:
+        """Gives the index of a string, adding it to the table if needed."""
+        index = self.strings.get(s)
+        if index is None:
+            index = self.strings[s] = len(self.strings)
+        return index
+
+    def value(self, value: Any):
+        """Writes any supported value."""
+        out = self.out
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, int):
+            out.append(_INT)
+            self.uint(value << 1 if value >= 0 else ((-value) << 1) - 1)
+        elif isinstance(value, float):
+            out.append(_FLOAT_TAG)
+            out += _FLOAT.pack(value)
+        elif isinstance(value, str):
+            out.append(_STR)
+            self.uint(self.string_id(value))
+        elif isinstance(value, (bytes, bytearray)):
+            out.append(_BYTES)
+            self.uint(len(value))
+            out += value
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            out.append(_TUPLE if isinstance(value, tuple) else
+                       _LIST if isinstance(value, list) else _SET)
+            self.uint(len(value))
+            for item in value:
+                self.value(item)
+        elif isinstance(value, Mapping):
+            self.mapping(value)
+        elif hasattr(type(value), '__slots__'):
+            self.record(value)
+        else:
+            raise TypeError("Cannot snapshot a value of type '{}'".format(
+                type(value).__name__
+            ))
+
+    def mapping(self, value: Mapping):
+        """Writes a map, indexed if it is large enough and its keys can be
+        sorted."""
+        items = None
+        if len(value) >= _INDEX_THRESHOLD:
+            try:
+                items = sorted(value.items(), key=lambda item: item[0])
+            except TypeError:
+                pass
+        if items is None:
+            self.out.append(_DICT)
+            self.uint(len(value))
+            for key, item in value.items():
+                self.value(key)
+                self.value(item)
+            return
+
+        out = self.out
+        out.append(_INDEXED_DICT)
+        out += _U64.pack(len(items))
+        table = len(out)
+        out += bytes(_ENTRY.size * len(items))
+        for i, (key, item) in enumerate(items):
+            key_offset = len(out)
+            self.value(key)
+            _ENTRY.pack_into(out, table + i * _ENTRY.size, key_offset,
+                             len(out))
+            self.value(item)
+
+    def record(self, obj: object):
+        """Writes a slotted object. Each field is prefixed by its size, so
+        that fields can be located without being decoded."""
+        out = self.out
+        fields = [(name, getattr(obj, name)) for name in slots_of(type(obj))
+                  if hasattr(obj, name)]
+        out.append(_RECORD)
+        self.uint(self.string_id(type_name_of(type(obj))))
+        self.uint(len(fields))
+        for name, value in fields:
+            self.uint(self.string_id(name))
+            size_offset = len(out)
+            out += bytes(_U64.size)
+            self.value(value)
+            _U64.pack_into(out, size_offset,
+                           len(out) - size_offset - _U64.size)
+
+    def string_table(self) -> bytes:
+        """Builds the string table: count, offsets, then UTF-8 blob."""
+        blobs = [s.encode('utf-8') for s in self.strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        if offsets[-1] > 0xffffffff:
+            raise ValueError("Too many strings to snapshot")
+        return b''.join([
+            _U32.pack(len(blobs)),
+            struct.pack('<{}I'.format(len(offsets)), *offsets),
+        ] + blobs)
+
+
+def dumps(token, sequence: int = 0) -> bytes:
+    """Encodes the state of a token instance, or of the default instance of a
+    token module.
+
+    :param sequence: The sequence number of the last journaled call included
+        in the state, if the token is journaled.
+    """
+    encoder = _Encoder()
+    encoder.record(instance_of(token))
+    strings = encoder.string_table()
+    strings_offset = _HEADER.size
+    values_offset = strings_offset + len(strings)
+    return b''.join([
+        _HEADER.pack(_MAGIC, _VERSION, strings_offset, values_offset,
+                     sequence),
+        strings,
+        encoder.out,
+    ])
+
+
+def save(token, path: str, sequence: int = 0):
+    """Writes the snapshot of a token to a file. The file is replaced
+    atomically, so that a crash never leaves a partial snapshot behind.
+    """
+    data = dumps(token, sequence)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Decoding
+
+class _Decoder(object):
+    """Decodes values from a snapshot buffer."""
+
+    __slots__ = ('buffer', 'values_offset', 'sequence', '_strings_count',
+                 '_strings_offsets', '_strings_blob', '_strings')
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, strings_offset, values_offset, sequence = (
+            _HEADER.unpack_from(buffer)
+        )
+        if magic != _MAGIC:
+            raise ValueError("Not a token snapshot")
+        if version != _VERSION:
+            raise ValueError("Unsupported snapshot version: {}".format(
+                version
+            ))
+        self.values_offset = values_offset
+        self.sequence = sequence
+        self._strings_count = _U32.unpack_from(buffer, strings_offset)[0]
+        self._strings_offsets = strings_offset + _U32.size
+        self._strings_blob = (self._strings_offsets
+                              + (self._strings_count + 1) * _U32.size)
+        self._strings = {}
+        # type: Dict[int, str]
+        """Strings decoded so far, by index."""
+
+    def uint(self, pos: int) -> Tuple[int, int]:
+        """Reads an unsigned number. Returns it with the next position."""
+        buffer = self.buffer
+        n = shift = 0
+        while True:
+            byte = buffer[pos]
+            pos += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n, pos
+            shift += 7
+
+    def string(self, index: int) -> str:
+        """Gives a string of the table, decoding it on first use."""
+        s = self._strings.get(index)
+        if s is None:
+            if index >= self._strings_count:
+                raise ValueError("Corrupted snapshot")
+            start, end = struct.unpack_from(
+                '<II', self.buffer, self._strings_offsets + index * _U32.size
+            )
+            blob = self._strings_blob
+            s = self._strings[index] = str(
+                self.buffer[blob + start:blob + end], 'utf-8'
+            )
+        return s
+
+    def value(self, pos: int, lazy: bool = False) -> Tuple[Any, int]:
+        """Reads a value. Returns it with the next position.
+
+        :param lazy: If True, an indexed map is returned as a LazyMap
+            instead of being decoded.
+        """
+        tag = self.buffer[pos]
+        pos += 1
+        if tag == _INT:
+            n, pos = self.uint(pos)
+            return (n >> 1 if not n & 1 else -((n + 1) >> 1)), pos
+        if tag == _STR:
+            n, pos = self.uint(pos)
+            return self.string(n), pos
+        if tag == _NONE:
+            return None, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _FLOAT_TAG:
+            return _FLOAT.unpack_from(self.buffer, pos)[0], pos + _FLOAT.size
+        if tag == _BYTES:
+            n, pos = self.uint(pos)
+            return bytes(self.buffer[pos:pos + n]), pos + n
+        if tag in (_LIST, _TUPLE, _SET):
+            n, pos = self.uint(pos)
+            items = []
+            for _ in range(n):
+                item, pos = self.value(pos)
+                items.append(item)
+            return (tuple(items) if tag == _TUPLE else
+                    set(items) if tag == _SET else items), pos
+        if tag == _DICT:
+            n, pos = self.uint(pos)
+            result = {}
+            for _ in range(n):
+                key, pos = self.value(pos)
+                result[key], pos = self.value(pos)
+            return result, pos
+        if tag == _INDEXED_DICT:
+            lazy_map = LazyMap(self, pos - 1)
+            return (lazy_map if lazy else dict(lazy_map.items()),
+                    lazy_map.end)
+        if tag == _RECORD:
+            type_name, fields, pos = self.record(pos - 1)
+            cls = resolve_type(type_name)
+            obj = cls.__new__(cls)
+            for name, field_pos in fields:
+                setattr(obj, name, self.value(field_pos)[0])
+            return obj, pos
+        raise ValueError("Corrupted snapshot: unknown tag {}".format(tag))
+
+    def record(self, pos: int) -> Tuple[str, List[Tuple[str, int]], int]:
+        """Locates the fields of a record without decoding them.
+
+        :return: The type name of the record, the name and position of each
+            field and the next position.
+        """
+        if self.buffer[pos] != _RECORD:
+            raise ValueError("Corrupted snapshot: record expected")
+        type_id, pos = self.uint(pos + 1)
+        count, pos = self.uint(pos)
+        fields = []
+        for _ in range(count):
+            name_id, pos = self.uint(pos)
+            size = _U64.unpack_from(self.buffer, pos)[0]
+            pos += _U64.size
+            fields.append((self.string(name_id), pos))
+            pos += size
+        return self.string(type_id), fields, pos
+
+
+class LazyMap(Mapping):
+    """A read-only view over an indexed map of a snapshot. Entries are found
+    by binary search and decoded on access only.
+    """
+
+    __slots__ = ('_decoder', '_count', '_table', 'end')
+
+    def __init__(self, decoder: _Decoder, pos: int):
+        self._decoder = decoder
+        self._count = _U64.unpack_from(decoder.buffer, pos + 1)[0]
+        self._table = pos + 1 + _U64.size
+        self.end = self._table + self._count * _ENTRY.size
+        """Position right after the map."""
+        if self._count:
+            last_value = self._entry(self._count - 1)[1]
+            self.end = decoder.value(last_value)[1]
+
+    def _entry(self, i: int) -> Tuple[int, int]:
+        """Gives the absolute positions of the key and value of an entry."""
+        key_offset, value_offset = _ENTRY.unpack_from(
+            self._decoder.buffer, self._table + i * _ENTRY.size
+        )
+        base = self._decoder.values_offset
+        return base + key_offset, base + value_offset
+
+    def _key(self, i: int):
+        """Decodes the key of an entry."""
+        return self._decoder.value(self._entry(i)[0])[0]
+
+    def _find(self, key) -> int:
+        """Gives the index of the entry of a key, or -1."""
+        low, high = 0, self._count
+        try:
+            while low < high:
+                middle = (low + high) // 2
+                if self._key(middle) < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low < self._count and self._key(low) == key:
+                return low
+        except TypeError:
+            # Key cannot be compared with the ones of the map.
+            pass
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._decoder.value(self._entry(i)[1])[0]
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator:
+        for i in range(self._count):
+            yield self._key(i)
+
+    def items(self):
+        """Decodes all the entries, in key order."""
+        decoder = self._decoder
+        for i in range(self._count):
+            key_pos, value_pos = self._entry(i)
+            yield decoder.value(key_pos)[0], decoder.value(value_pos)[0]
+
+
+_IMMUTABLE = (int, float, str, bytes, type(None), frozenset)
+"""Types of the values which a LazyDict does not need to keep aside."""
+
+
+class LazyDict(MutableMapping):
+    """A mutable map over a LazyMap. Changes are kept aside, so that the
+    snapshot is never modified and unchanged entries are never decoded.
+
+    Values read from the snapshot are kept aside as well on first access,
+    unless they are immutable, so that changes made to containers and records
+    are not lost.
+    """
+
+    __slots__ = ('_base', '_changes', '_deleted', '_len')
+
+    def __init__(self, base: LazyMap):
+        self._base = base
+        self._changes = {}
+        """Entries set or read (unless immutable) since the restore."""
+        self._deleted = set()
+        """Keys of the snapshot which have been deleted since the restore."""
+        self._len = len(base)
+
+    def __getitem__(self, key):
+        try:
+            return self._changes[key]
+        except KeyError:
+            pass
+        if key in self._deleted:
+            raise KeyError(key)
+        value = self._base[key]
+        if not isinstance(value, _IMMUTABLE):
+            self._changes[key] = value
+        return value
+
+    def __contains__(self, key) -> bool:
+        return key in self._changes or (
+            key not in self._deleted and key in self._base
+        )
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._len += 1
+        self._changes[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._changes.pop(key, None)
+        if key in self._base:
+            self._deleted.add(key)
+        self._len -= 1
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator:
+        changes, deleted = self._changes, self._deleted
+        yield from list(changes)
+        for key in self._base:
+            if key not in changes and key not in deleted:
+                yield key
+
+
+class Snapshot(object):
+    """An opened snapshot. Fields of the token are decoded on access.
+
+    :param source: The path of a snapshot file, or its content.
+    """
+
+    __slots__ = ('_decoder', 'type_name', '_fields')
+
+    def __init__(self, source: Union[str, bytes]):
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = source
+        self._decoder = _Decoder(buffer)
+        type_name, fields, _ = self._decoder.record(
+            self._decoder.values_offset
+        )
+        self.type_name = type_name
+        """The type of the token the snapshot was taken from."""
+        self._fields = dict(fields)
+        # type: Dict[str, int]
+        """Positions of the fields of the token, by name."""
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the last journaled call included in the
+        snapshot."""
+        return self._decoder.sequence
+
+    @property
+    def fields(self) -> List[str]:
+        """Names of the saved fields."""
+        return list(self._fields)
+
+    def get(self, field: str, lazy: bool = True):
+        """Decodes a field of the token. Large maps are returned as LazyMap
+        instances unless lazy is False."""
+        return self._decoder.value(self._fields[field], lazy)[0]
+
+    def close(self):
+        """Releases the memory mapping. Lazy maps of this snapshot can no
+        longer be used afterwards."""
+        buffer = self._decoder.buffer
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def loads(data: bytes) -> Dict[str, Any]:
+    """Decodes all the fields of a snapshot."""
+    snapshot = Snapshot(data)
+    return {field: snapshot.get(field, False) for field in snapshot.fields}
+
+
+def restore(token, source: Union[str, bytes, Snapshot], lazy: bool = True):
+    """Sets the state of a token instance, or of the default instance of a
+    token module, from a snapshot.
+
+    :param source: A snapshot, or a path to one, or its content.
+    :param lazy: If True, large maps are decoded on access only. The snapshot
+        then stays mapped as long as the token uses it.
+    """
+    token = instance_of(token)
+    snapshot = source if isinstance(source, Snapshot) else Snapshot(source)
+    qualname = snapshot.type_name.split(':')[1]
+    if qualname != type(token).__qualname__:
+        raise ValueError("Cannot restore a snapshot of {} into a {}".format(
+            qualname, type(token).__qualname__
+        ))
+
+    for field in snapshot.fields:
+        value = snapshot.get(field, lazy)
+        setattr(token, field,
+                LazyDict(value) if isinstance(value, LazyMap) else value)
+    if not lazy and snapshot is not source:
+        snapshot.close()
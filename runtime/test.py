@@ -0,0 +1,330 @@
+"""The test shows how the runtime tools can be used with the tokens of the
+other folders.
+
+This is not a unit test.
+"""
+import os
+import sys
+import tempfile
+import time
+
+# Tokens live in sibling folders.
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.extend(
+    os.path.join(_ROOT, folder) for folder in (
+        'common', 'equity_tokens', 'permission_tokens', 'trading_tokens',
+        'utility_tokens', 'vote_tokens'
+    )
+)
+
+from pikciotok import base, context
+
+import allowance_store
+import card_collection
+import event_bus
+import instrumentation
+import interning
+import journal
+import loyalty_card
+import parallel
+import permission
+import pikciorealms_card
+import recorder
+import replica
+import scheduler
+import shares
+import sharding
+import snapshot
+import vote
+
+
+def test_snapshot():
+    # Let's fill a loyalty card with many customers.
+    context.sender = 'Pikcio Market'
+    card = loyalty_card.LoyaltyCard()
+    card.init(supply=1000000, name_='Pikcio Points', symbol_='PKP')
+    card.grant_many({
+        'customer{}@pikcio.com'.format(i): 10 for i in range(1000)
+    })
+
+    # Save it...
+    path = os.path.join(tempfile.mkdtemp(), 'loyalty_card.snapshot')
+    snapshot.save(card, path)
+    print('Snapshot size: {} bytes'.format(os.path.getsize(path)))
+
+    # ... and restore it in a new instance. Customers are decoded on demand.
+    restored = loyalty_card.LoyaltyCard()
+    snapshot.restore(restored, path)
+    print('Customer 42 has {} points'.format(
+        restored.get_balance('customer42@pikcio.com')
+    ))
+    print('Restored card has {} accounts'.format(len(restored.balance_of)))
+
+
+def test_snapshot_records():
+    # Cards of a large collection are records, decoded on demand as well.
+    context.sender = 'PikcioRealms'
+    collection = card_collection.CardCollection()
+    collection.init(name_='PikcioRealms - First Age', symbol_='PKR')
+    collection.load_cards([
+        dict(card_symbol='PKR-{:04}'.format(i), supply=10, name_='Grunt',
+             race_='Ork', element_='Earth', level_=1, effect_='None.',
+             attack_=10, defense_=10)
+        for i in range(100)
+    ])
+
+    restored = card_collection.CardCollection()
+    snapshot.restore(restored, snapshot.dumps(collection))
+    # Changes made to a card after the restore are kept.
+    restored.mint('PKR-0005', 50)
+    print('PKR-0005: supply {}, craftsman owns {}'.format(
+        restored.get_total_supply('PKR-0005'),
+        restored.get_balance('PKR-0005', 'PikcioRealms')
+    ))
+
+
+def test_journal():
+    folder = tempfile.mkdtemp()
+    snapshot_path = os.path.join(folder, 'loyalty_card.snapshot')
+    journal_path = os.path.join(folder, 'loyalty_card.journal')
+
+    # Let's journal all the operations of a loyalty card.
+    context.sender = 'Pikcio Market'
+    with journal.Journal(journal_path) as card_journal:
+        card = journal.JournaledToken(loyalty_card.LoyaltyCard(),
+                                      card_journal)
+        card.init(supply=1000000, name_='Pikcio Points', symbol_='PKP')
+        card.transfer('john@pikcio.com', 150)
+
+        # A checkpoint saves the card and empties the journal...
+        card.checkpoint(snapshot_path)
+
+        # ... which then only keeps what happens next.
+        card.transfer('jane@pikcio.com', 80)
+
+    # After a restart, the card is back in the same state.
+    recovered = loyalty_card.LoyaltyCard()
+    replayed = journal.recover(recovered, snapshot_path, journal_path)
+    print('{} call(s) replayed. John has {} points, Jane has {}.'.format(
+        replayed, recovered.get_balance('john@pikcio.com'),
+        recovered.get_balance('jane@pikcio.com')
+    ))
+
+
+def test_journal_clock():
+    # Votes are timed: the journal replays them at their original time.
+    path = os.path.join(tempfile.mkdtemp(), 'vote.journal')
+    context.sender = 'vote place'
+    with journal.Journal(path) as poll_journal:
+        poll = journal.JournaledToken(vote.Vote(), poll_journal)
+        poll.init(supply=2, name_='Best fruit?', symbol_='FRT')
+        poll.add_candidate('Strawberry')
+        poll.register_voter('John')
+        poll.start()
+        time.sleep(0.01)
+        poll.interrupt()
+
+    recovered = vote.Vote()
+    journal.recover(recovered, path + '.snapshot', path)
+    print('Recovered vote lasted {:.3f}s, as the original one: {}'.format(
+        recovered.get_vote_duration(),
+        recovered.get_vote_duration() == poll.get_vote_duration()
+    ))
+
+
+def test_event_bus():
+    # Events of the loyalty card now go to an in-memory ring buffer, and are
+    # no longer printed.
+    ring = event_bus.RingBufferSink(capacity=100)
+    with event_bus.EventBus([ring]) as bus:
+        bus.attach(loyalty_card)
+        bus.attach(base)
+
+        context.sender = 'Pikcio Market'
+        card = loyalty_card.LoyaltyCard()
+        card.init(supply=1000000, name_='Pikcio Points', symbol_='PKP')
+        card.grant_many({'john@pikcio.com': 50, 'jane@pikcio.com': 70})
+
+        # Events keep the values their fields had when they were fired.
+        candidates = ['Alice', 'Bob']
+        bus.emit('started', {'voters_count': 2, 'candidates': candidates})
+        candidates.append('Mallory')
+
+    for _, name, fields in ring.events():
+        print('{}: {}'.format(name, fields))
+
+
+def test_instrumentation():
+    instrumentation.enable(loyalty_card)
+    try:
+        context.sender = 'Pikcio Market'
+        card = loyalty_card.LoyaltyCard()
+        card.init(supply=1000000, name_='Pikcio Points', symbol_='PKP')
+        for _ in range(1000):
+            card.get_balance('Pikcio Market')
+    finally:
+        instrumentation.disable()
+
+    for operation, metrics in sorted(instrumentation.snapshot().items()):
+        if metrics['calls']:
+            print('{}: {} call(s), p99 {:.1f}us'.format(
+                operation, metrics['calls'], metrics['p99_seconds'] * 1e6
+            ))
+
+
+def test_recorder():
+    context.sender = 'Pikcio Market'
+    loyalty_card.init(supply=1000000, name_='Pikcio Points', symbol_='PKP')
+
+    # Let's record the traffic of the loyalty card module...
+    path = os.path.join(tempfile.mkdtemp(), 'loyalty_card.trace')
+    with recorder.Recorder(loyalty_card, path):
+        for i in range(100):
+            loyalty_card.grant('customer{}@pikcio.com'.format(i % 10), 5)
+
+    # ... and replay it on a fresh card.
+    calls = recorder.replay(path)
+    print('{} calls replayed in {:.1f}us'.format(
+        len(calls), sum(latency for _, latency, _, _ in calls) * 1e6
+    ))
+
+
+def test_scheduler():
+    context.sender = 'PikcioRealms'
+    card = pikciorealms_card.PikcioRealmsCard()
+    card.init(supply=1000, name_='The Mighty PikPik', symbol_='PKR-0001')
+    players = ['player{}'.format(i) for i in range(10)]
+    for player in players:
+        card.transfer(player, 10)
+
+    # Players trade cards at the same time, from several threads.
+    with scheduler.Scheduler(card, workers=4) as trades:
+        trades.run([
+            (player, 'transfer', (players[(i + 1) % len(players)], 1))
+            for i, player in enumerate(players * 5)
+        ])
+    print('Players still own {} cards'.format(
+        sum(card.get_balance(player) for player in players)
+    ))
+
+    # Users of a reusable permission only lock their own account.
+    context.sender = 'Pikcio Corp'
+    access = permission.Permission()
+    access.init(supply=10, name_='Pikcio Office', symbol_='PKO')
+    for player in players:
+        access.transfer(player, 1)
+    with scheduler.Scheduler(access, workers=4) as doors:
+        granted = doors.run([(player, 'use_token', ()) for player in players])
+    print('{} accesses granted'.format(sum(granted)))
+
+
+def test_parallel():
+    context.sender = 'PikcioRealms'
+    card = pikciorealms_card.PikcioRealmsCard()
+    card.init(supply=1000, name_='The Mighty PikPik', symbol_='PKR-0001')
+    players = ['player{}'.format(i) for i in range(100)]
+    for player in players:
+        card.transfer(player, 10)
+
+    # Each player gives a card to the next one: none of the trades touches
+    # the accounts of another.
+    block = [
+        (players[i], 'transfer', (players[i + 1], 1))
+        for i in range(0, len(players), 2)
+    ]
+    with parallel.ParallelExecutor(card, workers=2, chunk_size=25) as blocks:
+        blocks.execute(block)
+        print('{} trades, {} run again after a conflict'.format(
+            len(block), blocks.reexecuted
+        ))
+
+
+def test_sharding():
+    with sharding.ShardedBalances(shards=4) as balances:
+        # Balances of the permission token now live in four processes.
+        context.sender = 'Pikcio Gateway'
+        gateway = permission.Permission()
+        gateway.balance_of = balances
+        gateway.init(supply=1000, name_='API access', symbol_='PKA')
+        for i in range(20):
+            gateway.transfer('user{}'.format(i), 10)
+
+        # Users trade their tokens through the token itself: each transfer
+        # is a single request, or goes through the coordinator.
+        for i in range(20):
+            context.sender = 'user{}'.format(i)
+            gateway.transfer('user{}'.format((i + 7) % 20), 5)
+        print('{} accounts on {} shards, user2 has {} tokens'.format(
+            len(balances), len({balances.shard_of(a) for a in balances}),
+            gateway.get_balance('user2')
+        ))
+        print('Total: {}'.format(balances.total()))
+
+
+def test_replica():
+    context.sender = 'Pikcio Market'
+    card = loyalty_card.LoyaltyCard()
+    card.init(supply=1000000, name_='Pikcio Points', symbol_='PKP')
+    card.transfer('john@pikcio.com', 150)
+
+    with replica.Publisher(card, capacity=1 << 16) as publisher:
+        publisher.publish()
+        # Replicas would usually live in other processes.
+        with replica.Replica(publisher.name, max_staleness=1.0) as reader:
+            balance, version, staleness = reader.query('get_balance',
+                                                       'john@pikcio.com')
+            print('John has {} points (version {}, {:.1f}ms old)'.format(
+                balance, version, staleness * 1000
+            ))
+
+
+def test_interning():
+    # Customers of the loyalty card are kept in compact columns.
+    context.sender = 'Pikcio Market'
+    card = loyalty_card.LoyaltyCard()
+    card.balance_of = interning.InternedBalances()
+    card.init(supply=1000000, name_='Pikcio Points', symbol_='PKP')
+    card.grant_many({
+        'customer{}@pikcio.com'.format(i): 10 for i in range(1000)
+    })
+    card.transfer('customer42@pikcio.com', 5)
+    print('{} accounts, {} addresses interned, customer 42 has {} '
+          'points'.format(len(card.balance_of), len(card.balance_of.table),
+                          card.get_balance('customer42@pikcio.com')))
+
+
+def test_allowance_store():
+    # Allowances of the shares live in a flat map, and expire after an hour.
+    context.sender = 'Pikcio Corp'
+    corp = shares.Shares()
+    corp.allowances = allowance_store.AllowanceStore(ttl=3600)
+    corp.init(supply=1000, name_='Pikcio Shares', symbol_='PKS')
+    corp.approve('broker@pikcio.com', 100)
+
+    context.sender = 'broker@pikcio.com'
+    corp.transfer_from('Pikcio Corp', 'john@pikcio.com', 40)
+    print('The broker can still sell {} shares'.format(
+        corp.get_allowance('broker@pikcio.com', 'Pikcio Corp')
+    ))
+
+    # An hour later, the allowance has expired.
+    removed = corp.allowances.sweep(time.time() + 3600)
+    print('{} allowance(s) expired, {} owner(s) left'.format(
+        removed, len(corp.allowances)
+    ))
+
+
+if __name__ == '__main__':
+    test_snapshot()
+    test_snapshot_records()
+    test_journal()
+    test_journal_clock()
+    test_event_bus()
+    test_instrumentation()
+    test_recorder()
+    test_scheduler()
+    test_parallel()
+    test_replica()
+    test_sharding()
+    test_interning()
+    test_allowance_store()
@@ -0,0 +1,150 @@
+"""Booster packs let players get random cards of a card collection.
+
+Each card of a pack is drawn according to its rarity: the rarer the card, the
+lower its chance to be drawn. Cards are drawn with the alias method, which
+makes each draw cost the same whatever the number of cards in the collection.
+
+All the cards pulled for a player are created and credited at once, with the
+distribute function of the collection.
+"""
+import random
+from collections import Counter
+from typing import Dict, Hashable, List, Optional
+
+DEFAULT_RARITY_WEIGHTS = {
+    "common": 70,
+    "uncommon": 20,
+    "rare": 8,
+    "legendary": 2,
+}
+"""Default chances, in percent, to draw a card of each rarity."""
+
+
+class AliasTable(object):
+    """Weighted sampling table built with Vose's alias method.
+
+    Building the table is linear in the number of items. Each sample then
+    costs one random number and one comparison.
+    """
+
+    __slots__ = ('items', 'thresholds', 'aliases')
+
+    def __init__(self, weights: Dict[Hashable, float]):
+        items = [item for item, weight in weights.items() if weight > 0]
+        if not items:
+            raise ValueError("Cannot sample from an empty set")
+
+        count = len(items)
+        total = sum(weights[item] for item in items)
+        scaled = [weights[item] * count / total for item in items]
+        self.items = items
+        self.thresholds = [1.0] * count
+        self.aliases = list(items)
+
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.thresholds[less] = scaled[less]
+            self.aliases[less] = items[more]
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rand: random.Random) -> Hashable:
+        """Draws one item."""
+        position = rand.random() * len(self.items)
+        i = int(position)
+        return (
+            self.items[i] if position - i < self.thresholds[i] else
+            self.aliases[i]
+        )
+
+    def sample_many(self, rand: random.Random, count: int) -> List[Hashable]:
+        """Draws count items at once."""
+        items, thresholds, aliases = self.items, self.thresholds, self.aliases
+        size, draw = len(items), rand.random
+        samples = []
+        append = samples.append
+        for _ in range(count):
+            position = draw() * size
+            i = int(position)
+            append(items[i] if position - i < thresholds[i] else aliases[i])
+        return samples
+
+
+class BoosterFactory(object):
+    """Opens booster packs of the cards of a collection.
+
+    The sender must be the craftsman of the collection when packs are opened,
+    as cards are created on the fly.
+
+    :param collection: The card collection from which cards are drawn. Any
+        object exposing the functions of the card_collection token works.
+    :param pack_size: Number of cards in a pack.
+    :param rarity_weights: Chances to draw a card of each rarity. Cards of
+        the same rarity share the chance of that rarity evenly.
+    :param symbols: The cards that can be drawn. All the cards of the
+        collection by default.
+    :param seed: Seed of the random generator, to replay draws.
+    """
+
+    def __init__(self, collection, pack_size: int = 10,
+                 rarity_weights: Optional[Dict[str, float]] = None,
+                 symbols: Optional[List[str]] = None,
+                 seed: Optional[int] = None):
+        if pack_size <= 0:
+            raise ValueError("Invalid pack size: {}".format(pack_size))
+        self.collection = collection
+        self.pack_size = pack_size
+        self.rarity_weights = rarity_weights or DEFAULT_RARITY_WEIGHTS
+        self.symbols = symbols
+        self.rand = random.Random(seed)
+        self.table = None
+        # type: AliasTable
+        self.refresh()
+
+    def refresh(self):
+        """Rebuilds the sampling table. As rarity depends on supply, this
+        should be called once in a while when many cards have been created.
+        """
+        weights = {}
+        for rarity, weight in self.rarity_weights.items():
+            symbols = self.collection.query(rarity=rarity)
+            if self.symbols is not None:
+                allowed = set(self.symbols)
+                symbols = [symbol for symbol in symbols if symbol in allowed]
+            for symbol in symbols:
+                weights[symbol] = weight / len(symbols)
+        self.table = AliasTable(weights)
+
+    def draw(self, packs_count: int = 1) -> Dict[str, int]:
+        """Draws the cards of several packs, without creating them.
+
+        :return: Maps the symbols of the cards drawn to their quantity.
+        """
+        return Counter(self.table.sample_many(self.rand,
+                                              packs_count * self.pack_size))
+
+    def open_packs(self, to_address: str, packs_count: int = 1
+                   ) -> Dict[str, int]:
+        """Opens packs for a player. The cards drawn are created and credited
+        to the player at once.
+
+        :return: Maps the symbols of the cards received to their quantity.
+        """
+        pulls = self.draw(packs_count)
+        self.collection.distribute(to_address, pulls)
+        return pulls
+
+    def open_packs_for(self, packs_counts: Dict[str, int]
+                       ) -> Dict[str, Dict[str, int]]:
+        """Opens packs for many players, like during a launch event.
+
+        :param packs_counts: Maps players addresses to the number of packs
+            they open.
+        :return: Maps players addresses to the cards they received.
+        """
+        return {
+            address: self.open_packs(address, packs_count)
+            for address, packs_count in packs_counts.items()
+        }
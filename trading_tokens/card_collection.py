@@ -0,0 +1,573 @@
+"""The card collection hosts a whole set of PikcioRealms cards in a single
+token, instead of one token per card.
+
+Each card is identified by its symbol. Its characteristics are stored in a
+compact record and set once for all when the card is created. Balances and
+allowances are kept per (card, player), so that any card can be traded,
+minted or burnt as it would be with a dedicated card token.
+
+The collection makes it possible to host tens of thousands of cards in one
+process, without paying for one module per card.
+
+The token state lives in CardCollection instances. The module functions and
+attributes are a facade over a default instance.
+"""
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pikciotok import base, context, events
+
+import token_support
+
+from pikciorealms_card import rarity_of
+
+_TOKEN_VERSION = "T1.0"
+
+_decimals = 0  # A card cannot be split.
+"""Maximum number of decimals to express any amount of that token."""
+
+# Events
+settled = events.register("settled", "delegate", "legs", "amount")
+"""Fired when several transfers of cards are applied at once."""
+distributed = events.register("distributed", "to_address", "cards", "amount")
+"""Fired when new cards are created and given to a player at once."""
+
+# Indexes
+# Deck builders need to search cards by characteristics. Following indexes let
+# queries pick the matching cards without scanning the whole collection.
+
+_CATEGORY_ATTRIBUTES = ('race', 'element', 'rarity')
+"""Characteristics indexed by value."""
+_RANGE_ATTRIBUTES = ('level', 'attack', 'defense', 'stamina', 'magic')
+"""Characteristics indexed by order, for range queries."""
+
+class CardDefinition(object):
+    """Characteristics and supply of a card of the collection."""
+
+    __slots__ = ('name', 'race', 'element', 'level', 'effect', 'attack',
+                 'defense', 'stamina', 'magic', 'total_supply')
+
+    def __init__(self, name_: str, race_: str, element_: str, level_: int,
+                 effect_: str, attack_: int, defense_: int, stamina_: int,
+                 magic_: int, total_supply_: int = 0):
+        self.name = name_
+        self.race = race_
+        self.element = element_
+        self.level = level_
+        self.effect = effect_
+        self.attack = attack_
+        self.defense = defense_
+        self.stamina = stamina_
+        self.magic = magic_
+        self.total_supply = total_supply_
+
+    @property
+    def rarity(self) -> str:
+        """Rarity is an indicator driven by total supply of the card"""
+        return rarity_of(self.total_supply)
+
+
+def _matches(card: CardDefinition, attribute: str, value) -> bool:
+    """Tells if a card matches a query criterion."""
+    actual = getattr(card, attribute)
+    if attribute in _CATEGORY_ATTRIBUTES:
+        return actual == value
+    min_value, max_value = value
+    return (
+        (min_value is None or actual >= min_value)
+        and (max_value is None or actual <= max_value)
+    )
+
+
+class CardCollection(object):
+    """A collection of cards, with the balances of all the players."""
+
+    __slots__ = ('name', 'symbol', 'balance_of', 'allowances', 'craftsman',
+                 'cards', 'inventories', '_category_index', '_range_index')
+
+    MUTATORS = ('init', 'create_card', 'load_cards', 'transfer', 'mint',
+                'distribute', 'burn', 'approve', 'update_approve',
+                'transfer_from', 'settle')
+    """Names of the methods changing the state of the token."""
+
+    ACCOUNTS = {
+        'transfer': ('sender', 'to_address'),
+        'approve': ('sender',),
+        'update_approve': ('sender',),
+        'transfer_from': ('from_address', 'to_address'),
+        'get_balance': ('address',),
+        'get_allowance': ('on_address',),
+    }
+    """Accounts touched by the methods which touch nothing but accounts, named
+    after their parameters, "sender" or attributes of the token. Methods not
+    listed may touch the whole token."""
+
+    MISSING_BALANCE_MEANS_ZERO = True
+    """A player who does not own a card simply has no balance for it."""
+
+    def __init__(self):
+        self.name = ''
+        """The friendly name of the collection"""
+        self.symbol = ''
+        """The symbol of the collection. Should be 3 or 4 characters long."""
+        self.balance_of = {}
+        # type: Dict[Tuple[str, str], int]
+        """Maps (card symbol, player address) pairs to the number of cards
+        owned."""
+        self.allowances = {}
+        # type: Dict[Tuple[str, str], Dict[str, int]]
+        """Gives for each (card symbol, player address) pair a map to the
+        amount of cards delegates are allowed to spend on their behalf."""
+
+        self.craftsman = ''
+        """Address of the craftsman of the collection, creating all the
+        cards."""
+
+        self.cards = {}
+        # type: Dict[str, CardDefinition]
+        """Maps card symbols to their definition."""
+
+        self.inventories = {}
+        # type: Dict[str, Dict[str, int]]
+        """Maps players addresses to the cards they own, with their quantity.
+        This is the reverse of balance_of, kept up to date by all the
+        operations moving cards."""
+
+        self._category_index = {
+            attribute: {} for attribute in _CATEGORY_ATTRIBUTES
+        }
+        # type: Dict[str, Dict[str, Set[str]]]
+        """For each categorical characteristic, maps each value to the symbols
+        of the cards having it."""
+        self._range_index = {attribute: [] for attribute in _RANGE_ATTRIBUTES}
+        # type: Dict[str, List[Tuple[int, str]]]
+        """For each numeric characteristic, pairs of (value, card symbol)
+        sorted by value."""
+
+    # Initializer
+    # The initializer creates an empty collection. Cards are created
+    # afterwards.
+
+    def init(self, name_: str, symbol_: str):
+        """Initialise this collection with a new name and symbol."""
+        self.name, self.symbol = name_, symbol_
+        self.craftsman = context.sender
+
+    def _assert_is_craftsman(self, address: str):
+        """Raises an exception if provided address is not the craftsman."""
+        if address != self.craftsman:
+            raise ValueError("'{} is not the craftsman".format(address))
+
+    def _assert_card_exists(self, card_symbol: str):
+        """Raises an exception if there is no card with provided symbol."""
+        if card_symbol not in self.cards:
+            raise KeyError("No such card: '{}'".format(card_symbol))
+
+    def _assert_card_does_not_exist(self, card_symbol: str):
+        """Raises an exception if a card with provided symbol already exists.
+        """
+        if card_symbol in self.cards:
+            raise RuntimeError("Card '{}' already exists".format(card_symbol))
+
+    # Cards management
+
+    def create_card(self, card_symbol: str, supply: int, name_: str,
+                    race_: str, element_: str, level_: int, effect_: str,
+                    attack_: int, defense_: int, stamina_: int = 0,
+                    magic_: int = 0) -> int:
+        """Adds a new card to the collection. Its supply is given to the
+        craftsman.
+
+        All characteristics of the card are set. Afterwards the card details
+        are set forever.
+
+        :return: The new number of cards in the collection.
+        """
+        self._assert_is_craftsman(context.sender)
+        self._assert_card_does_not_exist(card_symbol)
+
+        supply *= 10 ** _decimals
+        self.cards[card_symbol] = CardDefinition(
+            name_, race_, element_, level_, effect_, attack_, defense_,
+            stamina_, magic_, supply
+        )
+        if supply:
+            self.balance_of[(card_symbol, self.craftsman)] = supply
+            self._sync_inventory(card_symbol, self.craftsman)
+        self._index_card(card_symbol)
+        return self.get_cards_count()
+
+    def load_cards(self, definitions: Iterable[dict]) -> int:
+        """Creates many cards at once, for example when the collection is
+        loaded from a set definition file.
+
+        :param definitions: Each definition is a dictionary of the arguments
+            expected by create_card.
+        :return: The new number of cards in the collection.
+        """
+        for definition in definitions:
+            self.create_card(**definition)
+        return self.get_cards_count()
+
+    # Properties
+
+    def get_name(self) -> str:
+        """Gets collection name."""
+        return self.name
+
+    def get_symbol(self) -> str:
+        """Gets collection symbol."""
+        return self.symbol
+
+    def get_decimals(self) -> int:
+        """Gets the number of decimals of the cards."""
+        return _decimals
+
+    def get_cards_count(self) -> int:
+        """Gets the number of different cards in the collection."""
+        return len(self.cards)
+
+    def get_card(self, card_symbol: str) -> CardDefinition:
+        """Gets the definition of a card."""
+        self._assert_card_exists(card_symbol)
+        return self.cards[card_symbol]
+
+    def get_total_supply(self, card_symbol: str) -> int:
+        """Returns the current total supply for the card"""
+        return self.get_card(card_symbol).total_supply
+
+    def get_balance(self, card_symbol: str, address: str) -> int:
+        """Gives the current balance of the specified account for a card."""
+        return token_support.balance(self, (card_symbol, address))
+
+    def get_allowance(self, card_symbol: str, allowed_address: str,
+                      on_address: str) -> int:
+        """Gives the current allowance of allowed_address on on_address
+        account, for a card."""
+        return token_support.allowance(self, (card_symbol, on_address),
+                                       allowed_address)
+
+    def get_characteristics(self, card_symbol: str) -> dict:
+        """Returns a dictionary describing a card."""
+        card = self.get_card(card_symbol)
+        return {
+            "name": card.name,
+            "race": card.race,
+            "element": card.element,
+            "level": card.level,
+            "effect": card.effect,
+            "attack": card.attack,
+            "defense": card.defense,
+            "stamina": card.stamina,
+            "magic": card.magic,
+            "rarity": card.rarity,
+        }
+
+    # Search
+
+    def _index_card(self, card_symbol: str):
+        """Adds a newly created card to the indexes."""
+        card = self.cards[card_symbol]
+        for attribute, index in self._category_index.items():
+            index.setdefault(getattr(card, attribute), set()).add(card_symbol)
+        for attribute, index in self._range_index.items():
+            insort(index, (getattr(card, attribute), card_symbol))
+
+    def _reindex_rarity(self, card_symbol: str, old_rarity: str):
+        """Moves a card in the rarity index if its supply changed its rarity.
+        """
+        new_rarity = self.cards[card_symbol].rarity
+        if new_rarity != old_rarity:
+            index = self._category_index['rarity']
+            index[old_rarity].discard(card_symbol)
+            index.setdefault(new_rarity, set()).add(card_symbol)
+
+    def query(self, **criteria) -> List[str]:
+        """Searches the cards matching all provided criteria.
+
+        Categorical characteristics (race, element, rarity) are matched against
+        a value. Numeric ones (level, attack, defense, stamina, magic) are
+        matched against a (min, max) range, both bounds included. A None bound
+        is open.
+
+        For example, all Fire cards with attack > 200 and level < 80 are
+        obtained with:
+        query(element='Fire', attack=(201, None), level=(None, 79))
+
+        The most selective criterion gives the candidates, which are then
+        checked against the other criteria.
+
+        :return: The symbols of the matching cards, sorted.
+        """
+        selections = []
+        for attribute, value in criteria.items():
+            if attribute in self._category_index:
+                symbols = self._category_index[attribute].get(value, ())
+                selections.append((len(symbols), attribute, symbols))
+            elif attribute in self._range_index:
+                start, end = self._get_range_bounds(attribute, *value)
+                selections.append((end - start, attribute, (start, end)))
+            else:
+                raise ValueError("Cannot search by '{}'".format(attribute))
+
+        if not selections:
+            return sorted(self.cards)
+
+        selections.sort(key=lambda selection: selection[0])
+        _, attribute, selected = selections[0]
+        if attribute in self._range_index:
+            start, end = selected
+            selected = (
+                card_symbol for _, card_symbol
+                in self._range_index[attribute][start:end]
+            )
+
+        return sorted(
+            card_symbol for card_symbol in selected
+            if all(
+                _matches(self.cards[card_symbol], attribute_,
+                         criteria[attribute_])
+                for _, attribute_, _ in selections[1:]
+            )
+        )
+
+    def _get_range_bounds(self, attribute: str, min_value: Optional[int],
+                          max_value: Optional[int]) -> Tuple[int, int]:
+        """Gives the slice of the index of a numeric characteristic holding the
+        cards within provided range."""
+        index = self._range_index[attribute]
+        start = 0 if min_value is None else bisect_left(index, (min_value,))
+        end = (
+            len(index) if max_value is None else
+            bisect_left(index, (max_value + 1,))
+        )
+        return start, max(start, end)
+
+    # Actions
+
+    def transfer(self, card_symbol: str, to_address: str, amount: int) -> bool:
+        """Execute a transfer of cards from the sender to the specified
+        address."""
+        self._assert_card_exists(card_symbol)
+        if not token_support.transfer(self, (card_symbol, context.sender),
+                                      (card_symbol, to_address), amount):
+            return False
+        self._sync_inventory(card_symbol, context.sender, to_address)
+        return True
+
+    def mint(self, card_symbol: str, amount: int) -> int:
+        """Request cards creation and add created amount to sender balance.
+        Returns new total supply of the card.
+        """
+        self._assert_is_craftsman(context.sender)
+        card = self.get_card(card_symbol)
+        rarity = card.rarity
+        card.total_supply = base.mint(self.balance_of, card.total_supply,
+                                      (card_symbol, context.sender), amount)
+        self._reindex_rarity(card_symbol, rarity)
+        self._sync_inventory(card_symbol, context.sender)
+        return card.total_supply
+
+    def distribute(self, to_address: str, cards_: Dict[str, int]) -> int:
+        """Creates several cards at once and gives them to a player, like when
+        a booster pack is opened. Only the craftsman can do that.
+
+        All the cards are checked before any of them is created. A single
+        distributed event is fired.
+
+        :param to_address: The player receiving the cards.
+        :param cards_: Maps symbols of the cards to create to their quantity.
+        :return: The total number of cards created.
+        """
+        self._assert_is_craftsman(context.sender)
+        for card_symbol, amount in cards_.items():
+            self._assert_card_exists(card_symbol)
+            if amount < 0:
+                raise ValueError("Cannot create a negative amount of cards")
+
+        for card_symbol, amount in cards_.items():
+            card = self.cards[card_symbol]
+            rarity = card.rarity
+            card.total_supply += amount
+            self._reindex_rarity(card_symbol, rarity)
+            account = (card_symbol, to_address)
+            self.balance_of[account] = self.balance_of.get(account, 0) + amount
+            self._sync_inventory(card_symbol, to_address)
+
+        total = sum(cards_.values())
+        distributed(to_address=to_address, cards=cards_, amount=total)
+        return total
+
+    def burn(self, card_symbol: str, amount: int) -> int:
+        """Destroy cards. Cards are withdrawn from sender's account.
+        Returns new total supply of the card.
+        """
+        # A player might decide to destroy a card, if he possesses it.
+        card = self.get_card(card_symbol)
+        rarity = card.rarity
+        card.total_supply = token_support.burn(
+            self, card.total_supply, (card_symbol, context.sender), amount)
+        self._reindex_rarity(card_symbol, rarity)
+        self._sync_inventory(card_symbol, context.sender)
+        return card.total_supply
+
+    def approve(self, card_symbol: str, to_address: str, amount: int) -> bool:
+        """Allow specified address to spend/use some cards from sender account.
+
+        The approval is set to specified amount.
+        """
+        self._assert_card_exists(card_symbol)
+        return base.approve(self.allowances, (card_symbol, context.sender),
+                            to_address, amount)
+
+    def update_approve(self, card_symbol: str, to_address: str,
+                       delta_amount: int) -> int:
+        """Updates the amount of cards specified address is allowed to
+        spend/use from sender account.
+
+        The approval is incremented of the specified amount. Negative amounts
+        decrease the approval.
+        """
+        self._assert_card_exists(card_symbol)
+        return base.update_approve(self.allowances,
+                                   (card_symbol, context.sender), to_address,
+                                   delta_amount)
+
+    def transfer_from(self, card_symbol: str, from_address: str,
+                      to_address: str, amount: int) -> bool:
+        """Executes a transfer of cards on behalf of another address to
+        specified recipient.
+
+        Operation is only allowed if sender has sufficient allowance on the
+        source account.
+        """
+        self._assert_card_exists(card_symbol)
+        if not token_support.transfer_from(
+                self, context.sender, (card_symbol, from_address),
+                (card_symbol, to_address), amount):
+            return False
+        self._sync_inventory(card_symbol, from_address, to_address)
+        return True
+
+    def settle(self, legs: List[Tuple[str, str, str, int]]) -> bool:
+        """Applies several transfers of cards at once, or none of them. This
+        lets a trade involving several cards never be half settled.
+
+        Each leg is a (card symbol, from address, to address, amount) tuple.
+        The sender must either own the source account of a leg or have
+        sufficient allowance on it. All balances and allowances are checked
+        before any card moves, without counting cards received in the same
+        batch. A single settled event is fired.
+
+        :return: True if the legs have been applied.
+        """
+        debits = {}
+        for card_symbol, from_address, _, amount in legs:
+            self._assert_card_exists(card_symbol)
+            if amount < 0:
+                raise ValueError("Cannot transfer a negative amount")
+            source = (card_symbol, from_address)
+            debits[source] = debits.get(source, 0) + amount
+
+        balances = base.Balances(self.balance_of)
+        delegations = base.Allowances(self.allowances)
+        for source, amount in debits.items():
+            balances.require(source, amount)
+            if source[1] != context.sender \
+                    and delegations.get_one(source, context.sender) < amount:
+                raise ValueError("'{}' is not allowed to spend {} {} of '{}'"
+                                 .format(context.sender, amount, *source))
+
+        for source, amount in debits.items():
+            if source[1] != context.sender:
+                self.allowances[source][context.sender] -= amount
+        for card_symbol, from_address, to_address, amount in legs:
+            if not amount:
+                continue
+            self.balance_of[(card_symbol, from_address)] -= amount
+            destination = (card_symbol, to_address)
+            self.balance_of[destination] = (
+                self.balance_of.get(destination, 0) + amount
+            )
+        for source in debits:
+            if not self.balance_of.get(source, 1):
+                del self.balance_of[source]
+        for card_symbol, from_address, to_address, _ in legs:
+            self._sync_inventory(card_symbol, from_address, to_address)
+
+        settled(delegate=context.sender, legs=len(legs),
+                amount=sum(debits.values()))
+        return True
+
+    # Inventories
+
+    def _sync_inventory(self, card_symbol: str, *addresses: str):
+        """Reports the balances of a card for provided players in their
+        inventory."""
+        for address in addresses:
+            count = self.balance_of.get((card_symbol, address), 0)
+            inventory = self.inventories.get(address)
+            if count:
+                if inventory is None:
+                    inventory = self.inventories[address] = {}
+                inventory[card_symbol] = count
+            elif inventory is not None:
+                inventory.pop(card_symbol, None)
+                if not inventory:
+                    del self.inventories[address]
+
+    def get_inventory(self, address: str) -> Dict[str, int]:
+        """Gives the cards owned by a player, mapped to their quantity."""
+        return dict(self.inventories.get(address, {}))
+
+    def get_inventory_size(self, address: str) -> int:
+        """Gives the number of different cards owned by a player."""
+        return len(self.inventories.get(address, ()))
+
+    def has_cards(self, address: str, required: Dict[str, int]) -> bool:
+        """Tells if a player owns at least the provided quantities of cards,
+        like the cards of a deck or of a trade.
+
+        :param required: Maps symbols of the cards to the quantity required.
+        """
+        inventory = self.inventories.get(address, {})
+        return all(
+            inventory.get(card_symbol, 0) >= count
+            for card_symbol, count in required.items()
+        )
+
+
+# Default instance
+
+_token = CardCollection()
+"""The collection behind the module functions."""
+
+
+token_support.install_facade(__name__)
+
+
+init = _token.init
+create_card = _token.create_card
+load_cards = _token.load_cards
+get_name = _token.get_name
+get_symbol = _token.get_symbol
+get_decimals = _token.get_decimals
+get_cards_count = _token.get_cards_count
+get_card = _token.get_card
+get_total_supply = _token.get_total_supply
+get_balance = _token.get_balance
+get_allowance = _token.get_allowance
+get_characteristics = _token.get_characteristics
+query = _token.query
+transfer = _token.transfer
+mint = _token.mint
+distribute = _token.distribute
+burn = _token.burn
+approve = _token.approve
+update_approve = _token.update_approve
+transfer_from = _token.transfer_from
+settle = _token.settle
+get_inventory = _token.get_inventory
+get_inventory_size = _token.get_inventory_size
+has_cards = _token.has_cards
@@ -0,0 +1,378 @@
+"""The market matches the orders of players willing to trade PikcioRealms
+cards of a card collection.
+
+Players never give their cards to the market. Instead, they allow the market
+address to spend them on their behalf, and the market settles each matched
+pair of orders at once with the settle function of the collection.
+
+Two kinds of orders are supported:
+- limit orders, to buy or sell a card for a price expressed in a currency
+  (any fungible symbol of the collection, like gold coins),
+- swap orders, to exchange a quantity of a card for a quantity of another one.
+
+Orders are queued when placed and matched in batch, once per tick. Limit
+orders follow price-time priority and can be partially filled. Swap orders
+are filled entirely or not at all.
+"""
+import heapq
+import itertools
+from fractions import Fraction
+from typing import Dict, List, Optional, Tuple
+
+from pikciotok import context
+
+BUY = 'buy'
+"""Side of an order buying cards with the currency."""
+SELL = 'sell'
+"""Side of an order selling cards for the currency."""
+SWAP = 'swap'
+"""Side of an order exchanging cards for other cards."""
+
+
+class Order(object):
+    """An order placed by a player on the market.
+
+    Swap orders give quantity cards of card_symbol for wanted_quantity cards
+    of wanted_symbol. Other orders trade quantity cards of card_symbol for
+    price units of currency per card.
+    """
+
+    __slots__ = ('id', 'owner', 'side', 'card_symbol', 'quantity', 'price',
+                 'wanted_symbol', 'wanted_quantity')
+
+    def __init__(self, id_: int, owner: str, side: str, card_symbol: str,
+                 quantity: int, price: int = 0, wanted_symbol: str = '',
+                 wanted_quantity: int = 0):
+        self.id = id_
+        self.owner = owner
+        self.side = side
+        self.card_symbol = card_symbol
+        self.quantity = quantity
+        self.price = price
+        self.wanted_symbol = wanted_symbol
+        self.wanted_quantity = wanted_quantity
+
+    @property
+    def is_active(self) -> bool:
+        """Tells if the order can still be filled."""
+        return self.quantity > 0
+
+
+class Trade(object):
+    """The result of a match between two orders. Each leg is a transfer of
+    (card symbol, from address, to address, amount).
+    """
+
+    __slots__ = ('maker_id', 'taker_id', 'legs')
+
+    def __init__(self, maker_id: int, taker_id: int,
+                 legs: List[Tuple[str, str, str, int]]):
+        self.maker_id = maker_id
+        self.taker_id = taker_id
+        self.legs = legs
+
+
+class OrderBook(object):
+    """Resting limit orders on a card, by price-time priority."""
+
+    __slots__ = ('bids', 'asks')
+
+    def __init__(self):
+        self.bids = []
+        # type: List[Tuple[int, int, Order]]
+        """Heap of buy orders, best (highest) price first."""
+        self.asks = []
+        # type: List[Tuple[int, int, Order]]
+        """Heap of sell orders, best (lowest) price first."""
+
+    @staticmethod
+    def _best(heap: list) -> Optional[Order]:
+        """Gives the best active order of a side, dropping inactive ones."""
+        while heap and not heap[0][2].is_active:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def best_bid(self) -> Optional[Order]:
+        """Gives the buy order with the highest price, if any."""
+        return self._best(self.bids)
+
+    def best_ask(self) -> Optional[Order]:
+        """Gives the sell order with the lowest price, if any."""
+        return self._best(self.asks)
+
+    def add(self, order: Order):
+        """Adds a resting order to the book."""
+        if order.side == BUY:
+            heapq.heappush(self.bids, (-order.price, order.id, order))
+        else:
+            heapq.heappush(self.asks, (order.price, order.id, order))
+
+
+class Market(object):
+    """Matching engine over the cards of a collection.
+
+    :param collection: The card collection on which the cards are traded. Any
+        object exposing the functions of the card_collection token works.
+    :param currency_symbol: The symbol, in the collection, of the currency
+        used to pay for cards.
+    :param address: The address of the market. Players must allow it to
+        spend the cards and currency they trade.
+    """
+
+    def __init__(self, collection, currency_symbol: str,
+                 address: str = 'market'):
+        self.collection = collection
+        self.currency_symbol = currency_symbol
+        self.address = address
+
+        self.books = {}
+        # type: Dict[str, OrderBook]
+        """Maps card symbols to their limit order book."""
+        self.swap_books = {}
+        # type: Dict[Tuple[str, str], list]
+        """Maps (given symbol, wanted symbol) pairs to a heap of swap orders,
+        lowest ratio of wanted per given cards first."""
+        self.orders = {}
+        # type: Dict[int, Order]
+        """Active orders by id."""
+        self.pending = []
+        # type: List[Order]
+        """Orders placed since the last tick, in arrival order."""
+        self._ids = itertools.count(1)
+
+    # Orders management
+
+    def place_order(self, side: str, card_symbol: str, quantity: int,
+                    price: int) -> int:
+        """Places a limit order of the sender to buy or sell cards.
+
+        :param side: BUY or SELL.
+        :param quantity: The number of cards to buy or sell.
+        :param price: The price of one card, in currency.
+        :return: The id of the order.
+        """
+        if side not in (BUY, SELL):
+            raise ValueError("Invalid order side: '{}'".format(side))
+        if quantity <= 0 or price <= 0:
+            raise ValueError("Quantity and price must be positive")
+        if side == SELL:
+            self._assert_can_spend(context.sender, card_symbol, quantity)
+        else:
+            self._assert_can_spend(context.sender, self.currency_symbol,
+                                   quantity * price)
+
+        return self._queue(Order(next(self._ids), context.sender, side,
+                                 card_symbol, quantity, price))
+
+    def place_swap_order(self, card_symbol: str, quantity: int,
+                         wanted_symbol: str, wanted_quantity: int) -> int:
+        """Places an order of the sender to exchange some cards for others.
+        The order is filled entirely or not at all, when another player offers
+        at least the wanted cards for at most the given ones.
+
+        :return: The id of the order.
+        """
+        if quantity <= 0 or wanted_quantity <= 0:
+            raise ValueError("Quantities must be positive")
+        if card_symbol == wanted_symbol:
+            raise ValueError("Cannot swap a card for itself")
+        self._assert_can_spend(context.sender, card_symbol, quantity)
+
+        return self._queue(Order(next(self._ids), context.sender, SWAP,
+                                 card_symbol, quantity,
+                                 wanted_symbol=wanted_symbol,
+                                 wanted_quantity=wanted_quantity))
+
+    def cancel_order(self, order_id: int) -> bool:
+        """Cancels an active order of the sender.
+
+        :return: True if the order was active.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return False
+        if order.owner != context.sender:
+            raise ValueError("'{}' does not own order {}".format(
+                context.sender, order_id
+            ))
+        self._deactivate(order)
+        return True
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        """Gets an active order by id."""
+        return self.orders.get(order_id)
+
+    def get_best_bid(self, card_symbol: str) -> int:
+        """Gives the highest price a player offers for a card, or 0."""
+        order = self._book(card_symbol).best_bid()
+        return order.price if order else 0
+
+    def get_best_ask(self, card_symbol: str) -> int:
+        """Gives the lowest price a player asks for a card, or 0."""
+        order = self._book(card_symbol).best_ask()
+        return order.price if order else 0
+
+    def _queue(self, order: Order) -> int:
+        """Registers a new order, to be matched at next tick."""
+        self.orders[order.id] = order
+        self.pending.append(order)
+        return order.id
+
+    def _deactivate(self, order: Order):
+        """Removes an order from the active ones. Its entry in a book is
+        dropped lazily."""
+        order.quantity = 0
+        self.orders.pop(order.id, None)
+
+    def _book(self, card_symbol: str) -> OrderBook:
+        """Gets the order book of a card, creating it if needed."""
+        book = self.books.get(card_symbol)
+        if book is None:
+            book = self.books[card_symbol] = OrderBook()
+        return book
+
+    # Matching
+
+    def tick(self) -> List[Trade]:
+        """Matches all the orders placed since the last tick, in arrival order.
+        Each match is settled immediately. Unfilled quantities rest in the
+        books.
+
+        :return: The trades settled during this tick.
+        """
+        trades = []
+        pending, self.pending = self.pending, []
+        for order in pending:
+            if not order.is_active:
+                continue
+            if order.side == SWAP:
+                self._match_swap(order, trades)
+            else:
+                self._match_limit(order, trades)
+        return trades
+
+    def _match_limit(self, order: Order, trades: List[Trade]):
+        """Matches a limit order against the opposite side of its book."""
+        book = self._book(order.card_symbol)
+        is_buy = order.side == BUY
+        best = book.best_ask if is_buy else book.best_bid
+
+        while order.is_active:
+            maker = best()
+            if maker is None or (
+                    maker.price > order.price if is_buy else
+                    maker.price < order.price):
+                break
+
+            quantity = min(order.quantity, maker.quantity)
+            buyer, seller = (order, maker) if is_buy else (maker, order)
+            trade = Trade(maker.id, order.id, [
+                (order.card_symbol, seller.owner, buyer.owner, quantity),
+                (self.currency_symbol, buyer.owner, seller.owner,
+                 quantity * maker.price),
+            ])
+            if not self._settle_or_cancel(trade, maker, order):
+                continue
+
+            trades.append(trade)
+            for filled in (order, maker):
+                filled.quantity -= quantity
+                if not filled.is_active:
+                    self._deactivate(filled)
+
+        if order.is_active:
+            book.add(order)
+
+    def _match_swap(self, order: Order, trades: List[Trade]):
+        """Matches a swap order against the best compatible counter order.
+        The maker's terms apply: the taker gives at most what it offers and
+        gets at least what it wants.
+        """
+        counters = self.swap_books.get((order.wanted_symbol,
+                                        order.card_symbol), [])
+        max_ratio = Fraction(order.quantity, order.wanted_quantity)
+        skipped = []
+
+        while counters and order.is_active:
+            ratio, order_id, maker = heapq.heappop(counters)
+            if not maker.is_active:
+                continue
+            if ratio > max_ratio:
+                skipped.append((ratio, order_id, maker))
+                break
+            if maker.quantity < order.wanted_quantity \
+                    or maker.wanted_quantity > order.quantity:
+                skipped.append((ratio, order_id, maker))
+                continue
+
+            trade = Trade(maker.id, order.id, [
+                (maker.card_symbol, maker.owner, order.owner, maker.quantity),
+                (order.card_symbol, order.owner, maker.owner,
+                 maker.wanted_quantity),
+            ])
+            if self._settle_or_cancel(trade, maker, order):
+                trades.append(trade)
+                self._deactivate(maker)
+                self._deactivate(order)
+
+        for entry in skipped:
+            heapq.heappush(counters, entry)
+
+        if order.is_active:
+            heapq.heappush(
+                self.swap_books.setdefault(
+                    (order.card_symbol, order.wanted_symbol), []),
+                (Fraction(order.wanted_quantity, order.quantity), order.id,
+                 order)
+            )
+
+    # Settlement
+
+    def _assert_can_spend(self, owner: str, card_symbol: str, amount: int):
+        """Raises an exception if the market cannot currently spend provided
+        amount of a card on behalf of owner."""
+        if self.collection.get_balance(card_symbol, owner) < amount:
+            raise ValueError("'{}' does not have {} {}".format(
+                owner, amount, card_symbol
+            ))
+        if self.collection.get_allowance(card_symbol, self.address,
+                                         owner) < amount:
+            raise ValueError("'{}' did not allow the market to spend {} {}"
+                             .format(owner, amount, card_symbol))
+
+    def _settle_or_cancel(self, trade: Trade, maker: Order,
+                          taker: Order) -> bool:
+        """Settles a trade. If an owner cannot honor it anymore, their order is
+        cancelled.
+
+        :return: True if the trade has been settled.
+        """
+        defaulter = self._settle(trade)
+        if defaulter is None:
+            return True
+        self._deactivate(maker if defaulter == maker.owner else taker)
+        return False
+
+    def _settle(self, trade: Trade) -> Optional[str]:
+        """Applies all the legs of a trade at once, or none of them if one of
+        them cannot be applied.
+
+        :return: The owner who cannot honor the trade, if any.
+        """
+        sender, context.sender = context.sender, self.address
+        try:
+            self.collection.settle(trade.legs)
+            return None
+        except ValueError:
+            return self._find_defaulter(trade)
+        finally:
+            context.sender = sender
+
+    def _find_defaulter(self, trade: Trade) -> str:
+        """Gives the first owner who cannot provide their leg of a trade."""
+        for card_symbol, from_address, _, amount in trade.legs:
+            try:
+                self._assert_can_spend(from_address, card_symbol, amount)
+            except ValueError:
+                return from_address
+        return ''
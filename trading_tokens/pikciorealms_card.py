@@ -9,175 +9,27 @@ on the actual rules of this fictive trading card game.
 
 This kind of token is particular, as it represents only a part of a greater
 system involving several tokens.
+
+The token state lives in PikcioRealmsCard instances, so that one process can
+host as many cards as needed. The module functions and attributes are a facade
+over a default instance.
 """
 
+import json
+
 from pikciotok import base, context
 
+import token_support
+
 _TOKEN_VERSION = "T1.0"
 
-name = ''
-"""The friendly name of the token"""
-symbol = ''
-"""The symbol of the token currency. Should be 3 or 4 characters long."""
 _decimals = 0  # A card cannot be split.
 """Maximum number of decimals to express any amount of that token."""
-total_supply = 0
-"""The current amount of the token on the market, in case some has been minted 
-or burnt."""
-balance_of = {}
-# type: dict
-"""Maps customers addresses to their current balance."""
-allowances = {}
-# type: dict
-"""Gives for each customer a map to the amount delegates are allowed to spend 
-on their behalf."""
-
-craftsman = ''
-"""Address of the craftsman of the card, emitting this token."""
-
-# Card characteristics
-# In the magical world of PikcioRealms, characters have
-# A race, like Human or Ork,
-race = ''
-# An element, that gives them special powers, like Earth, Wind or Fire
-element = ''
-# A general level, to state how strong they are.
-level = 0
-# The effect of the card.
-effect = ''
-# Game characteristics
-attack = 0
-defense = 0
-stamina = 0
-magic = 0
-
-
-# Initializer
-# The initializer is partial here. init_card needs to be called afterwards.
-
-def init(supply: int, name_: str, symbol_: str):
-    """Initialise this token with a new name, symbol and supply."""
-    global total_supply, name, symbol, craftsman
-
-    name, symbol = name_, symbol_
-    balance_of[context.sender] = total_supply = (supply * 10 ** _decimals)
-    craftsman = context.sender
-
-
-def _assert_is_craftsman(address: str):
-    """Raises an exception if provided address is not the bank."""
-    if address != craftsman:
-        raise ValueError("'{} is not the craftsman".format(address))
-
-
-def _assert_characteristics_set():
-    """Raises an exception if the card details have not been set yet."""
-    if not race:
-        raise RuntimeError("Token characteristics have not been set yet.")
-
-
-def _assert_characteristics_not_set():
-    """Raises an exception if the card details have already been set."""
-    if race:
-        raise RuntimeError("Token characteristics have already been set yet.")
-
-
-def init_card(race_: str, element_: str, level_: int, effect_: str,
-              attack_: int, defense_: int, stamina_: 0, magic_: 0):
-    """Puts a meaning on the tokens emitted.
-
-    All characteristics of the card are set. Please note that this method can
-    only be called once. Afterwards the card details are set forever.
-    """
-    _assert_is_craftsman(context.sender)
-    _assert_characteristics_not_set()
-
-    global race, element, level, effect, attack, defense, stamina, magic
-
-    race = race_
-    element = element_
-    level = level_
-    effect = effect_
-    attack = attack_
-    defense = defense_
-    stamina = stamina_
-    magic = magic_
-
-
-# Properties
-
-def get_name() -> str:
-    """Gets token name."""
-    return name
-
-
-def get_symbol() -> str:
-    """Gets token symbol."""
-    return symbol
-
-
-def get_decimals() -> int:
-    """Gets the number of decimals of the token."""
-    return _decimals
-
-
-def get_total_supply() -> int:
-    """Returns the current total supply for the token"""
-    return total_supply
-
-
-def get_balance(address: str) -> int:
-    """Gives the current balance of the specified account."""
-    return base.Balances(balance_of).get(address)
-
 
-def get_allowance(allowed_address: str, on_address: str) -> int:
-    """Gives the current allowance of allowed_address on on_address account."""
-    return base.Allowances(allowances).get_one(on_address, allowed_address)
 
-
-def get_race() -> str:
-    """Gets the card race."""
-    return race
-
-
-def get_element() -> str:
-    """Gets the card element."""
-    return element
-
-
-def get_level() -> int:
-    """Gets the card level."""
-    return level
-
-
-def get_effect() -> str:
-    """Gets the card effect."""
-    return effect
-
-
-def get_attack() -> int:
-    """Gets the card attack."""
-    return attack
-
-
-def get_defense() -> int:
-    """Gets the card defense."""
-    return defense
-
-
-def get_stamina() -> int:
-    """Gets the card stamina."""
-    return stamina
-
-
-def get_magic() -> int:
-    """Gets the card magic."""
-    return magic
-
-
-def get_rarity() -> str:
-    """Rarity is an indicator driven by total supply of the card"""
+def rarity_of(total_supply: int) -> str:
+    """Gives the rarity of a card with provided total supply. The fewer the
+    cards, the rarer."""
     return (
         "common" if total_supply > 20000 else
         "uncommon" if total_supply > 10000 else
@@ -186,67 +38,316 @@ def get_rarity() -> str:
     )
 
 
-def get_characteristics() -> dict:
-    """Returns a dictionary describing this card."""
-    return {
-        attribute: globals()["get_" + attribute]()
-        for attribute in ("name", "race", "element", "level", "effect",
-                          "attack", "defense", "stamina", "magic", "rarity")
-    }
-
-# Actions
-
-
-def transfer(to_address: str, amount: int) -> bool:
-    """Execute a transfer from the sender to the specified address."""
-    return base.transfer(balance_of, context.sender, to_address, amount)
-
-
-def mint(amount: int) -> int:
-    """Request tokens creation and add created amount to sender balance.
-    Returns new total supply.
-    """
-    global total_supply
-    _assert_is_craftsman(context.sender)
-    total_supply = base.mint(balance_of, total_supply, context.sender, amount)
-    return total_supply
-
+class PikcioRealmsCard(object):
+    """A card of the PikcioRealms trading card game."""
 
-def burn(amount: int) -> int:
-    """Destroy tokens. Tokens are withdrawn from sender's account.
-    Returns new total supply.
-    """
-    global total_supply
-    # A player might decide to destroy a card, if he possesses it, so no:
-    # _assert_is_craftsman(context.sender)
-    total_supply = base.burn(balance_of, total_supply, context.sender, amount)
-    return total_supply
+    __slots__ = ('name', 'symbol', 'total_supply', 'balance_of', 'allowances',
+                 'craftsman', 'race', 'element', 'level', 'effect', 'attack',
+                 'defense', 'stamina', 'magic', 'rarity', '_characteristics',
+                 '_characteristics_json')
 
+    MUTATORS = ('init', 'init_card', 'transfer', 'mint', 'burn', 'approve',
+                'update_approve', 'transfer_from')
+    """Names of the methods changing the state of the token."""
 
-def approve(to_address: str, amount: int) -> bool:
-    """Allow specified address to spend/use some tokens from sender account.
-
-    The approval is set to specified amount.
-    """
-    return base.approve(allowances, context.sender, to_address, amount)
-
-
-def update_approve(to_address: str, delta_amount: int) -> int:
-    """Updates the amount specified address is allowed to spend/use from
-    sender account.
-
-    The approval is incremented of the specified amount. Negative amounts
-    decrease the approval.
-    """
-    return base.update_approve(allowances, context.sender, to_address,
-                               delta_amount)
-
-
-def transfer_from(from_address: str, to_address: str, amount: int) -> bool:
-    """Executes a transfer on behalf of another address to specified recipient.
-
-    Operation is only allowed if sender has sufficient allowance on the source
-    account.
-    """
-    return base.transfer_from(balance_of, allowances, context.sender,
-                              from_address, to_address, amount)
+    ACCOUNTS = {
+        'transfer': ('sender', 'to_address'),
+        'approve': ('sender',),
+        'update_approve': ('sender',),
+        'transfer_from': ('from_address', 'to_address'),
+        'get_balance': ('address',),
+        'get_allowance': ('on_address',),
+    }
+    """Accounts touched by the methods which touch nothing but accounts, named
+    after their parameters, "sender" or attributes of the token. Methods not
+    listed may touch the whole token."""
+
+    MISSING_BALANCE_MEANS_ZERO = True
+    """A player who gives away all of their cards no longer holds an
+    account."""
+
+    def __init__(self):
+        self.name = ''
+        """The friendly name of the token"""
+        self.symbol = ''
+        """The symbol of the token currency. Should be 3 or 4 characters
+        long."""
+        self.total_supply = 0
+        """The current amount of the token on the market, in case some has been
+        minted or burnt."""
+        self.balance_of = {}
+        # type: dict
+        """Maps customers addresses to their current balance."""
+        self.allowances = {}
+        # type: dict
+        """Gives for each customer a map to the amount delegates are allowed to
+        spend on their behalf."""
+
+        self.craftsman = ''
+        """Address of the craftsman of the card, emitting this token."""
+
+        # Card characteristics
+        # In the magical world of PikcioRealms, characters have
+        # A race, like Human or Ork,
+        self.race = ''
+        # An element, that gives them special powers, like Earth, Wind or Fire
+        self.element = ''
+        # A general level, to state how strong they are.
+        self.level = 0
+        # The effect of the card.
+        self.effect = ''
+        # Game characteristics
+        self.attack = 0
+        self.defense = 0
+        self.stamina = 0
+        self.magic = 0
+        # The rarity, driven by the total supply.
+        self.rarity = ''
+
+        # Characteristics do not change once the card is set, so they are built
+        # once and served as is. Only the rarity is refreshed, when the supply
+        # changes.
+        self._characteristics = {}
+        # type: dict
+        """The characteristics of the card, as returned by
+        get_characteristics."""
+        self._characteristics_json = b''
+        """The characteristics of the card, serialized in JSON."""
+
+    # Initializer
+    # The initializer is partial here. init_card needs to be called afterwards.
+
+    def init(self, supply: int, name_: str, symbol_: str):
+        """Initialise this token with a new name, symbol and supply."""
+        self.name, self.symbol = name_, symbol_
+        self.balance_of[context.sender] = self.total_supply = (
+            supply * 10 ** _decimals
+        )
+        self.craftsman = context.sender
+        self._update_rarity()
+
+    def _assert_is_craftsman(self, address: str):
+        """Raises an exception if provided address is not the bank."""
+        if address != self.craftsman:
+            raise ValueError("'{} is not the craftsman".format(address))
+
+    def _assert_characteristics_set(self):
+        """Raises an exception if the card details have not been set yet."""
+        if not self.race:
+            raise RuntimeError("Token characteristics have not been set yet.")
+
+    def _assert_characteristics_not_set(self):
+        """Raises an exception if the card details have already been set."""
+        if self.race:
+            raise RuntimeError(
+                "Token characteristics have already been set yet."
+            )
+
+    def init_card(self, race_: str, element_: str, level_: int, effect_: str,
+                  attack_: int, defense_: int, stamina_: 0, magic_: 0):
+        """Puts a meaning on the tokens emitted.
+
+        All characteristics of the card are set. Please note that this method
+        can only be called once. Afterwards the card details are set forever.
+        """
+        self._assert_is_craftsman(context.sender)
+        self._assert_characteristics_not_set()
+
+        self.race = race_
+        self.element = element_
+        self.level = level_
+        self.effect = effect_
+        self.attack = attack_
+        self.defense = defense_
+        self.stamina = stamina_
+        self.magic = magic_
+        self._freeze_characteristics()
+
+    def _freeze_characteristics(self):
+        """Builds the characteristics record and its serialized form."""
+        self._characteristics = {
+            "name": self.name,
+            "race": self.race,
+            "element": self.element,
+            "level": self.level,
+            "effect": self.effect,
+            "attack": self.attack,
+            "defense": self.defense,
+            "stamina": self.stamina,
+            "magic": self.magic,
+            "rarity": self.rarity,
+        }
+        self._characteristics_json = json.dumps(self._characteristics).encode()
+
+    def _update_rarity(self):
+        """Updates the rarity after a change of total supply. Characteristics
+        are only rebuilt if the rarity has changed."""
+        new_rarity = rarity_of(self.total_supply)
+        if new_rarity != self.rarity:
+            self.rarity = new_rarity
+            self._freeze_characteristics()
+
+    # Properties
+
+    def get_name(self) -> str:
+        """Gets token name."""
+        return self.name
+
+    def get_symbol(self) -> str:
+        """Gets token symbol."""
+        return self.symbol
+
+    def get_decimals(self) -> int:
+        """Gets the number of decimals of the token."""
+        return _decimals
+
+    def get_total_supply(self) -> int:
+        """Returns the current total supply for the token"""
+        return self.total_supply
+
+    def get_balance(self, address: str) -> int:
+        """Gives the current balance of the specified account."""
+        return token_support.balance(self, address)
+
+    def get_allowance(self, allowed_address: str, on_address: str) -> int:
+        """Gives the current allowance of allowed_address on on_address
+        account."""
+        return token_support.allowance(self, on_address, allowed_address)
+
+    def get_race(self) -> str:
+        """Gets the card race."""
+        return self.race
+
+    def get_element(self) -> str:
+        """Gets the card element."""
+        return self.element
+
+    def get_level(self) -> int:
+        """Gets the card level."""
+        return self.level
+
+    def get_effect(self) -> str:
+        """Gets the card effect."""
+        return self.effect
+
+    def get_attack(self) -> int:
+        """Gets the card attack."""
+        return self.attack
+
+    def get_defense(self) -> int:
+        """Gets the card defense."""
+        return self.defense
+
+    def get_stamina(self) -> int:
+        """Gets the card stamina."""
+        return self.stamina
+
+    def get_magic(self) -> int:
+        """Gets the card magic."""
+        return self.magic
+
+    def get_rarity(self) -> str:
+        """Rarity is an indicator driven by total supply of the card"""
+        return self.rarity
+
+    def get_characteristics(self) -> dict:
+        """Returns a dictionary describing this card."""
+        return dict(self._characteristics)
+
+    def get_characteristics_json(self) -> bytes:
+        """Returns the description of this card, serialized in JSON."""
+        return self._characteristics_json
+
+    # Actions
+
+    def transfer(self, to_address: str, amount: int) -> bool:
+        """Execute a transfer from the sender to the specified address."""
+        return token_support.transfer(self, context.sender, to_address,
+                                      amount)
+
+    def mint(self, amount: int) -> int:
+        """Request tokens creation and add created amount to sender balance.
+        Returns new total supply.
+        """
+        self._assert_is_craftsman(context.sender)
+        self.total_supply = base.mint(self.balance_of, self.total_supply,
+                                      context.sender, amount)
+        self._update_rarity()
+        return self.total_supply
+
+    def burn(self, amount: int) -> int:
+        """Destroy tokens. Tokens are withdrawn from sender's account.
+        Returns new total supply.
+        """
+        # A player might decide to destroy a card, if he possesses it, so no:
+        # self._assert_is_craftsman(context.sender)
+        self.total_supply = token_support.burn(
+            self, self.total_supply, context.sender, amount)
+        self._update_rarity()
+        return self.total_supply
+
+    def approve(self, to_address: str, amount: int) -> bool:
+        """Allow specified address to spend/use some tokens from sender
+        account.
+
+        The approval is set to specified amount.
+        """
+        return base.approve(self.allowances, context.sender, to_address,
+                            amount)
+
+    def update_approve(self, to_address: str, delta_amount: int) -> int:
+        """Updates the amount specified address is allowed to spend/use from
+        sender account.
+
+        The approval is incremented of the specified amount. Negative amounts
+        decrease the approval.
+        """
+        return base.update_approve(self.allowances, context.sender,
+                                   to_address, delta_amount)
+
+    def transfer_from(self, from_address: str, to_address: str,
+                      amount: int) -> bool:
+        """Executes a transfer on behalf of another address to specified
+        recipient.
+
+        Operation is only allowed if sender has sufficient allowance on the
+        source account.
+        """
+        return token_support.transfer_from(self, context.sender,
+                                           from_address, to_address, amount)
+
+
+# Default instance
+
+_token = PikcioRealmsCard()
+"""The card behind the module functions."""
+
+
+token_support.install_facade(__name__)
+
+
+init = _token.init
+init_card = _token.init_card
+get_name = _token.get_name
+get_symbol = _token.get_symbol
+get_decimals = _token.get_decimals
+get_total_supply = _token.get_total_supply
+get_balance = _token.get_balance
+get_allowance = _token.get_allowance
+get_race = _token.get_race
+get_element = _token.get_element
+get_level = _token.get_level
+get_effect = _token.get_effect
+get_attack = _token.get_attack
+get_defense = _token.get_defense
+get_stamina = _token.get_stamina
+get_magic = _token.get_magic
+get_rarity = _token.get_rarity
+get_characteristics = _token.get_characteristics
+get_characteristics_json = _token.get_characteristics_json
+transfer = _token.transfer
+mint = _token.mint
+burn = _token.burn
+approve = _token.approve
+update_approve = _token.update_approve
+transfer_from = _token.transfer_from
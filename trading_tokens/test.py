@@ -6,9 +6,19 @@ trading of cards.
 
 This is not a unit test.
 """
+import os
+import sys
+
+# Tokens share helpers from the common folder.
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'
+))
 
 from pikciotok import context
 
+import booster
+import card_collection
+import market
 import pikciorealms_card
 
 
@@ -35,6 +45,124 @@ def test_pikciorealms_card():
     # Check card details
     print(pikciorealms_card.get_characteristics())
 
+    # Each card can also be an instance of its own, living next to the others
+    # in the same process.
+    deck = [pikciorealms_card.PikcioRealmsCard() for _ in range(1000)]
+    for i, card in enumerate(deck):
+        card.init(supply=i + 1, name_="Pikcio Minion",
+                  symbol_="PKM-{:04}".format(i))
+    print("{} cards in the deck, the last one is {}".format(
+        len(deck), deck[-1].get_rarity()
+    ))
+
+
+def test_card_collection():
+    # A whole set of cards can also live in a single collection.
+    context.sender = "PikcioRealms"
+    card_collection.init(name_="PikcioRealms - First Age", symbol_="PKR")
+    card_collection.load_cards([
+        dict(card_symbol="PKR-0001", supply=4500, name_="The Mighty PikPik",
+             race_='Bird', element_='Fire', level_=75,
+             effect_="When it attacks, discard one card from your "
+                     "opponent's hand.",
+             attack_=250, defense_=100, stamina_=800, magic_=750),
+        dict(card_symbol="PKR-0042", supply=25000, name_="Pikcio Grunt",
+             race_='Ork', element_='Earth', level_=12,
+             effect_="None.", attack_=80, defense_=60, stamina_=300),
+    ])
+    print("Cards in the collection: {}".format(
+        card_collection.get_cards_count())
+    )
+
+    # Cards are traded separately.
+    card_collection.transfer("PKR-0042", "John Doe", 3)
+    print("John owns {} Pikcio Grunts".format(
+        card_collection.get_balance("PKR-0042", "John Doe"))
+    )
+    print(card_collection.get_characteristics("PKR-0042"))
+
+    # Deck builders can search the collection.
+    print("Fire cards with attack > 200 and level < 80: {}".format(
+        card_collection.query(element='Fire', attack=(201, None),
+                              level=(None, 79))
+    ))
+
+
+def test_market():
+    # The market works on a collection, where a currency is used to pay for
+    # cards.
+    context.sender = "PikcioRealms"
+    card_collection.init(name_="PikcioRealms - Market", symbol_="PKM")
+    card_collection.create_card(
+        card_symbol="PKR-GOLD", supply=1000000, name_="Gold coin",
+        race_='Coin', element_='None', level_=0, effect_="Buys cards.",
+        attack_=0, defense_=0
+    )
+    card_collection.create_card(
+        card_symbol="PKR-0101", supply=4500, name_="The Mighty PikPik",
+        race_='Bird', element_='Fire', level_=75,
+        effect_="When it attacks, discard one card from your opponent's hand.",
+        attack_=250, defense_=100, stamina_=800, magic_=750
+    )
+    card_collection.create_card(
+        card_symbol="PKR-0142", supply=25000, name_="Pikcio Grunt",
+        race_='Ork', element_='Earth', level_=12, effect_="None.",
+        attack_=80, defense_=60, stamina_=300
+    )
+    card_collection.transfer("PKR-GOLD", "John Doe", 1000)
+    card_collection.transfer("PKR-0101", "Alice Bourgon", 5)
+    card_collection.transfer("PKR-0142", "John Doe", 2)
+
+    pikcio_market = market.Market(card_collection, "PKR-GOLD")
+
+    # Players let the market spend what they trade.
+    context.sender = "Alice Bourgon"
+    card_collection.approve("PKR-0101", pikcio_market.address, 5)
+    pikcio_market.place_order(market.SELL, "PKR-0101", 2, 100)
+
+    context.sender = "John Doe"
+    card_collection.approve("PKR-GOLD", pikcio_market.address, 1000)
+    card_collection.approve("PKR-0142", pikcio_market.address, 2)
+    pikcio_market.place_order(market.BUY, "PKR-0101", 3, 120)
+
+    # John also offers his two grunts for one PikPik.
+    pikcio_market.place_swap_order("PKR-0142", 2, "PKR-0101", 1)
+
+    # Alice accepts the swap.
+    context.sender = "Alice Bourgon"
+    pikcio_market.place_swap_order("PKR-0101", 1, "PKR-0142", 2)
+
+    # Orders are matched once per tick.
+    trades = pikcio_market.tick()
+    print("{} trades settled.".format(len(trades)))
+    print("John owns {} PikPiks and {} gold".format(
+        card_collection.get_balance("PKR-0101", "John Doe"),
+        card_collection.get_balance("PKR-GOLD", "John Doe")
+    ))
+    print("Best bid on PikPiks is now {}".format(
+        pikcio_market.get_best_bid("PKR-0101"))
+    )
+
+
+def test_booster():
+    # Cards of the collection can be given through booster packs. Rare cards
+    # are less likely to be drawn. Gold coins are not part of the packs.
+    context.sender = "PikcioRealms"
+    factory = booster.BoosterFactory(
+        card_collection, pack_size=5, seed=42,
+        symbols=["PKR-0001", "PKR-0042", "PKR-0101", "PKR-0142"]
+    )
+    pulls = factory.open_packs("Rebecca", packs_count=3)
+    print("Rebecca opened 3 packs and got: {}".format(dict(pulls)))
+
+    # Her whole collection is known without querying every card.
+    print("Rebecca's inventory: {}".format(
+        card_collection.get_inventory("Rebecca"))
+    )
+
 
 if __name__ == '__main__':
     test_pikciorealms_card()
+    test_card_collection()
+    test_market()
+    test_booster()
@@ -2,226 +2,598 @@
 
 Customers can use their points to get items from a catalog defined by the owner
 of the token.
+
+The token state lives in LoyaltyCard instances, so that one process can host
+as many loyalty cards as needed. The module functions and attributes are a
+facade over a default instance.
 """
 
-from typing import List, Dict
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import List, Dict, Tuple
 
 from pikciotok import base, context, events
 
+import token_support
+
 _TOKEN_VERSION = "T1.0"
 
-name = ''
-"""The friendly name of the token"""
-symbol = ''
-"""The symbol of the token currency. Should be 3 or 4 characters long."""
 _decimals = 0  # A point cannot be split.
 """Maximum number of decimals to express any amount of that token."""
-total_supply = 0
-"""The current amount of the token on the market, in case some has been minted 
-or burnt."""
-balance_of = {}
-# type: dict
-"""Maps customers addresses to their current balance."""
-allowances = {}
-# type: dict
-"""Gives for each customer a map to the amount delegates are allowed to spend 
-on their behalf."""
-
-base.missing_balance_means_zero = False
-"""We do not want to delete accounts of customers who have spent all of their 
-points. So let's prevent that auto-removal by clearly stating that an empty 
-account is not equal to a missing one."""
-
-# Special attributes
-
-bank_account = ''
-"""The 'bank' account, getting the points when a client spends them.
-This is an easy to check how many points have been spent.
-"""
-gift_catalog = {}
-# type: Dict[str, int]
-"""Contains a mapping of all the gifts that can be purchased using the loyalty 
-points. Each name is mapped to a price. The case is simplified as we assume 
-there is no limit on the quantity per gift.
-"""
-
 
 # Events
 purchased = events.register("purchased", "gift", "by")
-"""The only event we are interested in is the purchase of a gift."""
-
-
-# Initializer
-
-def init(supply: int, name_: str, symbol_: str):
-    """Initialise this token with a new name, symbol and supply."""
-    global total_supply, name, symbol, bank_account
-
-    name, symbol = name_, symbol_
-    balance_of[context.sender] = total_supply = (supply * 10 ** _decimals)
-
-    # It is assumed that the token initiator is "the bank".
-    bank_account = context.sender
-
-
-# Properties
-
-def get_name() -> str:
-    """Gets token name."""
-    return name
-
-
-def get_symbol() -> str:
-    """Gets token symbol."""
-    return symbol
-
-
-def get_decimals() -> int:
-    """Gets the number of decimals of the token."""
-    return _decimals
-
-
-def get_total_supply() -> int:
-    """Returns the current total supply for the token"""
-    return total_supply
-
-
-def get_balance(address: str) -> int:
-    """Gives the current balance of the specified account."""
-    return base.Balances(balance_of).get(address)
-
-
-def get_allowance(allowed_address: str, on_address: str) -> int:
-    """Gives the current allowance of allowed_address on on_address account."""
-    return base.Allowances(allowances).get_one(on_address, allowed_address)
-
-
-# Actions
-
-def _assert_is_bank(address: str):
-    """Raises an exception if provided address is not the bank."""
-    if address != bank_account:
-        raise ValueError("'{} is not the bank".format(address))
-
-
-def transfer(to_address: str, amount: int) -> bool:
-    """Execute a transfer from the sender to the specified address."""
-    return base.transfer(balance_of, context.sender, to_address, amount)
-
-
-def mint(amount: int) -> int:
-    """Request tokens creation and add created amount to sender balance.
-    Returns new total supply.
-    """
-    global total_supply
-
-    _assert_is_bank(context.sender)
-    total_supply = base.mint(balance_of, total_supply, context.sender, amount)
-    return total_supply
-
-
-def burn(amount: int) -> int:
-    """Destroy tokens. Tokens are withdrawn from sender's account.
-    Returns new total supply.
-    """
-    global total_supply
-
-    _assert_is_bank(context.sender)
-    total_supply = base.burn(balance_of, total_supply, context.sender, amount)
-    return total_supply
-
-
-def approve(to_address: str, amount: int) -> bool:
-    """Allow specified address to spend/use some tokens from sender account.
-
-    The approval is set to specified amount.
-    """
-    raise NotImplementedError()
-
-
-def update_approve(to_address: str, delta_amount: int) -> int:
-    """Updates the amount specified address is allowed to spend/use from
-    sender account.
-
-    The approval is incremented of the specified amount. Negative amounts
-    decrease the approval.
-    """
-    raise NotImplementedError()
-
-
-def transfer_from(from_address: str, to_address: str, amount: int) -> bool:
-    """Executes a transfer on behalf of another address to specified recipient.
-
-    Operation is only allowed if sender has sufficient allowance on the source
-    account.
-    """
-    raise NotImplementedError()
-
-
-# Catalog management
-
-def get_catalog_size() -> int:
-    """Gets the current size of the catalog."""
-    return len(gift_catalog)
-
-
-def add_update_catalog(gifts: Dict[str, int]) -> int:
-    """Adds or updates items in the catalog.
-
-    :param gifts: Must be a dictionary mapping gift names to their price.
-    :return: The new size of the catalog.
-    """
-    global gift_catalog
-    _assert_is_bank(context.sender)
-
-    gift_catalog.update(gifts)
-    return get_catalog_size()
-
-
-def remove_from_catalog(gift_names: List[str]) -> int:
-    """Removes items from the catalog. If an item is already missing, its
-    removal has no effect.
-
-    :param gift_names: List of names to remove from the catalog.
-    :return: The new size of the catalog.
-    """
-    global gift_catalog
-    _assert_is_bank(context.sender)
-
-    for gift_name in gift_names:
-        if gift_name in gift_names:
-            del gift_catalog[gift_name]
-    return get_catalog_size()
-
-
-# Global accessors
-
-def get_total_spent() -> int:
-    """Gives the total number of points spent by all customers."""
-    return base.Balances(balance_of).get(bank_account)
-
-
-# Accounts management
-
-def grant(to_address: str, amount: int) -> int:
-    """Gives points to provided customer. Points are always created."""
-    _assert_is_bank(context.sender)
-
-    mint(amount)
-    transfer(to_address, amount)
-    return total_supply
-
-
-def purchase(gift_name: str) -> int:
-    """Request a purchase on specified gift from sender.
-    A purchase event is fired if the purchase is successful.
-
-    :param gift_name: Name of the gift to buy.
-    :return: The new balance of the customer.
-    """
-    if gift_name not in gift_catalog:
-        raise KeyError("No such gift: '{}'".format(gift_name))
-
-    if transfer(bank_account, gift_catalog[gift_name]):
-        purchased(gift=gift_name, by=context.sender)
-    return get_balance(context.sender)
+"""The main event we are interested in is the purchase of a gift."""
+granted = events.register("granted", "customers", "amount")
+"""Fired when points are granted to several customers at once."""
+cart_purchased = events.register("cart_purchased", "gifts", "by", "amount")
+"""Fired when a customer purchases several gifts at once."""
+redeemed = events.register("redeemed", "customers", "amount")
+"""Fired when the bank redeems a batch of purchases on behalf of customers."""
+
+
+def _month_of(timestamp: float) -> int:
+    """Gives the month of a POSIX timestamp as a number of months since year
+    0."""
+    date = datetime.fromtimestamp(timestamp, timezone.utc)
+    return date.year * 12 + date.month - 1
+
+
+class LoyaltyCard(object):
+    """A loyalty card, with its customers accounts and gift catalog."""
+
+    __slots__ = ('name', 'symbol', 'total_supply', 'balance_of', 'allowances',
+                 'bank_account', 'gift_catalog', '_catalog_index',
+                 '_stale_index_entries', 'points_validity', 'point_buckets')
+
+    MUTATORS = ('init', 'transfer', 'mint', 'burn', 'approve',
+                'update_approve', 'transfer_from', 'add_update_catalog',
+                'remove_from_catalog', 'grant', 'grant_many', 'purchase',
+                'purchase_many', 'redeem_many', 'set_points_validity',
+                'sweep_expired_points')
+    """Names of the methods changing the state of the token."""
+
+    # Most calls expire points, which changes the total supply.
+    ACCOUNTS = {
+        'get_allowance': ('on_address',),
+    }
+    """Accounts touched by the methods which touch nothing but accounts, named
+    after their parameters, "sender" or attributes of the token. Methods not
+    listed may touch the whole token."""
+
+    MISSING_BALANCE_MEANS_ZERO = False
+    """We do not want to delete accounts of customers who have spent all of
+    their points. So let's prevent that auto-removal by clearly stating that an
+    empty account is not equal to a missing one."""
+
+    UPDATING_QUERIES = ('get_balance',)
+    """Names of the queries which may change the state of the token: reading
+    a balance burns the expired points of the account."""
+
+    clock = staticmethod(time.time)
+    """Gives the current time, as a POSIX timestamp. Points expire according
+    to it."""
+
+    def __init__(self):
+        self.name = ''
+        """The friendly name of the token"""
+        self.symbol = ''
+        """The symbol of the token currency. Should be 3 or 4 characters
+        long."""
+        self.total_supply = 0
+        """The current amount of the token on the market, in case some has been
+        minted or burnt."""
+        self.balance_of = {}
+        # type: dict
+        """Maps customers addresses to their current balance."""
+        self.allowances = {}
+        # type: dict
+        """Gives for each customer a map to the amount delegates are allowed to
+        spend on their behalf."""
+
+        # Special attributes
+
+        self.bank_account = ''
+        """The 'bank' account, getting the points when a client spends them.
+        This is an easy to check how many points have been spent.
+        """
+        self.gift_catalog = {}
+        # type: Dict[str, int]
+        """Contains a mapping of all the gifts that can be purchased using the
+        loyalty points. Each name is mapped to a price. The case is simplified
+        as we assume there is no limit on the quantity per gift.
+        """
+        self._catalog_index = []
+        # type: List[Tuple[int, str]]
+        """Pairs of (price, gift name) of the catalog, kept sorted by price. It
+        lets queries on prices run as a bisection instead of a full catalog
+        scan.
+
+        Entries are not removed from the index when a gift is removed or
+        repriced. They become stale (their price no longer matches the
+        catalog) and are skipped by queries until the index is compacted."""
+        self._stale_index_entries = 0
+        """Number of entries of the index which no longer match the
+        catalog."""
+
+        self.points_validity = 0
+        """Number of months points remain valid after they have been granted.
+        0 means that points never expire."""
+        self.point_buckets = {}
+        # type: Dict[str, List[List[int]]]
+        """Maps customers addresses to their points, grouped by month of grant.
+        Each bucket is a [month, amount] pair. Buckets are sorted from the
+        oldest to the most recent, and the oldest points are always spent
+        first.
+
+        The bank has no bucket: its points never expire."""
+
+    # Initializer
+
+    def init(self, supply: int, name_: str, symbol_: str):
+        """Initialise this token with a new name, symbol and supply."""
+        self.name, self.symbol = name_, symbol_
+        self.balance_of[context.sender] = self.total_supply = (
+            supply * 10 ** _decimals
+        )
+
+        # It is assumed that the token initiator is "the bank".
+        self.bank_account = context.sender
+
+    # Properties
+
+    def get_name(self) -> str:
+        """Gets token name."""
+        return self.name
+
+    def get_symbol(self) -> str:
+        """Gets token symbol."""
+        return self.symbol
+
+    def get_decimals(self) -> int:
+        """Gets the number of decimals of the token."""
+        return _decimals
+
+    def get_total_supply(self) -> int:
+        """Returns the current total supply for the token"""
+        return self.total_supply
+
+    def get_balance(self, address: str) -> int:
+        """Gives the current balance of the specified account.
+
+        This is not a pure query: expired points of the account are burnt
+        first, which changes the balance and the total supply."""
+        self._expire_points(address)
+        return token_support.balance(self, address)
+
+    def get_allowance(self, allowed_address: str, on_address: str) -> int:
+        """Gives the current allowance of allowed_address on on_address
+        account."""
+        return token_support.allowance(self, on_address, allowed_address)
+
+    # Actions
+
+    def _assert_is_bank(self, address: str):
+        """Raises an exception if provided address is not the bank."""
+        if address != self.bank_account:
+            raise ValueError("'{} is not the bank".format(address))
+
+    def transfer(self, to_address: str, amount: int) -> bool:
+        """Execute a transfer from the sender to the specified address."""
+        self._expire_points(context.sender)
+        if not token_support.transfer(self, context.sender, to_address,
+                                      amount):
+            return False
+        self._move_points(context.sender, to_address, amount)
+        return True
+
+    def mint(self, amount: int) -> int:
+        """Request tokens creation and add created amount to sender balance.
+        Returns new total supply.
+        """
+        self._assert_is_bank(context.sender)
+        self.total_supply = base.mint(self.balance_of, self.total_supply,
+                                      context.sender, amount)
+        return self.total_supply
+
+    def burn(self, amount: int) -> int:
+        """Destroy tokens. Tokens are withdrawn from sender's account.
+        Returns new total supply.
+        """
+        self._assert_is_bank(context.sender)
+        self.total_supply = token_support.burn(
+            self, self.total_supply, context.sender, amount)
+        return self.total_supply
+
+    def approve(self, to_address: str, amount: int) -> bool:
+        """Allow specified address to spend/use some tokens from sender
+        account.
+
+        The approval is set to specified amount.
+        """
+        raise NotImplementedError()
+
+    def update_approve(self, to_address: str, delta_amount: int) -> int:
+        """Updates the amount specified address is allowed to spend/use from
+        sender account.
+
+        The approval is incremented of the specified amount. Negative amounts
+        decrease the approval.
+        """
+        raise NotImplementedError()
+
+    def transfer_from(self, from_address: str, to_address: str,
+                      amount: int) -> bool:
+        """Executes a transfer on behalf of another address to specified
+        recipient.
+
+        Operation is only allowed if sender has sufficient allowance on the
+        source account.
+        """
+        raise NotImplementedError()
+
+    # Catalog management
+
+    def get_catalog_size(self) -> int:
+        """Gets the current size of the catalog."""
+        return len(self.gift_catalog)
+
+    def add_update_catalog(self, gifts: Dict[str, int]) -> int:
+        """Adds or updates items in the catalog.
+
+        :param gifts: Must be a dictionary mapping gift names to their price.
+        :return: The new size of the catalog.
+        """
+        self._assert_is_bank(context.sender)
+
+        for gift_name, price in gifts.items():
+            old_price = self.gift_catalog.get(gift_name)
+            if old_price == price:
+                continue
+            if old_price is not None:
+                self._stale_index_entries += 1
+            self._index_gift(gift_name, price)
+            self.gift_catalog[gift_name] = price
+        self._compact_index()
+        return self.get_catalog_size()
+
+    def remove_from_catalog(self, gift_names: List[str]) -> int:
+        """Removes items from the catalog. If an item is already missing, its
+        removal has no effect.
+
+        :param gift_names: List of names to remove from the catalog.
+        :return: The new size of the catalog.
+        """
+        self._assert_is_bank(context.sender)
+
+        for gift_name in gift_names:
+            if self.gift_catalog.pop(gift_name, None) is not None:
+                self._stale_index_entries += 1
+        self._compact_index()
+        return self.get_catalog_size()
+
+    def _index_gift(self, gift_name: str, price: int):
+        """Adds an entry for a gift in the price index. If a stale entry with
+        the same price exists, it is simply brought back to life.
+        """
+        i = bisect_left(self._catalog_index, (price, gift_name))
+        if i < len(self._catalog_index) \
+                and self._catalog_index[i] == (price, gift_name):
+            self._stale_index_entries -= 1
+        else:
+            self._catalog_index.insert(i, (price, gift_name))
+
+    def _compact_index(self):
+        """Drops stale entries from the price index once they outnumber the
+        live ones. This keeps removals O(1) while bounding the index size.
+        """
+        if self._stale_index_entries > len(self.gift_catalog):
+            self._catalog_index = [
+                (price, gift_name) for price, gift_name in self._catalog_index
+                if self.gift_catalog.get(gift_name) == price
+            ]
+            self._stale_index_entries = 0
+
+    def _live_gifts(self, entries: List[Tuple[int, str]]) -> List[str]:
+        """Filters out stale entries of the price index."""
+        return [
+            gift_name for price, gift_name in entries
+            if self.gift_catalog.get(gift_name) == price
+        ]
+
+    def get_gifts_in_price_range(self, min_price: int,
+                                 max_price: int) -> List[str]:
+        """Lists the gifts whose price is between provided bounds (included),
+        by increasing price order.
+        """
+        start = bisect_left(self._catalog_index, (min_price,))
+        end = bisect_left(self._catalog_index, (max_price + 1,))
+        return self._live_gifts(self._catalog_index[start:end])
+
+    def affordable_gifts(self, address: str) -> List[str]:
+        """Lists the gifts the specified customer can afford with their current
+        balance, by increasing price order.
+        """
+        balance = self.get_balance(address)
+        end = bisect_left(self._catalog_index, (balance + 1,))
+        return self._live_gifts(self._catalog_index[:end])
+
+    # Global accessors
+
+    def get_total_spent(self) -> int:
+        """Gives the total number of points spent by all customers."""
+        return token_support.balance(self, self.bank_account)
+
+    # Accounts management
+
+    def grant(self, to_address: str, amount: int) -> int:
+        """Gives points to provided customer. Points are always created."""
+        self._assert_is_bank(context.sender)
+
+        self.mint(amount)
+        self.transfer(to_address, amount)
+        return self.total_supply
+
+    def grant_many(self, grants: Dict[str, int]) -> int:
+        """Gives points to several customers at once. Points are always
+        created.
+
+        The total is added to the supply once, then credited to all customers
+        in a single pass. Only one "granted" event is fired for the whole
+        batch: no "mint" event is fired.
+
+        :param grants: Maps customers addresses to the amount of points they
+            get.
+        :return: The new total supply.
+        """
+        self._assert_is_bank(context.sender)
+
+        if any(amount < 0 for amount in grants.values()):
+            raise ValueError("Granted amounts cannot be negative")
+        total = sum(grants.values())
+        if not total:
+            return self.total_supply
+
+        self.total_supply += total
+        month = _month_of(self.clock())
+        for address, amount in grants.items():
+            self.balance_of[address] = self.balance_of.get(address, 0) + amount
+            self._give_points(address, [[month, amount]])
+
+        granted(customers=len(grants), amount=total)
+        return self.total_supply
+
+    def purchase(self, gift_name: str) -> int:
+        """Request a purchase on specified gift from sender.
+        A purchase event is fired if the purchase is successful.
+
+        :param gift_name: Name of the gift to buy.
+        :return: The new balance of the customer.
+        """
+        if gift_name not in self.gift_catalog:
+            raise KeyError("No such gift: '{}'".format(gift_name))
+
+        if self.transfer(self.bank_account, self.gift_catalog[gift_name]):
+            purchased(gift=gift_name, by=context.sender)
+        return self.get_balance(context.sender)
+
+    def _price_cart(self, cart: Dict[str, int]) -> int:
+        """Gives the total price of a cart, mapping gift names to quantities.
+        Raises an exception if a gift does not exist or a quantity is negative.
+        """
+        total = 0
+        for gift_name, quantity in cart.items():
+            price = self.gift_catalog.get(gift_name)
+            if price is None:
+                raise KeyError("No such gift: '{}'".format(gift_name))
+            if quantity < 0:
+                raise ValueError("Invalid quantity for '{}': {}".format(
+                    gift_name, quantity
+                ))
+            total += price * quantity
+        return total
+
+    def purchase_many(self, cart: Dict[str, int]) -> int:
+        """Request a purchase of several gifts at once from sender. The whole
+        cart is bought or nothing is. A single cart_purchased event is fired if
+        the purchase is successful.
+
+        :param cart: Maps names of the gifts to buy to the quantity wanted.
+        :return: The new balance of the customer.
+        """
+        total = self._price_cart(cart)
+        if self.transfer(self.bank_account, total):
+            cart_purchased(gifts=cart, by=context.sender, amount=total)
+        return self.balance_of[context.sender]
+
+    def redeem_many(self, purchases: Dict[str, Dict[str, int]]) -> int:
+        """Redeems a batch of purchases made on behalf of customers, like the
+        ones recorded offline by a kiosk. Only the bank can do that.
+
+        All the carts are priced and checked against the customers balances
+        before any point is moved, so that the batch is applied entirely or not
+        at all.
+
+        :param purchases: Maps customers addresses to their cart.
+        :return: The total amount of points redeemed.
+        """
+        self._assert_is_bank(context.sender)
+
+        costs = {
+            address: self._price_cart(cart)
+            for address, cart in purchases.items()
+        }
+        balances = base.Balances(self.balance_of)
+        for address, cost in costs.items():
+            self._expire_points(address)
+            balances.require(address, cost)
+
+        total = 0
+        for address, cost in costs.items():
+            self.balance_of[address] -= cost
+            self._take_points(address, cost)
+            total += cost
+        self.balance_of[self.bank_account] += total
+
+        redeemed(customers=len(costs), amount=total)
+        return total
+
+    # Points expiry
+
+    def _take_points(self, address: str, amount: int) -> List[List[int]]:
+        """Removes the specified amount of points from the buckets of a
+        customer, oldest first. Balance is not updated.
+
+        :return: The buckets of the points taken, from the oldest.
+        """
+        buckets = self.point_buckets.get(address, [])
+        taken = []
+        while amount > 0 and buckets:
+            month, available = buckets[0]
+            if available > amount:
+                buckets[0][1] -= amount
+                taken.append([month, amount])
+                break
+            taken.append(buckets.pop(0))
+            amount -= available
+
+        if not buckets:
+            self.point_buckets.pop(address, None)
+        return taken
+
+    def _give_points(self, address: str, taken: List[List[int]]):
+        """Adds buckets of points to a customer, merging them with the existing
+        buckets of the same month. Balance is not updated.
+        """
+        if address == self.bank_account:
+            return
+
+        buckets = self.point_buckets.setdefault(address, [])
+        for month, amount in taken:
+            i = bisect_left(buckets, [month])
+            if i < len(buckets) and buckets[i][0] == month:
+                buckets[i][1] += amount
+            else:
+                buckets.insert(i, [month, amount])
+
+    def _move_points(self, from_address: str, to_address: str, amount: int):
+        """Moves the buckets of points of a transfer that already occurred.
+        Points coming from the bank are new and start aging from the current
+        month.
+        """
+        if from_address == self.bank_account:
+            taken = [[_month_of(self.clock()), amount]]
+        else:
+            taken = self._take_points(from_address, amount)
+        self._give_points(to_address, taken)
+
+    def _evict_expired_points(self, address: str,
+                              oldest_valid_month: int) -> int:
+        """Drops the buckets of a customer older than the provided month and
+        removes them from their balance. Total supply is not updated.
+
+        :return: The amount of points expired.
+        """
+        buckets = self.point_buckets.get(address)
+        if not buckets or buckets[0][0] >= oldest_valid_month:
+            return 0
+
+        expired_count = 0
+        while expired_count < len(buckets) \
+                and buckets[expired_count][0] < oldest_valid_month:
+            expired_count += 1
+        expired = sum(amount for _, amount in buckets[:expired_count])
+        del buckets[:expired_count]
+
+        if not buckets:
+            del self.point_buckets[address]
+        self.balance_of[address] -= expired
+        return expired
+
+    def _expire_points(self, address: str):
+        """Burns the expired points of a customer, if any."""
+        if not self.points_validity:
+            return
+        oldest_valid_month = _month_of(self.clock()) - self.points_validity + 1
+        expired = self._evict_expired_points(address, oldest_valid_month)
+        if expired:
+            self.total_supply -= expired
+            base.burnt(sender=address, amount=expired,
+                       new_supply=self.total_supply)
+
+    def get_points_validity(self) -> int:
+        """Gives the number of months points remain valid. 0 means forever."""
+        return self.points_validity
+
+    def set_points_validity(self, months: int) -> int:
+        """Defines how many months points remain valid after they have been
+        granted. 0 means that points never expire.
+
+        :return: The previous validity.
+        """
+        self._assert_is_bank(context.sender)
+        if months < 0:
+            raise ValueError("Invalid points validity: {}".format(months))
+        self.points_validity, months = months, self.points_validity
+        return months
+
+    def sweep_expired_points(self) -> int:
+        """Burns the expired points of all the customers at once. Expired
+        points are also removed lazily when an account is accessed, but this
+        job reclaims the points of inactive customers.
+
+        :return: The amount of points expired.
+        """
+        self._assert_is_bank(context.sender)
+        if not self.points_validity:
+            return 0
+
+        oldest_valid_month = _month_of(self.clock()) - self.points_validity + 1
+        expired = sum(
+            self._evict_expired_points(address, oldest_valid_month)
+            for address in list(self.point_buckets)
+        )
+        if expired:
+            self.total_supply -= expired
+            base.burnt(sender=self.bank_account, amount=expired,
+                       new_supply=self.total_supply)
+        return expired
+
+
+# Default instance
+
+_token = LoyaltyCard()
+"""The loyalty card behind the module functions."""
+
+
+token_support.install_facade(__name__)
+
+
+init = _token.init
+get_name = _token.get_name
+get_symbol = _token.get_symbol
+get_decimals = _token.get_decimals
+get_total_supply = _token.get_total_supply
+get_balance = _token.get_balance
+get_allowance = _token.get_allowance
+transfer = _token.transfer
+mint = _token.mint
+burn = _token.burn
+approve = _token.approve
+update_approve = _token.update_approve
+transfer_from = _token.transfer_from
+get_catalog_size = _token.get_catalog_size
+add_update_catalog = _token.add_update_catalog
+remove_from_catalog = _token.remove_from_catalog
+get_gifts_in_price_range = _token.get_gifts_in_price_range
+affordable_gifts = _token.affordable_gifts
+get_total_spent = _token.get_total_spent
+grant = _token.grant
+grant_many = _token.grant_many
+purchase = _token.purchase
+purchase_many = _token.purchase_many
+redeem_many = _token.redeem_many
+get_points_validity = _token.get_points_validity
+set_points_validity = _token.set_points_validity
+sweep_expired_points = _token.sweep_expired_points
@@ -3,6 +3,14 @@ let customers use their point to get those gifts.
 
 This is not a unit test.
 """
+import os
+import sys
+
+# Tokens share helpers from the common folder.
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'
+))
+
 from pikciotok import context
 
 import loyalty_card
@@ -16,6 +24,9 @@ def test_loyalty_card():
         symbol_="PIKZ"
     )
 
+    # Points are only valid for a year.
+    loyalty_card.set_points_validity(12)
+
     # And add a few gifts to the catalog.
     loyalty_card.add_update_catalog({
         'Free Drink': 200,
@@ -29,8 +40,20 @@ def test_loyalty_card():
     # Mrs Bourgon get some points because of a current promotion in the menu.
     loyalty_card.grant('alice.bourgon@mymail.com', 220)
 
+    # At the end of the day, all the receipts are settled at once.
+    loyalty_card.grant_many({
+        'john.doe@mymail.com': 40,
+        'bob.smith@mymail.com': 120,
+        'alice.bourgon@mymail.com': 15,
+    })
+
     print("Total points ever granted: {}.".format(loyalty_card.total_supply))
 
+    # Customers can see what their points can buy them.
+    print("John can afford: {}".format(
+        loyalty_card.affordable_gifts('john.doe@mymail.com'))
+    )
+
     # If Mr Doe tries to get the free pizza, it won't work.
     try:
         context.sender = 'john.doe@mymail.com'
@@ -50,6 +73,21 @@ def test_loyalty_card():
     context.sender = 'alice.bourgon@mymail.com'
     loyalty_card.purchase('Free Drink')
 
+    # Bob is hungry and buys a whole meal at once.
+    context.sender = loyalty_card.bank_account
+    loyalty_card.grant('bob.smith@mymail.com', 700)
+    context.sender = 'bob.smith@mymail.com'
+    loyalty_card.purchase_many({'Free Drink': 1, 'Free Pizza': 1})
+
+    # The kiosk was offline for a while. Its purchases are redeemed at once.
+    context.sender = loyalty_card.bank_account
+    loyalty_card.redeem_many({
+        'bob.smith@mymail.com': {'Free Drink': 1},
+    })
+    print("Bob's balance: {}".format(
+        loyalty_card.get_balance('bob.smith@mymail.com'))
+    )
+
     # We can track how many points have been spent.
     print('Total spent by everyone: {}'.format(loyalty_card.get_total_spent()))
 
@@ -3,8 +3,15 @@ people decide which option they prefer.
 
 This is not a unit test.
 """
+import os
+import sys
 from random import Random
 
+# Tokens share helpers from the common folder.
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'
+))
+
 from pikciotok import context
 
 import vote
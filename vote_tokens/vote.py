@@ -12,33 +12,24 @@ interrupt the vote.
 
 Once the vote is stopped, everyone can see results, like the winner and the
 participation.
+
+The token state lives in Vote instances, so that one process can host as many
+polls as needed. The module functions and attributes are a facade over a
+default instance.
 """
 import functools
-from datetime import datetime
+import time
 from typing import List, Callable
 
 from pikciotok import base, context, events
 
+import token_support
+
 
 _TOKEN_VERSION = "T1.0"
 
-name = ''
-"""The friendly name of the token"""
-symbol = ''
-"""The symbol of the token currency. Should be 3 or 4 characters long."""
 _decimals = 0  # A ballot cannot be split.
 """Maximum number of decimals to express any amount of that token."""
-total_supply = 0
-"""The current amount of the token on the market, in case some has been minted 
-or burnt."""
-balance_of = {}
-# type: dict
-"""Maps customers addresses to their current balance."""
-allowances = {}
-# type: dict
-"""Gives for each customer a map to the amount delegates are allowed to spend 
-on their behalf."""
-
 
 # Constants
 
@@ -54,25 +45,6 @@ _VOTE_STOP_COMPLETED = 2
 
 # Special attributes
 
-base.missing_balance_means_zero = False
-"""People must be chosen to enter a vote. More specifically, once a vote has
-started. People can't join the vote anymore. In addition, once they have 
-voted, voter must remain in the register. So there is a strict difference 
-between having no balance and not being a voter."""
-
-vote_place = ''
-"""The referee of the vote. Dispatches ballots when the vote begins."""
-
-candidates = []
-# type: List[str]
-"""The addresses of the candidates in the vote. This set must be defined when 
-a vote starts."""
-
-vote_beginning = 0
-"""Timestamp of the beginning of the current vote, if any."""
-vote_end = 0
-"""Timestamp of the end of the current vote, if any."""
-vote_stop_reason = 0
 
 # Events
 started = events.register("started", "voters_count", "candidates")
@@ -85,382 +57,457 @@ voted = events.register("voted", "participation", "remaining_votes")
 """Fired when a ballot is put into a poll."""
 
 
-# Initializer
-
-def init(supply: int, name_: str, symbol_: str):
-    """Initialise this token with a new name, symbol and supply."""
-    global total_supply, name, symbol, vote_place
-
-    name, symbol = name_, symbol_
-    balance_of[context.sender] = total_supply = (supply * 10 ** _decimals)
-
-    vote_place = context.sender  # The token creator becomes the referee.
-    balance_of[vote_place] = total_supply
-
-
-# Properties
-
-def get_name() -> str:
-    """Gets token name."""
-    return name
-
-
-def get_symbol() -> str:
-    """Gets token symbol."""
-    return symbol
-
-
-def get_decimals() -> int:
-    """Gets the number of decimals of the token."""
-    return _decimals
-
-
-def get_total_supply() -> int:
-    """Returns the current total supply for the token"""
-    return total_supply
-
-
-def get_balance(address: str) -> int:
-    """Gives the current balance of the specified account."""
-    return base.Balances(balance_of).get(address)
-
-
-def get_allowance(allowed_address: str, on_address: str) -> int:
-    """Gives the current allowance of allowed_address on on_address account."""
-    return base.Allowances(allowances).get_one(on_address, allowed_address)
-
-
-# Actions
-
-def transfer(to_address: str, amount: int) -> bool:
-    """Execute a transfer from the sender to the specified address."""
-    raise NotImplementedError()
-
-
-def mint(amount: int) -> int:
-    """Request tokens creation and add created amount to sender balance.
-    Returns new total supply.
-    """
-    global total_supply
-    _assert_no_vote_started()
-    _assert_is_vote_place(context.sender)
-
-    total_supply = base.mint(balance_of, total_supply, context.sender, amount)
-    return total_supply
-
-
-def burn(amount: int) -> int:
-    """Destroy tokens. Tokens are withdrawn from sender's account.
-    Returns new total supply.
-    """
-    global total_supply
-    _assert_no_vote_started()
-    _assert_is_vote_place(context.sender)
-
-    total_supply = base.burn(balance_of, total_supply, context.sender, amount)
-    return total_supply
-
-
-def approve(to_address: str, amount: int) -> bool:
-    """Allow specified address to spend/use some tokens from sender account.
-
-    The approval is set to specified amount.
-    """
-    return base.approve(allowances, context.sender, to_address, amount)
-
-
-def update_approve(to_address: str, delta_amount: int) -> int:
-    """Updates the amount specified address is allowed to spend/use from
-    sender account.
-
-    The approval is incremented of the specified amount. Negative amounts
-    decrease the approval.
-    """
-    return base.update_approve(allowances, context.sender, to_address,
-                               delta_amount)
-
-
-def transfer_from(from_address: str, to_address: str, amount: int) -> bool:
-    """Executes a transfer on behalf of another address to specified recipient.
-
-    Operation is only allowed if sender has sufficient allowance on the source
-    account.
-    """
-    raise NotImplementedError()
-
-
-# Global accessors
-
-def get_voters_count() -> int:
-    """Gives the current number of voters in the poll."""
-    return len(balance_of) - len(candidates) - 1  # Remove the vote place.
-
-
-def get_candidates() -> List[str]:
-    """Obtains the addresses of the current poll candidates."""
-    return candidates
-
-
-def get_candidates_count() -> int:
-    """Obtains the current number of candidates."""
-    return len(candidates)
-
-
-def is_vote_in_progress() -> bool:
-    """Indicates if a vote is currently in progress."""
-    return vote_beginning > 0
-
-
-def current_vote_beginning() -> float:
-    """Returns the timestamp of the beginning of the current vote, if any."""
-    return vote_beginning
-
-
-def current_vote_end() -> float:
-    """Returns the timestamp of the end of the current vote, if any."""
-    return vote_end
-
-
-def get_vote_stop_reason() -> int:
-    """Tells why the current vote has been stopped, if it has been stopped."""
-    return vote_stop_reason
-
-
-# Poll management
-
-def _assert_electoral_list_is_not_full():
-    """Raises an exception if the current supply of tokens does not allow to
-    add a new voter."""
-    if get_voters_count() >= total_supply:
-        raise RuntimeError('Electoral list is full')
-
-
-def _assert_vote_started():
-    """Raises an exception is no vote is currently in progress."""
-    if vote_beginning == 0:
-        raise RuntimeError("No vote currently in progress")
-
-
-def _assert_no_vote_started():
-    """Raises an exception is a vote is currently in progress."""
-    if vote_beginning > 0:
-        raise RuntimeError("A vote has already started")
-
-
-def _assert_vote_not_stopped():
-    """Raises an exception if a vote has already been stopped."""
-    if vote_stop_reason > 0:
-        raise RuntimeError('Current vote has already been stopped')
-
-
-def _assert_vote_stopped():
-    """Raises an exception if a vote has not already been stopped."""
-    if vote_stop_reason == 0:
-        raise RuntimeError('Current vote has not been stopped yet')
-
-
-def _assert_is_candidate(address: str):
-    """Raises an exception if provided address does not belong to a
-    candidate."""
-    if address not in candidates:
-        raise ValueError("'{}' is not a candidate".format(address))
-
-
-def _assert_is_vote_place(address: str):
-    """Raises an exception if provided address is not the vote place"""
-    if address != vote_place or not vote_place:
-        raise ValueError("'{} is not the vote place".format(address))
-
-
-def register_voter(address: str) -> int:
-    """Registers provided voter so that they can take part in next vote.
-
-    :returns: The new count of voters.
-    """
-    _assert_no_vote_started()
-    _assert_electoral_list_is_not_full()
-    balance_of[address] = 0
-    return get_voters_count()
-
-
-def strike_off_voter(address: str) -> int:
-    """Removes a voter from the voting list.
-
-    :returns: The new count of voters.
-    """
-    _assert_no_vote_started()
-    if address in balance_of:
-        del balance_of[address]
-    return get_voters_count()
-
-
-def add_candidate(address: str) -> int:
-    """Adds a candidate to the next vote.
-
-    :returns: The new count of candidates.
-    """
-    _assert_no_vote_started()
-
-    _assert_electoral_list_is_not_full()
-    balance_of[address] = 0
-    candidates.append(address)
-    return get_candidates_count()
-
-
-def remove_candidate(address: str) -> int:
-    """Removes a candidate from the next vote.
-
-    :returns: The new count of candidates.
-    """
-    _assert_no_vote_started()
-    _assert_is_candidate(address)
-    _assert_electoral_list_is_not_full()
-    del balance_of[address]
-    candidates.remove(address)
-    return get_candidates_count()
-
-
-def start() -> bool:
-    """Starts a new vote. Voters pool and candidates set are frozen."""
-    global vote_beginning
-
-    _assert_no_vote_started()
-    vote_beginning = datetime.utcnow().timestamp()
-
-    # Transfer one vote token to each voter.
-    for address in balance_of:
-        if address not in candidates and address != vote_place:
-            base.transfer(balance_of, vote_place, address, 1)
-
-    started(voters_count=get_voters_count(), candidates=candidates)
-    return True
-
-
-def interrupt() -> str:
-    """Manually stops the current vote. Vote can't be resumed afterwards.
-
-    :returns: The address of the winner.
-    """
-    global vote_stop_reason, vote_end
-    _assert_vote_started()
-    _assert_vote_not_stopped()
-    _assert_is_vote_place(context.sender)
-
-    vote_stop_reason = _VOTE_STOP_INTERRUPTED
-    vote_end = datetime.utcnow().timestamp()
-    interrupted(winner=get_winner(), duration=get_vote_duration())
-
-    return get_winner()
-
-
-def clear() -> bool:
-    """Clears the current vote state.
-
-    Timestamps are reset. candidate list is emptied. All tokens are transferred
-    back to the vote place.
-    """
-    global vote_stop_reason, vote_end, vote_beginning, candidates
-
-    vote_beginning = 0
-    vote_end = 0
-    vote_stop_reason = _VOTE_STOP_NOT_YET
-    candidates = []
-
-    for address in balance_of:
-        balance_of[address] = 0
-    balance_of[vote_place] = total_supply
-
-    return True
-
-
-def _do_vote(address: str, transfer_func: Callable) -> bool:
-    """Puts a ballot in provided candidate urn."""
-    global vote_stop_reason, vote_end
-
-    _assert_vote_started()
-    _assert_vote_not_stopped()
-    _assert_is_candidate(address)
-
-    if not transfer_func(balance_of=balance_of, to_address=address, amount=1):
-        return False
-
-    voted(participation=get_participation(),
-          remaining_votes=get_remaining_votes())
-
-    # Check for vote termination
-    if get_remaining_votes() == 0:
-        vote_stop_reason = _VOTE_STOP_COMPLETED
-        vote_end = datetime.utcnow().timestamp()
-        completed(winner=get_winner(), duration=get_vote_duration())
-    return True
-
-
-def vote(address: str) -> bool:
-    """Puts a ballot in provided candidate urn."""
-    # This is python sauce...
-    # We "prepare" a transfer function with some preset arguments.
-    # This will make it valid when called inside _do_vote
-    transfer_func = functools.partial(base.transfer, sender=context.sender)
-    return _do_vote(address, transfer_func)
-
-
-def vote_from(from_address, address: str) -> bool:
-    """Puts a ballot for another voter in provided candidate urn."""
-    # This is python sauce...
-    # We "prepare" a transfer function with some preset arguments.
-    # This will make it valid when called inside _do_vote
-    transfer_func = functools.partial(
-        base.transfer_from, allowances=allowances, delegate=context.sender,
-        sender=from_address
-    )
-    return _do_vote(address, transfer_func)
-
-
-# Poll info
-
-def has_voted(address: str) -> bool:
-    """Tells if voter has already made his mind."""
-    return get_balance(address) > 0
-
-
-def get_remaining_votes() -> int:
-    """Obtains the number of voters who haven't made their mind yet."""
-    _assert_vote_started()
-    return get_voters_count() - sum(balance_of[c] for c in candidates)
-
-
-def get_participation() -> float:
-    """Obtains the participation score for the current vote."""
-    return 1 - (get_remaining_votes() / get_voters_count())
-
-
-def get_vote_duration() -> float:
-    """Obtains the duration of the vote until now. The duration keeps
-    increasing until the vote is stopped somehow.
-    """
-    _assert_vote_started()
-    end = vote_end or datetime.utcnow().timestamp()
-    return end - vote_beginning
-
-
-def get_score(candidate: str) -> float:
-    """Obtains the vote percentage for the provided candidate. Such result can
-    only be queried once the vote has stopped.
-    """
-    _assert_vote_stopped()
-    _assert_is_candidate(candidate)
-    return balance_of[candidate] / get_voters_count()
-
-
-def get_ranking() -> List[str]:
-    """Obtains the complete ranking of all the candidates, by decreasing score
-    order. Such result can only be queried once the vote has stopped.
-    """
-    _assert_vote_stopped()
-    return list(sorted(candidates, reverse=True, key=lambda c: get_score(c)))
-
-
-def get_winner() -> str:
-    """Obtains the address of the winning candidate."""
-    ranking = get_ranking()
-    return ranking[0] if ranking else ''
+class Vote(object):
+    """A poll between candidates."""
+
+    __slots__ = ('name', 'symbol', 'total_supply', 'balance_of', 'allowances',
+                 'vote_place', 'candidates', 'vote_beginning', 'vote_end',
+                 'vote_stop_reason')
+
+    MUTATORS = ('init', 'transfer', 'mint', 'burn', 'approve',
+                'update_approve', 'transfer_from', 'register_voter',
+                'strike_off_voter', 'add_candidate', 'remove_candidate',
+                'start', 'interrupt', 'clear', 'vote', 'vote_from')
+    """Names of the methods changing the state of the token."""
+
+    ACCOUNTS = {
+        'approve': ('sender',),
+        'update_approve': ('sender',),
+        'get_balance': ('address',),
+        'get_allowance': ('on_address',),
+    }
+    """Accounts touched by the methods which touch nothing but accounts, named
+    after their parameters, "sender" or attributes of the token. Methods not
+    listed may touch the whole token."""
+
+    MISSING_BALANCE_MEANS_ZERO = False
+    """People must be chosen to enter a vote. More specifically, once a vote
+    has started. People can't join the vote anymore. In addition, once they
+    have voted, voter must remain in the register. So there is a strict
+    difference between having no balance and not being a voter."""
+
+    clock = staticmethod(time.time)
+    """Gives the current time, as a POSIX timestamp. Votes are timed with
+    it."""
+
+    def __init__(self):
+        self.name = ''
+        """The friendly name of the token"""
+        self.symbol = ''
+        """The symbol of the token currency. Should be 3 or 4 characters
+        long."""
+        self.total_supply = 0
+        """The current amount of the token on the market, in case some has been
+        minted or burnt."""
+        self.balance_of = {}
+        # type: dict
+        """Maps customers addresses to their current balance."""
+        self.allowances = {}
+        # type: dict
+        """Gives for each customer a map to the amount delegates are allowed to
+        spend on their behalf."""
+
+        # Special attributes
+
+        self.vote_place = ''
+        """The referee of the vote. Dispatches ballots when the vote begins."""
+        self.candidates = []
+        # type: List[str]
+        """The addresses of the candidates in the vote. This set must be
+        defined when a vote starts."""
+        self.vote_beginning = 0
+        """Timestamp of the beginning of the current vote, if any."""
+        self.vote_end = 0
+        """Timestamp of the end of the current vote, if any."""
+        self.vote_stop_reason = 0
+
+    # Initializer
+
+    def init(self, supply: int, name_: str, symbol_: str):
+        """Initialise this token with a new name, symbol and supply."""
+        self.name, self.symbol = name_, symbol_
+        self.balance_of[context.sender] = self.total_supply = (
+            supply * 10 ** _decimals
+        )
+
+        # The token creator becomes the referee.
+        self.vote_place = context.sender
+        self.balance_of[self.vote_place] = self.total_supply
+
+    # Properties
+
+    def get_name(self) -> str:
+        """Gets token name."""
+        return self.name
+
+    def get_symbol(self) -> str:
+        """Gets token symbol."""
+        return self.symbol
+
+    def get_decimals(self) -> int:
+        """Gets the number of decimals of the token."""
+        return _decimals
+
+    def get_total_supply(self) -> int:
+        """Returns the current total supply for the token"""
+        return self.total_supply
+
+    def get_balance(self, address: str) -> int:
+        """Gives the current balance of the specified account."""
+        return token_support.balance(self, address)
+
+    def get_allowance(self, allowed_address: str, on_address: str) -> int:
+        """Gives the current allowance of allowed_address on on_address
+        account."""
+        return token_support.allowance(self, on_address, allowed_address)
+
+    # Actions
+
+    def transfer(self, to_address: str, amount: int) -> bool:
+        """Execute a transfer from the sender to the specified address."""
+        raise NotImplementedError()
+
+    def mint(self, amount: int) -> int:
+        """Request tokens creation and add created amount to sender balance.
+        Returns new total supply.
+        """
+        self._assert_no_vote_started()
+        self._assert_is_vote_place(context.sender)
+
+        self.total_supply = base.mint(self.balance_of, self.total_supply,
+                                      context.sender, amount)
+        return self.total_supply
+
+    def burn(self, amount: int) -> int:
+        """Destroy tokens. Tokens are withdrawn from sender's account.
+        Returns new total supply.
+        """
+        self._assert_no_vote_started()
+        self._assert_is_vote_place(context.sender)
+
+        self.total_supply = token_support.burn(
+            self, self.total_supply, context.sender, amount)
+        return self.total_supply
+
+    def approve(self, to_address: str, amount: int) -> bool:
+        """Allow specified address to spend/use some tokens from sender
+        account.
+
+        The approval is set to specified amount.
+        """
+        return base.approve(self.allowances, context.sender, to_address,
+                            amount)
+
+    def update_approve(self, to_address: str, delta_amount: int) -> int:
+        """Updates the amount specified address is allowed to spend/use from
+        sender account.
+
+        The approval is incremented of the specified amount. Negative amounts
+        decrease the approval.
+        """
+        return base.update_approve(self.allowances, context.sender,
+                                   to_address, delta_amount)
+
+    def transfer_from(self, from_address: str, to_address: str,
+                      amount: int) -> bool:
+        """Executes a transfer on behalf of another address to specified
+        recipient.
+
+        Operation is only allowed if sender has sufficient allowance on the
+        source account.
+        """
+        raise NotImplementedError()
+
+    # Global accessors
+
+    def get_voters_count(self) -> int:
+        """Gives the current number of voters in the poll."""
+        # Remove the vote place.
+        return len(self.balance_of) - len(self.candidates) - 1
+
+    def get_candidates(self) -> List[str]:
+        """Obtains the addresses of the current poll candidates."""
+        return self.candidates
+
+    def get_candidates_count(self) -> int:
+        """Obtains the current number of candidates."""
+        return len(self.candidates)
+
+    def is_vote_in_progress(self) -> bool:
+        """Indicates if a vote is currently in progress."""
+        return self.vote_beginning > 0
+
+    def current_vote_beginning(self) -> float:
+        """Returns the timestamp of the beginning of the current vote, if any.
+        """
+        return self.vote_beginning
+
+    def current_vote_end(self) -> float:
+        """Returns the timestamp of the end of the current vote, if any."""
+        return self.vote_end
+
+    def get_vote_stop_reason(self) -> int:
+        """Tells why the current vote has been stopped, if it has been stopped.
+        """
+        return self.vote_stop_reason
+
+    # Poll management
+
+    def _assert_electoral_list_is_not_full(self):
+        """Raises an exception if the current supply of tokens does not allow
+        to add a new voter."""
+        if self.get_voters_count() >= self.total_supply:
+            raise RuntimeError('Electoral list is full')
+
+    def _assert_vote_started(self):
+        """Raises an exception is no vote is currently in progress."""
+        if self.vote_beginning == 0:
+            raise RuntimeError("No vote currently in progress")
+
+    def _assert_no_vote_started(self):
+        """Raises an exception is a vote is currently in progress."""
+        if self.vote_beginning > 0:
+            raise RuntimeError("A vote has already started")
+
+    def _assert_vote_not_stopped(self):
+        """Raises an exception if a vote has already been stopped."""
+        if self.vote_stop_reason > 0:
+            raise RuntimeError('Current vote has already been stopped')
+
+    def _assert_vote_stopped(self):
+        """Raises an exception if a vote has not already been stopped."""
+        if self.vote_stop_reason == 0:
+            raise RuntimeError('Current vote has not been stopped yet')
+
+    def _assert_is_candidate(self, address: str):
+        """Raises an exception if provided address does not belong to a
+        candidate."""
+        if address not in self.candidates:
+            raise ValueError("'{}' is not a candidate".format(address))
+
+    def _assert_is_vote_place(self, address: str):
+        """Raises an exception if provided address is not the vote place"""
+        if address != self.vote_place or not self.vote_place:
+            raise ValueError("'{} is not the vote place".format(address))
+
+    def register_voter(self, address: str) -> int:
+        """Registers provided voter so that they can take part in next vote.
+
+        :returns: The new count of voters.
+        """
+        self._assert_no_vote_started()
+        self._assert_electoral_list_is_not_full()
+        self.balance_of[address] = 0
+        return self.get_voters_count()
+
+    def strike_off_voter(self, address: str) -> int:
+        """Removes a voter from the voting list.
+
+        :returns: The new count of voters.
+        """
+        self._assert_no_vote_started()
+        if address in self.balance_of:
+            del self.balance_of[address]
+        return self.get_voters_count()
+
+    def add_candidate(self, address: str) -> int:
+        """Adds a candidate to the next vote.
+
+        :returns: The new count of candidates.
+        """
+        self._assert_no_vote_started()
+
+        self._assert_electoral_list_is_not_full()
+        self.balance_of[address] = 0
+        self.candidates.append(address)
+        return self.get_candidates_count()
+
+    def remove_candidate(self, address: str) -> int:
+        """Removes a candidate from the next vote.
+
+        :returns: The new count of candidates.
+        """
+        self._assert_no_vote_started()
+        self._assert_is_candidate(address)
+        self._assert_electoral_list_is_not_full()
+        del self.balance_of[address]
+        self.candidates.remove(address)
+        return self.get_candidates_count()
+
+    def start(self) -> bool:
+        """Starts a new vote. Voters pool and candidates set are frozen."""
+        self._assert_no_vote_started()
+        self.vote_beginning = self.clock()
+
+        # Transfer one vote token to each voter.
+        for address in list(self.balance_of):
+            if address not in self.candidates and address != self.vote_place:
+                token_support.transfer(self, self.vote_place, address, 1)
+
+        started(voters_count=self.get_voters_count(),
+                candidates=self.candidates)
+        return True
+
+    def interrupt(self) -> str:
+        """Manually stops the current vote. Vote can't be resumed afterwards.
+
+        :returns: The address of the winner.
+        """
+        self._assert_vote_started()
+        self._assert_vote_not_stopped()
+        self._assert_is_vote_place(context.sender)
+
+        self.vote_stop_reason = _VOTE_STOP_INTERRUPTED
+        self.vote_end = self.clock()
+        interrupted(winner=self.get_winner(),
+                    duration=self.get_vote_duration())
+
+        return self.get_winner()
+
+    def clear(self) -> bool:
+        """Clears the current vote state.
+
+        Timestamps are reset. candidate list is emptied. All tokens are
+        transferred back to the vote place.
+        """
+        self.vote_beginning = 0
+        self.vote_end = 0
+        self.vote_stop_reason = _VOTE_STOP_NOT_YET
+        self.candidates = []
+
+        for address in self.balance_of:
+            self.balance_of[address] = 0
+        self.balance_of[self.vote_place] = self.total_supply
+
+        return True
+
+    def _do_vote(self, address: str, transfer_func: Callable) -> bool:
+        """Puts a ballot in provided candidate urn."""
+        self._assert_vote_started()
+        self._assert_vote_not_stopped()
+        self._assert_is_candidate(address)
+
+        if not transfer_func(to_address=address, amount=1):
+            return False
+
+        voted(participation=self.get_participation(),
+              remaining_votes=self.get_remaining_votes())
+
+        # Check for vote termination
+        if self.get_remaining_votes() == 0:
+            self.vote_stop_reason = _VOTE_STOP_COMPLETED
+            self.vote_end = self.clock()
+            completed(winner=self.get_winner(),
+                      duration=self.get_vote_duration())
+        return True
+
+    def vote(self, address: str) -> bool:
+        """Puts a ballot in provided candidate urn."""
+        # This is python sauce...
+        # We "prepare" a transfer function with some preset arguments.
+        # This will make it valid when called inside _do_vote
+        transfer_func = functools.partial(token_support.transfer, self,
+                                          context.sender)
+        return self._do_vote(address, transfer_func)
+
+    def vote_from(self, from_address, address: str) -> bool:
+        """Puts a ballot for another voter in provided candidate urn."""
+        # This is python sauce...
+        # We "prepare" a transfer function with some preset arguments.
+        # This will make it valid when called inside _do_vote
+        transfer_func = functools.partial(
+            token_support.transfer_from, self, context.sender, from_address
+        )
+        return self._do_vote(address, transfer_func)
+
+    # Poll info
+
+    def has_voted(self, address: str) -> bool:
+        """Tells if voter has already made his mind."""
+        return self.get_balance(address) > 0
+
+    def get_remaining_votes(self) -> int:
+        """Obtains the number of voters who haven't made their mind yet."""
+        self._assert_vote_started()
+        return self.get_voters_count() - sum(self.balance_of[c]
+                                             for c in self.candidates)
+
+    def get_participation(self) -> float:
+        """Obtains the participation score for the current vote."""
+        return 1 - (self.get_remaining_votes() / self.get_voters_count())
+
+    def get_vote_duration(self) -> float:
+        """Obtains the duration of the vote until now. The duration keeps
+        increasing until the vote is stopped somehow.
+        """
+        self._assert_vote_started()
+        end = self.vote_end or self.clock()
+        return end - self.vote_beginning
+
+    def get_score(self, candidate: str) -> float:
+        """Obtains the vote percentage for the provided candidate. Such result
+        can only be queried once the vote has stopped.
+        """
+        self._assert_vote_stopped()
+        self._assert_is_candidate(candidate)
+        return self.balance_of[candidate] / self.get_voters_count()
+
+    def get_ranking(self) -> List[str]:
+        """Obtains the complete ranking of all the candidates, by decreasing
+        score order. Such result can only be queried once the vote has stopped.
+        """
+        self._assert_vote_stopped()
+        return list(sorted(self.candidates, reverse=True,
+                           key=lambda c: self.get_score(c)))
+
+    def get_winner(self) -> str:
+        """Obtains the address of the winning candidate."""
+        ranking = self.get_ranking()
+        return ranking[0] if ranking else ''
+
+
+# Default instance
+
+_token = Vote()
+"""The poll behind the module functions."""
+
+
+token_support.install_facade(__name__)
+
+
+init = _token.init
+get_name = _token.get_name
+get_symbol = _token.get_symbol
+get_decimals = _token.get_decimals
+get_total_supply = _token.get_total_supply
+get_balance = _token.get_balance
+get_allowance = _token.get_allowance
+transfer = _token.transfer
+mint = _token.mint
+burn = _token.burn
+approve = _token.approve
+update_approve = _token.update_approve
+transfer_from = _token.transfer_from
+get_voters_count = _token.get_voters_count
+get_candidates = _token.get_candidates
+get_candidates_count = _token.get_candidates_count
+is_vote_in_progress = _token.is_vote_in_progress
+current_vote_beginning = _token.current_vote_beginning
+current_vote_end = _token.current_vote_end
+get_vote_stop_reason = _token.get_vote_stop_reason
+register_voter = _token.register_voter
+strike_off_voter = _token.strike_off_voter
+add_candidate = _token.add_candidate
+remove_candidate = _token.remove_candidate
+start = _token.start
+interrupt = _token.interrupt
+clear = _token.clear
+vote = _token.vote
+vote_from = _token.vote_from
+has_voted = _token.has_voted
+get_remaining_votes = _token.get_remaining_votes
+get_participation = _token.get_participation
+get_vote_duration = _token.get_vote_duration
+get_score = _token.get_score
+get_ranking = _token.get_ranking
+get_winner = _token.get_winner